@@ -10,8 +10,19 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
+
+def _env_bool(name, default=False):
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -41,11 +52,15 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
 
+    'rest_framework',
+
     'market',
     'import_export',
 ]
 
 MIDDLEWARE = [
+    # Birinchi turadi: boshqa middleware'lar (sessiya, auth) so'rovlari ham hisobga kiradi
+    'market.perf.PerfMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -59,7 +74,8 @@ ROOT_URLCONF = 'idealmarket.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates + render vaqtini PerfMiddleware'ga yozish
+        'BACKEND': 'market.perf.TimedDjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -78,12 +94,58 @@ WSGI_APPLICATION = 'idealmarket.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# Baza muhit o'zgaruvchilaridan tanlanadi:
+#   DB_ENGINE=sqlite (standart) — bitta kompyuterdagi do'kon uchun WAL rejimidagi SQLite
+#   DB_ENGINE=postgresql — DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT;
+#       DB_POOL=1 bo'lsa psycopg pool (DB_POOL_MIN_SIZE/DB_POOL_MAX_SIZE), aks holda
+#       doimiy ulanishlar (DB_CONN_MAX_AGE soniya) va CONN_HEALTH_CHECKS
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite').lower()
+
+if DB_ENGINE in ('postgres', 'postgresql'):
+    DB_POOL = _env_bool('DB_POOL')
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DB_NAME', 'idealmarket'),
+            'USER': os.environ.get('DB_USER', 'idealmarket'),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', 'localhost'),
+            'PORT': os.environ.get('DB_PORT', '5432'),
+            # Pool bilan doimiy ulanish birga ishlatilmaydi (Django ImproperlyConfigured beradi)
+            'CONN_MAX_AGE': 0 if DB_POOL else int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+            'CONN_HEALTH_CHECKS': not DB_POOL,
+            'OPTIONS': {
+                'pool': {
+                    'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+                    'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+                    'timeout': int(os.environ.get('DB_POOL_TIMEOUT', 10)),
+                },
+            } if DB_POOL else {},
+        }
     }
-}
+elif DB_ENGINE == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DB_NAME') or BASE_DIR / 'db.sqlite3',
+            'OPTIONS': {
+                # WAL: o'quvchilar yozuvchini kutmaydi; NORMAL WAL'da xavfsiz va fsync'lar kam.
+                # mmap — o'qishlar sahifa keshidan nusxalanmasdan
+                'init_command': (
+                    'PRAGMA journal_mode=WAL;'
+                    'PRAGMA synchronous=NORMAL;'
+                    f"PRAGMA mmap_size={int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))};"
+                    'PRAGMA cache_size=-20000;'
+                ),
+                # Yozuvchi tranzaksiya boshidanoq qulfni oladi: o'qishdan yozishga o'tishda
+                # "database is locked" bo'lmaydi, navbat busy_timeout (timeout) ichida kutadi
+                'transaction_mode': 'IMMEDIATE',
+                'timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 20)),  # soniya
+            },
+        }
+    }
+else:
+    raise ImproperlyConfigured(f"Noma'lum DB_ENGINE: {DB_ENGINE} (sqlite yoki postgresql)")
 
 
 # Password validation
@@ -122,6 +184,50 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Fon ishlari (market.jobs): natija fayllari shu papkada saqlanadi va muddati o'tgach o'chiriladi
+JOBS_ROOT = BASE_DIR / 'jobs'
+JOB_RESULT_TTL = 24 * 60 * 60  # soniya
+JOB_WORKER_PROCESSES = 2
+JOB_POLL_INTERVAL = 1.0  # soniya
+# Worker yiqilsa ish 'running'da qoladi: shundan uzoq bajarilayotgan ishlar xato deb belgilanadi
+JOB_STALE_TIMEOUT = 2 * 60 * 60  # soniya
+
+# So'rovlar tezligi o'lchovi (market.perf): har bir jarayon hisoblagichlari shu papkaga
+# PERF_FLUSH_INTERVAL soniyada bir yoziladi, `manage.py perfreport` ularni birlashtiradi
+PERF_ENABLED = True
+PERF_SNAPSHOT_DIR = BASE_DIR / 'perf'
+PERF_FLUSH_INTERVAL = 30  # soniya
+PERF_SLOW_MS = 1000  # bundan sekin so'rovlar alohida ro'yxatga va logga yoziladi
+
+# Keshlar: 'default' — jarayon ichidagi fragment/nusxa keshlari (kalitida versiya bor),
+# 'carts' — savatlar; fayl keshi, shuning uchun barcha worker jarayonlari bir xil savatni ko'radi
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'carts': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('CART_CACHE_DIR') or BASE_DIR / 'carts',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
+# Savat ombori (market.cart_store): 'cache' — CACHES['carts'], 'redis' — CART_REDIS_URL (redis paketi kerak)
+CART_STORE = os.environ.get('CART_STORE', 'cache').lower()
+CART_CACHE_ALIAS = 'carts'
+CART_REDIS_URL = os.environ.get('CART_REDIS_URL', 'redis://127.0.0.1:6379/0')
+CART_TTL = 12 * 60 * 60  # soniya: shuncha vaqt tegilmagan savat o'chadi
+
+# JSON API (batch checkout): kassa sahifasi sessiya + CSRF bilan, kiosklar Basic auth (HTTPS) bilan
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'rest_framework.authentication.SessionAuthentication',
+        'rest_framework.authentication.BasicAuthentication',
+    ],
+    'DEFAULT_PERMISSION_CLASSES': ['rest_framework.permissions.IsAuthenticated'],
+    'DEFAULT_RENDERER_CLASSES': ['rest_framework.renderers.JSONRenderer'],
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -1,11 +1,15 @@
 from django.contrib import admin
-from .models import Product, Catagory, Ombor, Sale, SaleItem
+from .models import Product, Catagory, Ombor, Sale, SaleItem, StockBalance, StockMovement, Till
+from . import stock
+from import_export import fields, resources
 from import_export.admin import ImportExportModelAdmin
 
 # Inlinelar
 class ProductInline(admin.TabularInline):
     model = Product
     extra = 1
+    # Qoldiq faqat harakatlar (kirim/tuzatish) orqali o'zgaradi
+    readonly_fields = ('stock',)
 
 class SaleItemInline(admin.TabularInline):
     model = SaleItem
@@ -24,31 +28,94 @@ class OmborAdmin(ImportExportModelAdmin):
     list_display = ('name',)
     search_fields = ('name',)
 
+class ProductResource(resources.ModelResource):
+    # Qoldiq eksport qilinadi, lekin import qilinmaydi: u faqat harakatlar (kirim/tuzatish) orqali
+    # o'zgaradi. Qoldiqli import — boshqaruv sahifasidagi import (market.importers)
+    stock = fields.Field(attribute='stock', column_name='stock', readonly=True)
+
+    class Meta:
+        model = Product
+
+
 # Mahsulot admini
 @admin.register(Product)
 class ProductAdmin(ImportExportModelAdmin):
+    resource_classes = [ProductResource]
     list_display = ('desc', 'catagory', 's_price', 'barcode', 'ombor', 'stock', 'is_active', 'start_date', 'end_date')
     search_fields = ('desc', 'barcode')
     list_filter = ('catagory', 'ombor', 'is_active')
-    list_editable = ('is_active', 'stock')
+    list_editable = ('is_active',)
     ordering = ('-id',)
 
+    def save_model(self, request, obj, form, change):
+        # Tahrir formasidagi qoldiq o'zgarishi "tuzatish" harakatiga aylanadi
+        stock.save_product_form(form, request.user, note="Admin")
+
+    def save_related(self, request, form, formsets, change):
+        # save_m2m save_product_form ichida chaqirilgan
+        for formset in formsets:
+            self.save_formset(request, form, formset, change=change)
+
+
+@admin.register(StockMovement)
+class StockMovementAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'product', 'ombor', 'kind', 'quantity', 'sale', 'created_by', 'note')
+    list_filter = ('kind', 'ombor')
+    list_select_related = ('product', 'ombor', 'created_by')
+    search_fields = ('product__barcode', 'product__desc', 'note')
+    date_hierarchy = 'created_at'
+    raw_id_fields = ('product', 'sale')
+
+    def save_model(self, request, obj, form, change):
+        # Qo'lda qo'shilgan kirim/tuzatish ham keshdagi qoldiqni o'zgartiradi
+        obj.created_by = request.user
+        stock.apply([obj])
+
+    def has_change_permission(self, request, obj=None):
+        # Jurnal faqat qo'shiladi
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
 # Sotuv (Sale) admini
 @admin.register(Sale)
 class SaleAdmin(admin.ModelAdmin):
     inlines = [SaleItemInline]
-    list_display = ('id', 'created_at', 'created_by', 'total_sum_display')
-    readonly_fields = ('total_sum_display',)
+    list_display = ('id', 'created_at', 'created_by', 'total', 'item_count')
+    list_select_related = ('created_by',)
+    readonly_fields = ('total', 'item_count')
     date_hierarchy = 'created_at'
     search_fields = ('id', 'created_by__username')
 
-    def total_sum_display(self, obj):
-        return obj.total_sum
-    total_sum_display.short_description = "Umumiy summa"
-
 # SaleItem uchun alohida admin (odatda ko‘rinmaydi, faqat inlineda)
 @admin.register(SaleItem)
 class SaleItemAdmin(admin.ModelAdmin):
     list_display = ('id', 'sale', 'product', 'quantity', 'price')
     search_fields = ('product__desc', 'sale__id')
     list_filter = ('product',)
+
+
+@admin.register(StockBalance)
+class StockBalanceAdmin(admin.ModelAdmin):
+    # Faqat ko'rish: qoldiq harakatlar (kirim, tuzatish, ko'chirish) orqali o'zgaradi
+    list_display = ('product', 'ombor', 'quantity')
+    list_filter = ('ombor',)
+    list_select_related = ('product', 'ombor')
+    search_fields = ('product__barcode', 'product__desc')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(Till)
+class TillAdmin(admin.ModelAdmin):
+    list_display = ('name', 'ombor', 'is_active')
+    list_editable = ('is_active',)
+    list_select_related = ('ombor',)
@@ -1,6 +1,16 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def _install_fulltext_index(sender, using, **kwargs):
+    from .search import install_fulltext_index
+    install_fulltext_index(using)
 
 
 class MarketConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'market'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        post_migrate.connect(_install_fulltext_index, sender=self)
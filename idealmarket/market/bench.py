@@ -0,0 +1,53 @@
+# Benchmark buyruqlari uchun umumiy yordamchilar
+import time
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from .models import Catagory, Ombor, Product
+from .stock import open_balances
+
+
+@contextmanager
+def rolled_back():
+    # Benchmark ma'lumotlari bazada qolmasligi uchun hammasi oxirida bekor qilinadi
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+def seed_products(count, prefix='BENCH', stock=1000, batch_size=2000):
+    catagory = Catagory.objects.create(name=f"{prefix} kategoriya")
+    ombor = Ombor.objects.create(name=f"{prefix} ombor")
+    products = Product.objects.bulk_create(
+        [
+            Product(
+                catagory=catagory,
+                ombor=ombor,
+                barcode=f"{prefix}{i:08d}",
+                desc=f"{prefix} mahsulot {i}",
+                r_price=Decimal('1000'),
+                s_price=Decimal('1500'),
+                stock=stock,
+            )
+            for i in range(count)
+        ],
+        batch_size=batch_size,
+    )
+    if products and products[0].pk is None:
+        # RETURNING'siz backend: id'lar qayta o'qiladi
+        products = list(Product.objects.filter(barcode__startswith=prefix).order_by('pk'))
+    # Checkout ombor qoldig'idan sotadi: boshlang'ich kirim jurnal va qoldiq jadvaliga yoziladi
+    open_balances(products, note=f"{prefix} seed")
+    return [p.pk for p in products]
+
+
+def measure(func, *args, **kwargs):
+    # (natija, SQL so'rovlar soni, millisekund)
+    with CaptureQueriesContext(connection) as ctx:
+        started = time.perf_counter()
+        result = func(*args, **kwargs)
+        elapsed = (time.perf_counter() - started) * 1000
+    return result, len(ctx.captured_queries), elapsed
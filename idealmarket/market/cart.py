@@ -0,0 +1,109 @@
+from decimal import Decimal
+
+from .cart_store import get_store
+from .models import Product
+
+
+class Cart:
+    """
+    Kassir savati (market.cart_store omborida, kaliti — sessiya). Har bir qatorda narx va nom
+    nusxasi (snapshot) saqlanadi, shuning uchun savatni ko'rsatish uchun bazaga murojaat kerak
+    emas. Har bir o'zgarish omborga darhol bitta amal bilan yoziladi; sessiya o'zgarmaydi.
+    """
+    # Eski versiyalar savatni sessiyada saqlagan: birinchi murojaatda omborga ko'chiriladi
+    SESSION_KEY = 'cart'
+    TOTAL_KEY = 'cart_total'
+
+    def __init__(self, session, store=None):
+        self.store = store or get_store()
+        if session.session_key is None:
+            session.save()
+        self.cart_id = session.session_key
+        # Jami omborda qatorlar bilan birga saqlanadi: savatni ochish qatorlarni qayta yig'maydi
+        self.lines, self.total = self.store.load(self.cart_id)
+        if self.SESSION_KEY in session:
+            self._import_legacy(session.pop(self.SESSION_KEY) or {})
+            session.pop(self.TOTAL_KEY, None)
+
+    def _import_legacy(self, raw):
+        lines = {}
+        missing = {}
+        for pid, value in raw.items():
+            if isinstance(value, dict):
+                lines[str(pid)] = value
+            else:
+                # Eng eski format ({id: miqdor}) — nusxasi yo'q qatorlar
+                missing[str(pid)] = int(value)
+        if missing:
+            products = Product.objects.in_bulk([int(pid) for pid in missing])
+            for pid, quantity in missing.items():
+                product = products.get(int(pid))
+                if product is not None:
+                    lines[pid] = {'quantity': quantity, 'price': str(product.s_price), 'desc': product.desc or ''}
+        for pid, line in lines.items():
+            if pid not in self.lines:
+                self._apply(pid, self.store.add(self.cart_id, pid, line['price'], line['desc'], line['quantity']))
+
+    def __len__(self):
+        return len(self.lines)
+
+    def __contains__(self, product_id):
+        return str(product_id) in self.lines
+
+    def quantity(self, product_id):
+        line = self.lines.get(str(product_id))
+        return line['quantity'] if line else 0
+
+    def _apply(self, product_id, result):
+        # Ombor amali qatorni va savat jamisini birga qaytaradi (jami omborda o'sha amalda yangilangan)
+        line, self.total = result
+        if line is None:
+            self.lines.pop(str(product_id), None)
+        else:
+            self.lines[str(product_id)] = line
+        return line
+
+    def add(self, product_id, price, desc, quantity=1):
+        return self._apply(product_id, self.store.add(self.cart_id, product_id, price, desc, quantity))
+
+    def decrement(self, product_id, quantity=1):
+        line = self.lines.get(str(product_id))
+        if line is None:
+            return None
+        quantity = min(quantity, line['quantity'])
+        return self._apply(product_id, self.store.add(self.cart_id, product_id, line['price'], line['desc'], -quantity))
+
+    def remove(self, product_id):
+        if str(product_id) in self.lines:
+            self._apply(product_id, (None, self.store.remove(self.cart_id, product_id)))
+
+    def clear(self):
+        self.store.clear(self.cart_id)
+        self.lines = {}
+        self.total = Decimal('0')
+
+    def reprice(self, product_id, price, desc):
+        # Narx o'zgargan qator yangi narx nusxasi bilan qayta yoziladi (miqdor saqlanadi)
+        quantity = self.quantity(product_id)
+        if not quantity:
+            return None
+        self.remove(product_id)
+        return self.add(product_id, price, desc, quantity)
+
+    def prices(self):
+        return {pid: line['price'] for pid, line in self.lines.items()}
+
+    def quantities(self):
+        return {pid: line['quantity'] for pid, line in self.lines.items()}
+
+    def items(self):
+        return [
+            {
+                'product_id': int(pid),
+                'desc': line['desc'],
+                'price': Decimal(line['price']),
+                'quantity': line['quantity'],
+                'item_total': Decimal(line['price']) * line['quantity'],
+            }
+            for pid, line in self.lines.items()
+        ]
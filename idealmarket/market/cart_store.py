@@ -0,0 +1,250 @@
+"""
+Savat ombori. Savat sessiyada emas, alohida tezkor omborda turadi: har bir bosishda sessiya
+qatori qayta yozilmaydi, o'zgarish esa bitta kalit ustida bitta amal bo'ladi.
+
+- ``CacheCartStore`` — Django keshi (``CART_CACHE_ALIAS``, sukut bo'yicha fayl keshi, shuning
+  uchun bir nechta worker jarayoni bir xil savatni ko'radi). O'qib-yozish savat qulfi ostida:
+  jarayonlararo atomar (fayl keshida O_EXCL qulf fayli, boshqa keshlarda ``cache.add``);
+- ``RedisCartStore`` — Redis HASH: miqdor, narx/nom nusxasi, 0 ga tushgan qatorni o'chirish va
+  jami (tiyinda, ``t`` maydoni) — hammasi bitta Lua skriptida (EVALSHA), orasiga boshqa buyruq
+  kirmaydi. redis-py mijozi (yoki shu interfeysdagi boshqa mijoz) kerak.
+
+Har bir qator: ``{'quantity': int, 'price': str, 'desc': str}``. Savat jami omborda qatorlar bilan
+bitta amalda yangilanadi: ``load`` — ``(qatorlar, jami)``, ``add`` — ``(qator yoki None, jami)``,
+``remove`` — ``jami``; savatni ochish uchun qatorlarni qayta yig'ish kerak emas.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.exceptions import ImproperlyConfigured
+
+CART_LOCK_TIMEOUT = 5  # soniya: qulfni ushlagan jarayon yiqilsa, qulf shundan keyin eskirgan hisoblanadi
+CART_LOCK_POLL = 0.005
+
+
+def _line(price, desc, quantity):
+    return {'quantity': quantity, 'price': str(price), 'desc': desc or ''}
+
+
+def _empty():
+    return {'lines': {}, 'total': '0'}
+
+
+class CartBusy(Exception):
+    # Savat qulfini CART_LOCK_TIMEOUT ichida olib bo'lmadi
+    pass
+
+
+class CacheCartStore:
+    # Savat bitta kesh kalitida; har bir o'zgarish savat qulfi ostida o'qib-yoziladi, shuning uchun
+    # bir nechta worker bir savatga bir vaqtda yozsa ham bosishlar yo'qolmaydi
+    def __init__(self, alias=None, ttl=None):
+        self.cache = caches[alias or settings.CART_CACHE_ALIAS]
+        self.ttl = ttl or settings.CART_TTL
+        if isinstance(self.cache, FileBasedCache):
+            os.makedirs(self.cache._dir, exist_ok=True)
+
+    def _key(self, cart_id):
+        return f"cart:{cart_id}"
+
+    def _try_lock(self, key, token):
+        if not isinstance(self.cache, FileBasedCache):
+            # memcached/redis/db/locmem'da add() atomar
+            return self.cache.add(f"{key}:lock", token, CART_LOCK_TIMEOUT)
+        # Fayl keshining add() i "bormi? -> yoz" (atomar emas): qulf — O_EXCL bilan yaratiladigan fayl
+        path = self._lock_path(key)
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return True
+        except FileExistsError:
+            pass
+        try:
+            if time.time() - os.path.getmtime(path) > CART_LOCK_TIMEOUT:
+                # Yiqilgan jarayon qoldirgan qulf: nomini o'zgartirib olib tashlaymiz (bittasi yutadi)
+                stale = f"{path}.{token}"
+                os.replace(path, stale)
+                os.unlink(stale)
+        except FileNotFoundError:
+            pass
+        return False
+
+    def _lock_path(self, key):
+        return os.path.join(self.cache._dir, hashlib.md5(key.encode()).hexdigest() + '.lock')
+
+    @contextmanager
+    def _locked(self, key):
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + 2 * CART_LOCK_TIMEOUT
+        while not self._try_lock(key, token):
+            if time.monotonic() > deadline:
+                raise CartBusy(f"Savat band: {key}")
+            time.sleep(CART_LOCK_POLL)
+        try:
+            yield
+        finally:
+            if isinstance(self.cache, FileBasedCache):
+                try:
+                    os.unlink(self._lock_path(key))
+                except FileNotFoundError:
+                    pass
+            elif self.cache.get(f"{key}:lock") == token:
+                self.cache.delete(f"{key}:lock")
+
+    def load(self, cart_id):
+        cart = self.cache.get(self._key(cart_id)) or _empty()
+        return cart['lines'], Decimal(cart['total'])
+
+    def add(self, cart_id, product_id, price, desc, quantity):
+        # Miqdorni ``quantity`` ga o'zgartiradi (manfiy — kamaytirish); 0 ga tushgan qator o'chadi
+        key, pid = self._key(cart_id), str(product_id)
+        with self._locked(key):
+            cart = self.cache.get(key) or _empty()
+            line = cart['lines'].get(pid) or _line(price, desc, 0)
+            old = line['quantity']
+            line['quantity'] = max(old + quantity, 0)
+            total = Decimal(cart['total']) + Decimal(line['price']) * (line['quantity'] - old)
+            if line['quantity'] > 0:
+                cart['lines'][pid] = line
+            else:
+                cart['lines'].pop(pid, None)
+                line = None
+            cart['total'] = str(total)
+            self.cache.set(key, cart, self.ttl)
+        return line, total
+
+    def remove(self, cart_id, product_id):
+        key = self._key(cart_id)
+        with self._locked(key):
+            cart = self.cache.get(key) or _empty()
+            total = Decimal(cart['total'])
+            line = cart['lines'].pop(str(product_id), None)
+            if line is not None:
+                total -= Decimal(line['price']) * line['quantity']
+                cart['total'] = str(total)
+                self.cache.set(key, cart, self.ttl)
+        return total
+
+    def clear(self, cart_id):
+        self.cache.delete(self._key(cart_id))
+
+
+# KEYS[1] — savat; ARGV: mahsulot id, miqdor o'zgarishi, narx/nom nusxasi (JSON), TTL, narx tiyinda.
+# Natija: {yangi miqdor (o'chgan bo'lsa 0), nusxa, savat jami tiyinda}
+CART_ADD_SCRIPT = """
+local qf, mf, cf = 'q:' .. ARGV[1], 'm:' .. ARGV[1], 'c:' .. ARGV[1]
+redis.call('HSETNX', KEYS[1], mf, ARGV[3])
+redis.call('HSETNX', KEYS[1], cf, ARGV[5])
+local old = tonumber(redis.call('HGET', KEYS[1], qf) or '0')
+local q = math.max(old + tonumber(ARGV[2]), 0)
+local meta = redis.call('HGET', KEYS[1], mf)
+local total = redis.call('HINCRBY', KEYS[1], 't', tonumber(redis.call('HGET', KEYS[1], cf)) * (q - old))
+if q > 0 then
+    redis.call('HSET', KEYS[1], qf, q)
+    redis.call('EXPIRE', KEYS[1], ARGV[4])
+    return {q, meta, total}
+end
+redis.call('HDEL', KEYS[1], qf, mf, cf)
+if redis.call('HLEN', KEYS[1]) == 1 then
+    redis.call('DEL', KEYS[1])
+end
+return {0, meta, total}
+"""
+
+# KEYS[1] — savat; ARGV: mahsulot id. Natija: savat jami tiyinda
+CART_REMOVE_SCRIPT = """
+local qf, mf, cf = 'q:' .. ARGV[1], 'm:' .. ARGV[1], 'c:' .. ARGV[1]
+local old = tonumber(redis.call('HGET', KEYS[1], qf) or '0')
+local cents = tonumber(redis.call('HGET', KEYS[1], cf) or '0')
+redis.call('HDEL', KEYS[1], qf, mf, cf)
+local total = redis.call('HINCRBY', KEYS[1], 't', -cents * old)
+if redis.call('HLEN', KEYS[1]) == 1 then
+    redis.call('DEL', KEYS[1])
+end
+return total
+"""
+
+
+def _cents(price):
+    return int((Decimal(str(price)) * 100).to_integral_value())
+
+
+def _money(cents):
+    return Decimal(int(cents)).scaleb(-2)
+
+
+class RedisCartStore:
+    def __init__(self, client, ttl=None):
+        self.client = client
+        self.ttl = ttl or settings.CART_TTL
+        self._add_script = client.register_script(CART_ADD_SCRIPT)
+        self._remove_script = client.register_script(CART_REMOVE_SCRIPT)
+
+    @classmethod
+    def from_url(cls, url, ttl=None):
+        try:
+            import redis
+        except ImportError:
+            raise ImproperlyConfigured("CART_STORE=redis uchun 'redis' paketi kerak: pip install redis")
+        return cls(redis.Redis.from_url(url), ttl)
+
+    def _key(self, cart_id):
+        return f"cart:{cart_id}"
+
+    def load(self, cart_id):
+        raw = {_text(k): _text(v) for k, v in self.client.hgetall(self._key(cart_id)).items()}
+        lines = {}
+        for field, value in raw.items():
+            if not field.startswith('q:') or int(value) <= 0:
+                continue
+            pid = field[2:]
+            price, desc = json.loads(raw.get(f"m:{pid}", '["0", ""]'))
+            lines[pid] = _line(price, desc, int(value))
+        return lines, _money(raw.get('t', 0))
+
+    def add(self, cart_id, product_id, price, desc, quantity):
+        key, pid = self._key(cart_id), str(product_id)
+        quantity_now, meta, total = self._add_script(
+            keys=[key], args=[pid, quantity, json.dumps([str(price), desc or '']), self.ttl, _cents(price)],
+        )
+        if int(quantity_now) <= 0:
+            return None, _money(total)
+        price, desc = json.loads(_text(meta))
+        return _line(price, desc, int(quantity_now)), _money(total)
+
+    def remove(self, cart_id, product_id):
+        return _money(self._remove_script(keys=[self._key(cart_id)], args=[str(product_id)]))
+
+    def clear(self, cart_id):
+        self.client.delete(self._key(cart_id))
+
+
+def _text(value):
+    return value.decode() if isinstance(value, bytes) else value
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    # settings.CART_STORE bo'yicha bitta umumiy ombor (jarayon ichida)
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if settings.CART_STORE == 'redis':
+                    _store = RedisCartStore.from_url(settings.CART_REDIS_URL)
+                elif settings.CART_STORE == 'cache':
+                    _store = CacheCartStore()
+                else:
+                    raise ImproperlyConfigured(f"Noma'lum CART_STORE: {settings.CART_STORE!r} (cache yoki redis)")
+    return _store
@@ -0,0 +1,249 @@
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, Q, When
+
+from . import rollups, stock
+from .models import Product, Sale, SaleItem, StockBalance, StockMovement
+
+
+class CheckoutError(Exception):
+    # Chekni yakunlab bo'lmadi: barcha xato qatorlar bitta ro'yxatda.
+    # ``price_changes``: {product_id: (yangi narx, nomi)} — savatdagi nusxadan farq qilgan narxlar
+    def __init__(self, errors, price_changes=None):
+        self.errors = list(errors)
+        self.price_changes = price_changes or {}
+        super().__init__("; ".join(self.errors))
+
+
+def checkout_cart(cart, user=None, ombor_id=None, idempotency_key=None, prices=None):
+    """
+    Savatni (``{product_id: quantity}``) bitta tranzaksiyada chekka aylantiradi.
+    ``prices`` (``{product_id: narx}``) — kassirga ko'rsatilgan narxlar (savat nusxasi): shu orada
+    narx o'zgargan bo'lsa, chek boshqa summaga yozilmaydi, CheckoutError o'zgarishni aytadi.
+
+    So'rovlar soni savat hajmiga bog'liq emas: mahsulotlar bitta qulflangan
+    SELECT bilan olinadi, SaleItem'lar bulk_create bilan yoziladi, ``ombor_id``
+    (kassa ombori) qoldig'i esa bitta shartli UPDATE (``quantity >= miqdor``) bilan kamaytiriladi.
+    Xato bo'lsa CheckoutError barcha muammoli qatorlarni birga qaytaradi.
+    """
+    lines = {}
+    errors = []
+    for product_id, quantity in cart.items():
+        try:
+            product_id, quantity = int(product_id), int(quantity)
+        except (TypeError, ValueError):
+            errors.append(f"Noto'g'ri savat qatori: {product_id}")
+            continue
+        if quantity <= 0:
+            errors.append(f"Noto'g'ri miqdor (#{product_id}): {quantity}")
+            continue
+        lines[product_id] = quantity
+    shown = {}
+    for product_id, price in (prices or {}).items():
+        try:
+            shown[int(product_id)] = Decimal(str(price))
+        except (TypeError, ValueError, InvalidOperation):
+            errors.append(f"Noto'g'ri narx (#{product_id}): {price}")
+    if errors:
+        raise CheckoutError(errors)
+    if not lines:
+        raise CheckoutError(["Savat bo'sh!"])
+
+    with transaction.atomic():
+        products = {
+            p.pk: p
+            for p in Product.objects.select_for_update().filter(pk__in=lines).order_by('pk')
+        }
+        # Kassa ombori berilmasa, mahsulot o'z (asosiy) omboridan sotiladi
+        sources = {pid: ombor_id or product.ombor_id for pid, product in products.items()}
+        from_source = Q()
+        for pid, oid in sources.items():
+            from_source |= Q(product_id=pid, ombor_id=oid)
+        available = dict(
+            StockBalance.objects.select_for_update().filter(from_source).values_list('product_id', 'quantity')
+        ) if sources else {}
+        for product_id, quantity in lines.items():
+            product = products.get(product_id)
+            if product is None:
+                errors.append(f"Mahsulot topilmadi (#{product_id})")
+            elif not product.is_available:
+                errors.append(f"{product.desc} muddati tugagan!")
+            elif available.get(product_id, 0) < quantity:
+                errors.append(f"{product.desc} yetarli emas, qolgan: {available.get(product_id, 0)}")
+        changed = {
+            pid: (products[pid].s_price, products[pid].desc)
+            for pid, price in shown.items()
+            if pid in products and pid in lines and price != products[pid].s_price
+        }
+        errors.extend(f"{products[pid].desc} narxi o'zgardi: {shown[pid]} -> {price}"
+                      for pid, (price, _) in changed.items())
+        if errors:
+            raise CheckoutError(errors, changed)
+
+        sale = Sale.objects.create(
+            created_by=user,
+            total=sum(products[pid].s_price * qty for pid, qty in lines.items()),
+            item_count=sum(lines.values()),
+            idempotency_key=idempotency_key,
+        )
+        SaleItem.objects.bulk_create([
+            SaleItem(sale=sale, product=products[pid], quantity=qty, price=products[pid].s_price)
+            for pid, qty in lines.items()
+        ])
+
+        # Qoldiq o'qib-yozish emas, shartli F() bilan kamaytiriladi: parallel
+        # kassa shu orada sotib yuborgan bo'lsa, yangilangan qatorlar kam chiqadi
+        in_stock = Q()
+        for pid, qty in lines.items():
+            in_stock |= Q(product_id=pid, ombor_id=sources[pid], quantity__gte=qty)
+        updated = StockBalance.objects.filter(in_stock).update(
+            quantity=Case(*[When(product_id=pid, then=F('quantity') - qty) for pid, qty in lines.items()],
+                          default=F('quantity')),
+        )
+        if updated != len(lines):
+            raise CheckoutError(["Qoldiq o'zgardi, chekni qayta yakunlang."])
+        stock.adjust_totals({pid: -qty for pid, qty in lines.items()})
+        stock.record(
+            StockMovement(product_id=pid, ombor_id=sources[pid], kind=StockMovement.SALE, quantity=-qty,
+                          sale=sale, created_by=user)
+            for pid, qty in lines.items()
+        )
+
+        rollups.record_sale(sale, [(products[pid], qty, products[pid].s_price) for pid, qty in lines.items()])
+    return sale
+
+
+IDEMPOTENCY_KEY_MAX_LENGTH = 64
+
+
+def checkout_receipts(receipts, user=None, ombor_id=None):
+    """
+    Ko'p chekni (oflayn kassa navbati, o'zi-to'lash kiosklari) bitta tranzaksiyada yozadi.
+    ``receipts``: shakli tekshirilgan ``[{'idempotency_key': str, 'lines': {product_id: miqdor},
+    'prices': {product_id: narx}}]``. ``prices`` — kassa olgan narx (oflayn nusxa eskirgan bo'lishi
+    mumkin): joriy narxdan farq qilsa chek boshqa summaga yozilmaydi, checkout_cart kabi rad etiladi.
+
+    Tekshiruv to'plam bo'yicha: mavjud kalitlar, mahsulotlar va ombor qoldiqlari — har biri bitta
+    so'rov. Cheklar kiritilgan tartibda xotirada qo'llanadi (oldingi chek sotgan qoldiq keyingisiga
+    qolmaydi), qabul qilinganlari bulk_create va shartli UPDATE bilan yoziladi: so'rovlar soni
+    cheklar va qatorlar soniga bog'liq emas. Shu kalit bilan yozilgan chek qayta yozilmaydi.
+    Natija — har bir chek uchun holat (created / duplicate / rejected), kiritilgan tartibda.
+    """
+    for attempt in range(2):
+        try:
+            return _checkout_receipts(receipts, user, ombor_id)
+        except IntegrityError:
+            # Shu kalitli chekni parallel so'rov hozirgina yozdi: qayta urinishda u "duplicate" bo'ladi
+            if attempt:
+                raise
+
+
+def _checkout_receipts(receipts, user, ombor_id):
+    results = [None] * len(receipts)
+    with transaction.atomic():
+        existing = dict(
+            Sale.objects.filter(idempotency_key__in={r['idempotency_key'] for r in receipts})
+            .values_list('idempotency_key', 'pk')
+        )
+        wanted = {pid for r in receipts for pid in r['lines']}
+        products = {
+            p.pk: p
+            for p in Product.objects.select_for_update().filter(pk__in=wanted).order_by('pk')
+        }
+        sources = {pid: ombor_id or product.ombor_id for pid, product in products.items()}
+        remaining = {
+            pid: quantity
+            for pid, oid, quantity in StockBalance.objects.select_for_update()
+            .filter(product_id__in=sources, ombor_id__in=set(sources.values()))
+            .values_list('product_id', 'ombor_id', 'quantity')
+            if sources[pid] == oid
+        }
+
+        accepted = []
+        first_by_key = {}
+        repeats = []
+        for index, receipt in enumerate(receipts):
+            key, lines = receipt['idempotency_key'], receipt['lines']
+            if key in existing:
+                results[index] = {'idempotency_key': key, 'status': 'duplicate', 'sale_id': existing[key]}
+                continue
+            if key in first_by_key:
+                # Bir batch ichida takrorlangan kalit: natijasi birinchisi yozilgandan keyin to'ldiriladi
+                repeats.append((index, first_by_key[key]))
+                continue
+            errors = []
+            for product_id, quantity in lines.items():
+                product = products.get(product_id)
+                if product is None:
+                    errors.append(f"Mahsulot topilmadi (#{product_id})")
+                elif not product.is_available:
+                    errors.append(f"{product.desc} muddati tugagan!")
+                elif remaining.get(product_id, 0) < quantity:
+                    errors.append(f"{product.desc} yetarli emas, qolgan: {remaining.get(product_id, 0)}")
+            for product_id, price in (receipt.get('prices') or {}).items():
+                product = products.get(product_id)
+                if product is not None and product_id in lines and price != product.s_price:
+                    errors.append(f"{product.desc} narxi o'zgardi: {price} -> {product.s_price}")
+            if errors:
+                results[index] = {'idempotency_key': key, 'status': 'rejected', 'errors': errors}
+            else:
+                for product_id, quantity in lines.items():
+                    remaining[product_id] -= quantity
+                results[index] = {'idempotency_key': key, 'status': 'created'}
+                accepted.append((index, key, lines))
+            first_by_key[key] = index
+
+        if accepted:
+            sales = Sale.objects.bulk_create([
+                Sale(
+                    created_by=user, idempotency_key=key, item_count=sum(lines.values()),
+                    total=sum(products[pid].s_price * qty for pid, qty in lines.items()),
+                )
+                for _, key, lines in accepted
+            ])
+            SaleItem.objects.bulk_create([
+                SaleItem(sale=sale, product=products[pid], quantity=qty, price=products[pid].s_price)
+                for sale, (_, _, lines) in zip(sales, accepted)
+                for pid, qty in lines.items()
+            ], batch_size=stock.STOCK_BATCH_SIZE)
+
+            sold = defaultdict(int)
+            for _, _, lines in accepted:
+                for pid, qty in lines.items():
+                    sold[pid] += qty
+            items = list(sold.items())
+            for start in range(0, len(items), stock.STOCK_BATCH_SIZE):
+                chunk = items[start:start + stock.STOCK_BATCH_SIZE]
+                in_stock = Q()
+                for pid, qty in chunk:
+                    in_stock |= Q(product_id=pid, ombor_id=sources[pid], quantity__gte=qty)
+                updated = StockBalance.objects.filter(in_stock).update(
+                    quantity=Case(*[When(product_id=pid, then=F('quantity') - qty) for pid, qty in chunk],
+                                  default=F('quantity')),
+                )
+                if updated != len(chunk):
+                    raise CheckoutError(["Qoldiq o'zgardi, cheklarni qayta yuboring."])
+            stock.adjust_totals({pid: -qty for pid, qty in sold.items()})
+            stock.record(
+                StockMovement(product_id=pid, ombor_id=sources[pid], kind=StockMovement.SALE, quantity=-qty,
+                              sale=sale, created_by=user)
+                for sale, (_, _, lines) in zip(sales, accepted)
+                for pid, qty in lines.items()
+            )
+            rollups.record_sales([
+                (sale, [(products[pid], qty, products[pid].s_price) for pid, qty in lines.items()])
+                for sale, (_, _, lines) in zip(sales, accepted)
+            ])
+            for sale, (index, _, _) in zip(sales, accepted):
+                results[index].update(sale_id=sale.pk, total=str(sale.total))
+    for index, first in repeats:
+        # Takror yozilgan chekning takrori — bazada bor kalit kabi "duplicate"; rad etilgani rad etilgan
+        first = results[first]
+        if first['status'] == 'created':
+            results[index] = {'idempotency_key': first['idempotency_key'], 'status': 'duplicate',
+                              'sale_id': first['sale_id']}
+        else:
+            results[index] = dict(first)
+    return results
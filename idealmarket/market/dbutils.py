@@ -0,0 +1,33 @@
+from django.db import connection
+
+UPSERT_BATCH_SIZE = 500
+
+
+def upsert_add(model, key_fields, sum_fields, rows, batch_size=UPSERT_BATCH_SIZE, null_keys=()):
+    """
+    INSERT ... ON CONFLICT DO UPDATE SET x = x + excluded.x (SQLite 3.24+ va PostgreSQL).
+    bulk_create(update_conflicts=True) qiymatni almashtiradi, bu yerda esa qo'shiladi.
+    ``rows``: (kalit maydonlar..., yig'iladigan maydonlar...) kortejlari. ``null_keys`` — noyob
+    indeksda ``COALESCE(maydon, 0)`` bo'lib turgan nullable kalitlar (ON CONFLICT shu ifodaga mos kelishi kerak).
+    """
+    if not rows:
+        return
+    qn = connection.ops.quote_name
+    opts = model._meta
+    table = qn(opts.db_table)
+    keys = [qn(opts.get_field(name).column) for name in key_fields]
+    target = [f"COALESCE({col}, 0)" if name in null_keys else col for name, col in zip(key_fields, keys)]
+    sums = [qn(opts.get_field(name).column) for name in sum_fields]
+    placeholder = '(' + ', '.join(['%s'] * (len(keys) + len(sums))) + ')'
+    for start in range(0, len(rows), batch_size):
+        chunk = rows[start:start + batch_size]
+        sql = (
+            f"INSERT INTO {table} ({', '.join(keys + sums)}) VALUES {', '.join([placeholder] * len(chunk))} "
+            f"ON CONFLICT ({', '.join(target)}) DO UPDATE SET "
+            + ', '.join(f"{col} = {table}.{col} + excluded.{col}" for col in sums)
+        )
+        params = []
+        for row in chunk:
+            params.extend(row)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
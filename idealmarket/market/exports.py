@@ -0,0 +1,150 @@
+import csv
+import io
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from openpyxl import Workbook
+
+from .models import Catagory, Product
+
+EXPORT_CHUNK_SIZE = 2000
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# format -> (kengaytma, content_type)
+FORMATS = {
+    'json': ('json', 'application/json'),
+    'jsonl': ('jsonl', 'application/x-ndjson'),
+    'csv': ('csv', 'text/csv'),
+    'xlsx': ('xlsx', XLSX_CONTENT_TYPE),
+}
+DEFAULT_FORMAT = 'json'
+
+# Ustun nomi -> values_list yo'li. Nomlar import fayli ustunlari bilan bir xil,
+# shuning uchun eksport qilingan faylni to'g'ridan-to'g'ri qayta import qilish mumkin.
+PRODUCT_COLUMNS = (
+    ('id', 'id'),
+    ('barcode', 'barcode'),
+    ('desc', 'desc'),
+    ('catagory', 'catagory__name'),
+    ('catagory_id', 'catagory_id'),
+    ('ombor', 'ombor__name'),
+    ('ombor_id', 'ombor_id'),
+    ('r_price', 'r_price'),
+    ('s_price', 's_price'),
+    ('stock', 'stock'),
+    ('start_date', 'start_date'),
+    ('end_date', 'end_date'),
+    ('is_active', 'is_active'),
+    ('updated_at', 'updated_at'),
+)
+CATEGORY_COLUMNS = (
+    ('id', 'id'),
+    ('name', 'name'),
+    ('desc', 'desc'),
+    ('updated_at', 'updated_at'),
+)
+
+
+def export_filters(params):
+    # So'rov parametrlaridan eksport sozlamalari (noto'g'ri qiymatlar e'tiborsiz qoldiriladi)
+    filters = {'format': params.get('format') if params.get('format') in FORMATS else DEFAULT_FORMAT}
+    for name in ('ombor', 'catagory'):
+        value = str(params.get(name) or '')
+        if value.isdigit():
+            filters[name] = int(value)
+    changed_since = params.get('changed_since') or ''
+    moment = parse_datetime(changed_since)
+    if moment is None and parse_date(changed_since):
+        moment = datetime.combine(parse_date(changed_since), time.min)
+    if moment is not None:
+        if timezone.is_naive(moment):
+            moment = timezone.make_aware(moment)
+        filters['changed_since'] = moment.isoformat()
+    return filters
+
+
+def product_rows(filters):
+    products = Product.objects.all()
+    order = ('id',)
+    if 'ombor' in filters:
+        products = products.filter(ombor_id=filters['ombor'])
+    if 'catagory' in filters:
+        products = products.filter(catagory_id=filters['catagory'])
+    if 'changed_since' in filters:
+        # (updated_at, id) indeksidan oraliq bo'yicha o'qiladi
+        products = products.filter(updated_at__gte=parse_datetime(filters['changed_since']))
+        order = ('updated_at', 'id')
+    return products.order_by(*order).values_list(
+        *[path for _, path in PRODUCT_COLUMNS]
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def category_rows(filters):
+    categories = Catagory.objects.all()
+    if 'changed_since' in filters:
+        categories = categories.filter(updated_at__gte=parse_datetime(filters['changed_since']))
+    return categories.order_by('id').values_list(
+        *[path for _, path in CATEGORY_COLUMNS]
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def _json_value(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} JSON'ga aylantirilmaydi")
+
+
+def _write_json(fp, names, rows):
+    fp.write(b'[')
+    for i, row in enumerate(rows):
+        if i:
+            fp.write(b',\n')
+        fp.write(json.dumps(dict(zip(names, row)), default=_json_value, ensure_ascii=False).encode())
+    fp.write(b']\n')
+
+
+def _write_jsonl(fp, names, rows):
+    for row in rows:
+        fp.write(json.dumps(dict(zip(names, row)), default=_json_value, ensure_ascii=False).encode())
+        fp.write(b'\n')
+
+
+def _write_csv(fp, names, rows):
+    # utf-8-sig: Excel o'zbekcha harflarni to'g'ri ochishi uchun
+    text = io.TextIOWrapper(fp, encoding='utf-8-sig', newline='')
+    writer = csv.writer(text)
+    writer.writerow(names)
+    for row in rows:
+        writer.writerow(['' if v is None else _json_value(v) if isinstance(v, (Decimal, date)) else v for v in row])
+    text.flush()
+    text.detach()
+
+
+def _write_xlsx(fp, names, rows):
+    # write_only: qatorlar vaqtinchalik faylga yoziladi, xotirada butun varaq saqlanmaydi
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(names)
+    for row in rows:
+        sheet.append([
+            timezone.localtime(v).replace(tzinfo=None) if isinstance(v, datetime) and timezone.is_aware(v) else v
+            for v in row
+        ])
+    workbook.save(fp)
+
+
+_WRITERS = {'json': _write_json, 'jsonl': _write_jsonl, 'csv': _write_csv, 'xlsx': _write_xlsx}
+
+
+def write(fp, fmt, columns, rows):
+    """
+    ``rows`` iteratoridagi qatorlarni ``fp`` (binar fayl) ga tanlangan formatda yozadi.
+    Qatorlar bittalab o'tadi, shuning uchun xotira katalog hajmiga bog'liq emas.
+    """
+    _WRITERS[fmt](fp, [name for name, _ in columns], rows)
@@ -1,5 +1,5 @@
 from django import forms
-from .models import Product, Ombor
+from .models import Catagory, Product, Ombor
 
 from django.utils import timezone
 from datetime import timedelta
@@ -19,3 +19,8 @@ class OmborForm(forms.ModelForm):
     class Meta:
         model = Ombor
         fields = ['name']
+
+class CatagoryForm(forms.ModelForm):
+    class Meta:
+        model = Catagory
+        fields = ['name', 'desc']
@@ -0,0 +1,283 @@
+import csv
+import json
+from dataclasses import dataclass, field
+from itertools import islice
+from pathlib import Path
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+from openpyxl import load_workbook
+
+from . import sku_cache, stock, sync
+from .models import Catagory, Ombor, Product, StockMovement
+
+IMPORT_CHUNK_SIZE = 2000
+
+# Fayldagi ustunlar -> Product maydonlari (catagory/ombor alohida: nomi yoki *_id bo'yicha)
+PRODUCT_FIELDS = ('desc', 'r_price', 's_price', 'stock', 'start_date', 'end_date', 'is_active')
+PRODUCT_REQUIRED = ('catagory', 'ombor', 'r_price', 's_price')
+
+
+class ImportFailed(Exception):
+    pass
+
+
+@dataclass
+class ImportReport:
+    created: int = 0
+    updated: int = 0
+    errors: list = field(default_factory=list)  # [(qator_raqami, xabar), ...]
+
+    def summary(self, noun):
+        text = f"{self.created} ta {noun} qo‘shildi, {self.updated} ta yangilandi."
+        if self.errors:
+            text += f" {len(self.errors)} ta qatorda xato."
+        return text
+
+    def write_errors(self, fp):
+        writer = csv.writer(fp)
+        writer.writerow(['qator', 'xato'])
+        writer.writerows(self.errors)
+
+
+def _blank(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def _text(value):
+    if isinstance(value, float) and value.is_integer():
+        # Excel shtrix-kodni son sifatida saqlaydi: 4780001.0 -> "4780001"
+        value = int(value)
+    return str(value).strip()
+
+
+def read_rows(path):
+    """
+    Faylni (qator_raqami, {ustun: qiymat}) ko'rinishida ketma-ket o'qiydi.
+    CSV, XLSX (read-only) va JSON Lines to'liq xotiraga yuklanmaydi; oddiy JSON
+    massiv esa bir butun o'qiladi.
+    """
+    suffix = Path(path).suffix.lower()
+    if suffix == '.csv':
+        with open(path, newline='', encoding='utf-8-sig') as fp:
+            yield from enumerate(csv.DictReader(fp), start=2)
+    elif suffix == '.xlsx':
+        try:
+            workbook = load_workbook(path, read_only=True, data_only=True)
+        except Exception as e:
+            raise ImportFailed("Excel faylni o‘qib bo‘lmadi: " + str(e))
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = [_text(name) if name is not None else '' for name in next(rows, ())]
+            for number, values in enumerate(rows, start=2):
+                if all(_blank(v) for v in values):
+                    continue
+                yield number, dict(zip(header, values))
+        finally:
+            workbook.close()
+    elif suffix == '.jsonl':
+        with open(path, encoding='utf-8') as fp:
+            for number, line in enumerate(fp, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    yield number, json.loads(line)
+                except ValueError as e:
+                    raise ImportFailed(f"{number}-qator: JSON xato: {e}")
+    elif suffix == '.json':
+        try:
+            with open(path, encoding='utf-8') as fp:
+                data = json.load(fp)
+        except ValueError as e:
+            raise ImportFailed("JSON faylni o‘qib bo‘lmadi: " + str(e))
+        if not isinstance(data, list):
+            raise ImportFailed("JSON fayl obyektlar ro‘yxati bo‘lishi kerak.")
+        yield from enumerate(data, start=1)
+    else:
+        raise ImportFailed(f"Qo‘llab-quvvatlanmaydigan fayl turi: {suffix or '?'} (JSON, JSONL, CSV yoki XLSX)")
+
+
+def _chunks(rows, size):
+    rows = iter(rows)
+    while chunk := list(islice(rows, size)):
+        yield chunk
+
+
+def _name_index(model):
+    # nom -> id va mavjud id'lar; bir xil nom bo'lsa birinchisi olinadi
+    by_name, ids = {}, set()
+    for pk, name in model.objects.order_by('pk').values_list('pk', 'name'):
+        by_name.setdefault(name, pk)
+        ids.add(pk)
+    return by_name, ids
+
+
+def _resolve(row, name, index, label, errors):
+    by_name, ids = index
+    value = row.get(name)
+    if not _blank(value):
+        pk = by_name.get(_text(value))
+        if pk is None:
+            errors.append(f"{label} topilmadi: {_text(value)}")
+        return pk
+    value = row.get(f'{name}_id')
+    if not _blank(value):
+        pk = _text(value)
+        if not pk.isdigit() or int(pk) not in ids:
+            errors.append(f"{label} topilmadi: id={pk}")
+            return None
+        return int(pk)
+    return None
+
+
+def _parse_product(row, categories, ombors):
+    # Qatorni tekshirib, (barcode, {maydon: qiymat}) qaytaradi. Bo'sh katakchalar o'tkazib yuboriladi.
+    if not isinstance(row, dict):
+        raise ValidationError("qator obyekt emas")
+    errors = []
+    values = {}
+    barcode = row.get('barcode')
+    if _blank(barcode):
+        errors.append("barcode bo‘sh")
+    else:
+        barcode = _text(barcode)
+        try:
+            Product._meta.get_field('barcode').clean(barcode, None)
+        except ValidationError as e:
+            errors.extend(f"barcode: {m}" for m in e.messages)
+    for name, index, label in (('catagory', categories, "Kategoriya"), ('ombor', ombors, "Ombor")):
+        pk = _resolve(row, name, index, label, errors)
+        if pk is not None:
+            values[f'{name}_id'] = pk
+    for name in PRODUCT_FIELDS:
+        raw = row.get(name)
+        if _blank(raw):
+            continue
+        try:
+            values[name] = Product._meta.get_field(name).clean(raw, None)
+        except ValidationError as e:
+            errors.extend(f"{name}: {m}" for m in e.messages)
+    if errors:
+        raise ValidationError(errors)
+    return barcode, values
+
+
+def _apply_products(chunk, categories, ombors, report):
+    parsed = {}
+    for number, row in chunk:
+        try:
+            barcode, values = _parse_product(row, categories, ombors)
+        except ValidationError as e:
+            report.errors.append((number, "; ".join(e.messages)))
+            continue
+        # Bir fayl ichida takrorlangan shtrix-kod: oxirgi qator yutadi
+        parsed.pop(barcode, None)
+        parsed[barcode] = (number, values)
+
+    # Mavjud mahsulotlar bitta so'rov bilan; majburiy ustunlar upsert'ning INSERT qismi uchun kerak.
+    # Qatorlar qulflanadi: qoldiq farqi (tuzatish) shu orada bo'lgan sotuv bilan aralashmasin.
+    existing = {
+        row[0]: row[1:]
+        for row in Product.objects.select_for_update().filter(barcode__in=parsed).values_list(
+            'barcode', 'pk', 'catagory_id', 'ombor_id', 'r_price', 's_price', 'stock')
+    }
+    to_create = []
+    to_update = {}  # yangilanadigan maydonlar to'plami -> obyektlar
+    changed_ids = []
+    adjustments = []
+    home_moves = {}
+    for barcode, (number, values) in parsed.items():
+        if barcode in existing:
+            pk, catagory_id, ombor_id, r_price, s_price, current_stock = existing[barcode]
+            # Qoldiq to'g'ridan-to'g'ri yozilmaydi: fayldagi son bilan farq "tuzatish" harakati bo'ladi
+            target = values.pop('stock', None)
+            if target is not None and target != current_stock:
+                adjustments.append(StockMovement(product_id=pk, kind=StockMovement.ADJUSTMENT,
+                                                 quantity=target - current_stock, note="Import"))
+            if values.get('ombor_id', ombor_id) != ombor_id:
+                home_moves[pk] = (ombor_id, values['ombor_id'])
+            if values:
+                changed_ids.append(pk)
+                current = {'catagory_id': catagory_id, 'ombor_id': ombor_id, 'r_price': r_price, 's_price': s_price}
+                to_update.setdefault(frozenset(values), []).append(Product(barcode=barcode, **{**current, **values}))
+            report.updated += 1
+            continue
+        missing = [name for name in PRODUCT_REQUIRED
+                   if (f'{name}_id' if name in ('catagory', 'ombor') else name) not in values]
+        if missing:
+            report.errors.append((number, "yangi mahsulot uchun majburiy: " + ", ".join(missing)))
+            continue
+        to_create.append(Product(barcode=barcode, **values))
+
+    Product.objects.bulk_create(to_create, batch_size=500)
+    report.created += len(to_create)
+    # bulk_update katta CASE WHEN yozadi va minglab qatorda sekinlashadi; ON CONFLICT (barcode) DO UPDATE esa
+    # faqat fayldagi ustunlarni yangilaydi
+    for fields, objs in to_update.items():
+        Product.objects.bulk_create(
+            objs, batch_size=500, update_conflicts=True, unique_fields=['barcode'], update_fields=sorted(fields | {'updated_at'}),
+        )
+    sync.record_changes(Product, changed_ids + [obj.pk for obj in to_create])
+    stock.open_balances(to_create, note="Import")
+    # Avval qoldiq yangi asosiy omborga o'tadi, keyin tuzatish shu omborga yoziladi
+    stock.move_home(home_moves, note="Import")
+    stock.apply(adjustments)
+
+
+def import_products(path, chunk_size=IMPORT_CHUNK_SIZE):
+    """
+    Mahsulotlarni shtrix-kod bo'yicha qo'shadi yoki yangilaydi. Kategoriya/ombor
+    nomlari bir marta lug'atga yuklanadi, har bir bo'lak uchun mavjud shtrix-kodlar
+    bitta so'rov bilan topiladi va o'zgarishlar bulk_create (mavjudlari uchun upsert) bilan yoziladi.
+    Xato qatorlar o'tkazib yuboriladi va ImportReport.errors'ga yoziladi.
+    """
+    categories = _name_index(Catagory)
+    ombors = _name_index(Ombor)
+    report = ImportReport()
+    with transaction.atomic():
+        for chunk in _chunks(read_rows(path), chunk_size):
+            _apply_products(chunk, categories, ombors, report)
+        # bulk_* signal yubormaydi: kassa keshini butunlay tozalaymiz
+        transaction.on_commit(sku_cache.clear)
+    return report
+
+
+def _apply_categories(chunk, existing, report):
+    parsed = {}
+    for number, row in chunk:
+        name = row.get('name') if isinstance(row, dict) else None
+        if _blank(name):
+            report.errors.append((number, "name bo‘sh"))
+            continue
+        name = _text(name)
+        if len(name) > Catagory._meta.get_field('name').max_length:
+            report.errors.append((number, "name juda uzun"))
+            continue
+        parsed[name] = row.get('desc')
+
+    to_create, to_update = [], []
+    now = timezone.now()
+    for name, desc in parsed.items():
+        desc = None if _blank(desc) else str(desc)
+        if name in existing:
+            to_update.append(Catagory(pk=existing[name], name=name, desc=desc, updated_at=now))
+        else:
+            to_create.append(Catagory(name=name, desc=desc))
+    Catagory.objects.bulk_create(to_create, batch_size=500)
+    Catagory.objects.bulk_update(to_update, ['desc', 'updated_at'], batch_size=500)
+    sync.record_changes(Catagory, [obj.pk for obj in to_update + to_create])
+    for obj in to_create:
+        if obj.pk is not None:
+            existing[obj.name] = obj.pk
+    report.created += len(to_create)
+    report.updated += len(to_update)
+
+
+def import_categories(path, chunk_size=IMPORT_CHUNK_SIZE):
+    existing, _ = _name_index(Catagory)
+    report = ImportReport()
+    with transaction.atomic():
+        for chunk in _chunks(read_rows(path), chunk_size):
+            _apply_categories(chunk, existing, report)
+    return report
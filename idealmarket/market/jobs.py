@@ -0,0 +1,189 @@
+import logging
+import os
+import uuid
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import exports, importers, reports
+from .models import Job, Sale
+
+logger = logging.getLogger(__name__)
+
+# kind -> handler(job, output_path). Handler natija faylini output_path'ga yozadi va
+# (fayl_nomi, content_type) qaytaradi (xabarni job.message'ga o'zi yozishi mumkin);
+# fayl bo'lmasa — xabar matnini qaytaradi.
+_HANDLERS = {}
+
+
+def job_handler(kind):
+    def register(func):
+        _HANDLERS[kind] = func
+        return func
+    return register
+
+
+def jobs_root():
+    root = Path(settings.JOBS_ROOT)
+    root.mkdir(parents=True, exist_ok=True)
+    return root
+
+
+def enqueue(kind, params=None, user=None, upload=None):
+    if kind not in _HANDLERS:
+        raise ValueError(f"Noma'lum ish turi: {kind}")
+    params = dict(params or {})
+    if upload is not None:
+        # Yuklangan fayl worker jarayoni o'qishi uchun diskka saqlanadi
+        uploads = jobs_root() / 'uploads'
+        uploads.mkdir(exist_ok=True)
+        path = uploads / f"{uuid.uuid4().hex}{Path(upload.name).suffix.lower()}"
+        with open(path, 'wb') as fp:
+            for chunk in upload.chunks():
+                fp.write(chunk)
+        params['upload'] = str(path.relative_to(jobs_root()))
+    return Job.objects.create(kind=kind, params=params, created_by=user)
+
+
+def claim(limit=1):
+    # Bir nechta worker bo'lsa ham bitta ishni faqat bittasi oladi: holat shartli UPDATE bilan almashtiriladi
+    claimed = []
+    candidates = Job.objects.filter(status=Job.PENDING).order_by('created_at', 'id').values_list('pk', flat=True)
+    for pk in candidates[:limit * 4]:
+        if Job.objects.filter(pk=pk, status=Job.PENDING).update(status=Job.RUNNING, started_at=timezone.now()):
+            claimed.append(pk)
+            if len(claimed) >= limit:
+                break
+    return claimed
+
+
+def run_job(job_id):
+    job = Job.objects.get(pk=job_id)
+    handler = _HANDLERS.get(job.kind)
+    output = jobs_root() / f"{job.pk}-{uuid.uuid4().hex}"
+    try:
+        if handler is None:
+            raise ValueError(f"Noma'lum ish turi: {job.kind}")
+        result = handler(job, output)
+    except Exception as e:
+        logger.exception("Job #%s (%s) xato bilan tugadi", job.pk, job.kind)
+        output.unlink(missing_ok=True)
+        job.status = Job.FAILED
+        job.message = str(e)
+    else:
+        job.status = Job.DONE
+        if isinstance(result, tuple):
+            job.result_name, job.content_type = result
+            job.result_file = output.name
+        else:
+            job.message = result or ''
+    finally:
+        upload = job.params.get('upload')
+        if upload:
+            (jobs_root() / upload).unlink(missing_ok=True)
+    job.finished_at = timezone.now()
+    job.expires_at = job.finished_at + timedelta(seconds=settings.JOB_RESULT_TTL)
+    job.save(update_fields=['status', 'message', 'result_file', 'result_name', 'content_type',
+                            'finished_at', 'expires_at'])
+    return job.status
+
+
+def fail(job_id, message):
+    now = timezone.now()
+    Job.objects.filter(pk=job_id, status=Job.RUNNING).update(
+        status=Job.FAILED, message=message, finished_at=now,
+        expires_at=now + timedelta(seconds=settings.JOB_RESULT_TTL),
+    )
+
+
+def fail_stale(now=None):
+    """
+    Worker jarayoni ish o'rtasida o'ldirilsa (OOM, qayta ishga tushirish), ish ``running``da qolib
+    ketadi va hech kim uni olmaydi. JOB_STALE_TIMEOUT'dan oldin boshlangan bunday ishlar xato deb
+    belgilanadi; qayta navbatga qo'yilmaydi — yarim bajarilgan importni foydalanuvchi tekshirib qayta yuklaydi.
+    """
+    now = now or timezone.now()
+    return Job.objects.filter(
+        status=Job.RUNNING, started_at__lt=now - timedelta(seconds=settings.JOB_STALE_TIMEOUT),
+    ).update(
+        status=Job.FAILED, message="Worker to'xtab qoldi: ish tugallanmadi, qayta ishga tushiring",
+        finished_at=now, expires_at=now + timedelta(seconds=settings.JOB_RESULT_TTL),
+    )
+
+
+def result_path(job):
+    return jobs_root() / job.result_file if job.result_file else None
+
+
+def cleanup_expired(now=None):
+    # Muddati o'tgan natija fayllari va yozuvlari o'chiriladi
+    now = now or timezone.now()
+    expired = Job.objects.filter(expires_at__lt=now)
+    for result_file in expired.exclude(result_file='').values_list('result_file', flat=True):
+        (jobs_root() / result_file).unlink(missing_ok=True)
+    return expired.delete()[0]
+
+
+@job_handler('export_sales_pdf')
+def export_sales_pdf(job, output):
+    with open(output, 'wb') as fp:
+        sales, _ = reports.filter_sales(Sale.objects.all(), job.params)
+        for chunk in reports.sales_pdf(reports.sales_report_rows(sales)):
+            fp.write(chunk)
+    return 'cheklar.pdf', 'application/pdf'
+
+
+@job_handler('export_statistics_pdf')
+def export_statistics_pdf(job, output):
+    with open(output, 'wb') as fp:
+        reports.statistics_pdf(fp)
+    return 'statistika.pdf', 'application/pdf'
+
+
+@job_handler('export_statistics_excel')
+def export_statistics_excel(job, output):
+    with open(output, 'wb') as fp:
+        reports.statistics_excel(fp)
+    return 'statistika.xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def _export(output, name, filters, columns, rows):
+    fmt = filters.get('format', exports.DEFAULT_FORMAT)
+    extension, content_type = exports.FORMATS[fmt]
+    with open(output, 'wb') as fp:
+        exports.write(fp, fmt, columns, rows)
+    return f'{name}.{extension}', content_type
+
+
+@job_handler('export_products')
+def export_products(job, output):
+    return _export(output, 'products_export', job.params, exports.PRODUCT_COLUMNS, exports.product_rows(job.params))
+
+
+@job_handler('export_categories')
+def export_categories(job, output):
+    return _export(output, 'categories_export', job.params, exports.CATEGORY_COLUMNS, exports.category_rows(job.params))
+
+
+def _import_result(job, output, report, noun):
+    # Xato qatorlar bo'lsa, ularning ro'yxati natija fayli sifatida saqlanadi
+    job.message = report.summary(noun)
+    if not report.errors:
+        return job.message
+    with open(output, 'w', newline='', encoding='utf-8') as fp:
+        report.write_errors(fp)
+    return 'import_xatolar.csv', 'text/csv'
+
+
+@job_handler('import_products')
+def import_products(job, output):
+    report = importers.import_products(os.fspath(jobs_root() / job.params['upload']))
+    return _import_result(job, output, report, "mahsulot")
+
+
+@job_handler('import_categories')
+def import_categories(job, output):
+    report = importers.import_categories(os.fspath(jobs_root() / job.params['upload']))
+    return _import_result(job, output, report, "kategoriya")
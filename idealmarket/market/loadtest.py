@@ -0,0 +1,345 @@
+"""
+Kassa yuklama testi: bir nechta kassir parallel ravishda qidiradi, savatga qo'shadi va chek
+yakunlaydi. ``manage.py loadtest`` buyrug'i ma'lumot tayyorlaydi, kassirlarni oqimlarda
+ishga tushiradi va oxirida qoldiqlar izchilligini tekshiradi.
+
+Kassir mijozi ikki xil transport bilan ishlaydi: jarayon ichida (django.test.Client,
+SQL so'rovlar soni ham o'lchanadi) yoki haqiqiy server bo'ylab HTTP (``--url``).
+"""
+import http.cookiejar
+import json
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.contrib.auth.models import Group, User
+from django.db import connection, transaction
+from django.db.models import Q, Sum
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from . import rollups, stock
+from .bench import seed_products
+from .models import Catagory, Ombor, Product, Sale, SaleItem, StockBalance
+
+STEPS = ('search', 'add', 'update', 'checkout')
+SALE_ID_RE = re.compile(r'#(\d+)')
+TITLE_RE = re.compile(rb'<title>(.*?)</title>', re.S)
+
+
+def percentile(values, fraction):
+    # Eng yaqin rang bo'yicha persentil (saralangan ro'yxat)
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, int(round(fraction * len(values) + 0.5)) - 1))
+    return values[index]
+
+
+# --- Ma'lumot tayyorlash ---------------------------------------------------
+
+def seed(prefix, products, sales, cashiers, stock_per_product, password, days=30, lines=3):
+    """
+    ``products`` ta mahsulot (ombor qoldig'i bilan), ``sales`` ta tarixiy chek (oxirgi ``days``
+    kunga taqsimlangan) va ``cashiers`` ta kassir. Tarixiy cheklar qoldiqqa ta'sir qilmaydi —
+    ular joriy qoldiq sanab chiqilishidan oldingi tarix sifatida yoziladi.
+    """
+    product_ids = seed_products(products, prefix=prefix, stock=stock_per_product)
+    group, _ = Group.objects.get_or_create(name='Kassir')
+    users = []
+    for i in range(cashiers):
+        user = User(username=f"{prefix.lower()}-kassir-{i}")
+        user.set_password(password)
+        users.append(user)
+    users = User.objects.bulk_create(users)
+    if users and users[0].pk is None:
+        users = list(User.objects.filter(username__startswith=f"{prefix.lower()}-kassir-").order_by('pk'))
+    group.user_set.add(*users)
+
+    if sales:
+        rng = random.Random(prefix)
+        prices = dict(Product.objects.filter(pk__in=product_ids).values_list('pk', 's_price'))
+        with transaction.atomic():
+            created = Sale.objects.bulk_create(
+                [Sale(created_by=users[i % len(users)] if users else None) for i in range(sales)], batch_size=2000,
+            )
+            if created[0].pk is None:
+                created = list(Sale.objects.filter(created_by__in=users).order_by('pk'))
+            items = []
+            for sale in created:
+                for pid in rng.sample(product_ids, min(lines, len(product_ids))):
+                    items.append(SaleItem(sale_id=sale.pk, product_id=pid, quantity=rng.randint(1, 3),
+                                          price=prices[pid]))
+            SaleItem.objects.bulk_create(items, batch_size=2000)
+            # auto_now_add bulk_create'da ham "hozir" qo'yadi: cheklar kunlarga bitta UPDATE bilan taqsimlanadi
+            ids = [sale.pk for sale in created]
+            per_day = -(-len(ids) // days)
+            now = timezone.now()
+            for day in range(days):
+                chunk = ids[day * per_day:(day + 1) * per_day]
+                if chunk:
+                    Sale.objects.filter(pk__in=chunk).update(created_at=now - timedelta(days=day, hours=day % 12))
+            Sale.objects.filter(pk__in=ids).refresh_totals()
+        rollups.rebuild()
+    return product_ids, users
+
+
+def cleanup(prefix):
+    # Yuklama ma'lumotlari: cheklar (SaleItem PROTECT), keyin mahsulotlar, kassirlar va ombor
+    users = User.objects.filter(username__startswith=f"{prefix.lower()}-kassir-")
+    with transaction.atomic():
+        Sale.objects.filter(Q(created_by__in=users) | Q(items__product__barcode__startswith=prefix)).delete()
+        Catagory.objects.filter(name=f"{prefix} kategoriya").delete()
+        Ombor.objects.filter(name=f"{prefix} ombor").delete()
+        users.delete()
+
+
+# --- Transportlar ----------------------------------------------------------
+
+class LocalTransport:
+    """
+    Jarayon ichida: to'liq middleware/view zanjiri, tarmoqsiz. Har bir oqim o'z DB ulanishida
+    ishlaydi, shuning uchun so'rovlar execute_wrapper bilan shu oqimda sanaladi.
+    """
+
+    def __init__(self, user):
+        # Server kabi: view xatosi istisno emas, 500 javob bo'lib qaytadi
+        self.client = Client(raise_request_exception=False)
+        self.client.force_login(user)
+
+    def request(self, method, path, data=None, xhr=False):
+        queries = [0]
+
+        def count(execute, sql, params, many, context):
+            queries[0] += 1
+            return execute(sql, params, many, context)
+
+        extra = {'HTTP_X_REQUESTED_WITH': 'XMLHttpRequest'} if xhr else {}
+        with connection.execute_wrapper(count):
+            response = getattr(self.client, method)(path, data or {}, **extra)
+        return response.status_code, response.content, queries[0]
+
+    def close(self):
+        connection.close()
+
+
+class HttpTransport:
+    # Ishlayotgan serverga (runserver, gunicorn, uvicorn) sessiya cookie'si va CSRF token bilan
+    def __init__(self, base_url, username, password, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.jar = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(self.jar))
+        self.request('get', reverse('login'))
+        status, body, _ = self.request('post', reverse('login'), {'username': username, 'password': password})
+        if status >= 400 or not self._cookie('sessionid'):
+            raise RuntimeError(f"{username}: tizimga kirib bo'lmadi ({status})")
+
+    def _cookie(self, name):
+        return next((c.value for c in self.jar if c.name == name), None)
+
+    def request(self, method, path, data=None, xhr=False):
+        url = self.base_url + path
+        headers = {'Referer': url}
+        if xhr:
+            headers['X-Requested-With'] = 'XMLHttpRequest'
+        body = None
+        if method == 'post':
+            headers['X-CSRFToken'] = self._cookie('csrftoken') or ''
+            body = urllib.parse.urlencode({**(data or {}), 'csrfmiddlewaretoken': headers['X-CSRFToken']}).encode()
+        elif data:
+            url += '?' + urllib.parse.urlencode(data)
+        req = urllib.request.Request(url, data=body, headers=headers, method=method.upper())
+        try:
+            with self.opener.open(req, timeout=self.timeout) as response:
+                return response.status, response.read(), None
+        except urllib.error.HTTPError as e:
+            return e.code, e.read(), None
+
+    def close(self):
+        pass
+
+
+# --- Kassir ssenariysi -----------------------------------------------------
+
+class Results:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = defaultdict(list)  # qadam -> [(ms, so'rovlar soni yoki None)]
+        self.statuses = Counter()
+        self.errors = Counter()
+        self.sale_ids = []  # kassirga muvaffaqiyatli qaytgan cheklar
+        self.checkouts = 0
+        self.rejected = 0
+
+    def add(self, step, ms, queries, status):
+        with self.lock:
+            self.samples[step].append((ms, queries))
+            self.statuses[(step, status)] += 1
+
+
+class Cashier:
+    """
+    Bitta kassa ssenariysi: nom bo'yicha qidiradi, ``lines`` ta mahsulot qo'shadi, bittasining
+    sonini oshiradi va chekni yakunlaydi. Qoldiq yetmasa (400) savat tozalanib keyingisiga o'tiladi.
+    """
+
+    def __init__(self, transport, product_ids, prefix, results, rng, lines=3):
+        self.transport = transport
+        self.product_ids = product_ids
+        self.prefix = prefix
+        self.results = results
+        self.rng = rng
+        self.lines = lines
+
+    def call(self, step, method, path, data=None, xhr=False):
+        started = time.perf_counter()
+        try:
+            status, body, queries = self.transport.request(method, path, data, xhr)
+        except Exception as e:  # tarmoq/ulanish xatosi ham natijaga yoziladi
+            status, body, queries = 0, str(e).encode(), None
+        self.results.add(step, (time.perf_counter() - started) * 1000, queries, status)
+        if status == 0 or status >= 500:
+            # DEBUG sahifasida istisno nomi <title> da: "OperationalError at /cart/checkout/"
+            title = TITLE_RE.search(body)
+            detail = ' '.join((title.group(1) if title else body[:120]).decode(errors='replace').split())
+            with self.results.lock:
+                self.results.errors[f"{step}: {status} {detail}"] += 1
+        return status, body
+
+    def iteration(self):
+        # Mahsulot nomi seed tartibidagi raqamdan: "<prefix> mahsulot <i>"
+        indexes = self.rng.sample(range(len(self.product_ids)), min(self.lines, len(self.product_ids)))
+        picks = [self.product_ids[i] for i in indexes]
+        self.call('search', 'get', reverse('kassa'), {'q': f"{self.prefix} mahsulot {indexes[0]}"})
+        for pid in picks:
+            self.call('add', 'post', reverse('cart_add', args=[pid]), {'quantity': 1}, xhr=True)
+        self.call('update', 'post', reverse('cart_update', args=[picks[0]]), {'action': 'add'}, xhr=True)
+        status, body = self.call('checkout', 'post', reverse('cart_checkout'), xhr=True)
+        if status == 200:
+            sale_id = SALE_ID_RE.search(json.loads(body).get('message', ''))
+            with self.results.lock:
+                self.results.checkouts += 1
+                if sale_id:
+                    self.results.sale_ids.append(int(sale_id.group(1)))
+        elif status == 400:
+            # Qoldiq yetmadi yoki muddati o'tgan — kutilgan rad etish, savat bo'shatiladi
+            with self.results.lock:
+                self.results.rejected += 1
+            self.transport.request('post', reverse('cart_clear'), xhr=True)
+
+
+def run(transports, product_ids, prefix, iterations=None, duration=None, lines=3, seed=0):
+    """
+    Har bir transport uchun alohida oqim (bitta bo'lsa — joriy oqimda). ``iterations`` yoki
+    ``duration`` (soniya) tugaguncha ssenariy takrorlanadi. (Results, umumiy soniya) qaytaradi.
+    """
+    results = Results()
+    barrier = threading.Barrier(len(transports))
+    deadline = [None]
+
+    def worker(number, transport):
+        cashier = Cashier(transport, product_ids, prefix, results, random.Random(seed * 1000 + number), lines)
+        try:
+            barrier.wait()
+            done = 0
+            while True:
+                if iterations is not None and done >= iterations:
+                    break
+                if duration is not None and time.monotonic() >= deadline[0]:
+                    break
+                cashier.iteration()
+                done += 1
+        finally:
+            if len(transports) > 1:
+                transport.close()
+
+    started = time.monotonic()
+    deadline[0] = started + (duration or 0)
+    if len(transports) == 1:
+        worker(0, transports[0])
+    else:
+        threads = [threading.Thread(target=worker, args=(i, t)) for i, t in enumerate(transports)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    return results, time.monotonic() - started
+
+
+# --- Izchillik tekshiruvi ---------------------------------------------------
+
+def check_consistency(product_ids, initial_stock, results, users, last_sale_id):
+    """
+    Sotuvdan keyingi holat bazadan tekshiriladi: manfiy qoldiq (oversell) bo'lmasligi, kesh va
+    ombor qoldiqlari jurnal bilan mos bo'lishi, kamaygan qoldiq yuklama davridagi cheklarga teng
+    bo'lishi va har bir yozilgan chek kassirga muvaffaqiyatli javob sifatida qaytgani.
+    """
+    problems = []
+    negative = Product.objects.filter(pk__in=product_ids, stock__lt=0).count()
+    negative += StockBalance.objects.filter(product_id__in=product_ids, quantity__lt=0).count()
+    if negative:
+        problems.append(f"{negative} ta manfiy qoldiq (oversell)")
+    ids = set(product_ids)
+    drift = [row for row in stock.ledger_drift() if row[0] in ids]
+    balance_drift = [row for row in stock.balance_drift() if row[0] in ids]
+    if drift or balance_drift:
+        problems.append(f"jurnaldan farq: {len(drift)} ta mahsulot, {len(balance_drift)} ta ombor qoldig'i")
+    final_stock = total_stock(product_ids)
+    balances = StockBalance.objects.filter(product_id__in=product_ids).aggregate(s=Sum('quantity'))['s'] or 0
+    if balances != final_stock:
+        problems.append(f"ombor qoldiqlari yig'indisi {balances}, Product.stock yig'indisi {final_stock}")
+    new_sales = Sale.objects.filter(pk__gt=last_sale_id, created_by__in=users)
+    sold = SaleItem.objects.filter(sale__in=new_sales).aggregate(s=Sum('quantity'))['s'] or 0
+    if initial_stock - final_stock != sold:
+        problems.append(f"qoldiq {initial_stock - final_stock} ga kamaydi, cheklarda {sold} ta sotilgan")
+    unacknowledged = new_sales.exclude(pk__in=results.sale_ids).count()
+    if unacknowledged:
+        # Chek yozilgan, lekin kassir xato javob oldi: qayta urinish ikki marta sotadi
+        problems.append(f"{unacknowledged} ta chek yozilgan, lekin kassirga xato qaytgan")
+    return problems
+
+
+def last_sale_id():
+    return Sale.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+
+
+def report(results, elapsed, cashiers):
+    # Qadamlar bo'yicha: soni, p50/p99/max ms, o'rtacha va eng ko'p SQL so'rovlar
+    steps = {}
+    for step in STEPS:
+        samples = results.samples.get(step, [])
+        timings = sorted(ms for ms, _ in samples)
+        queries = [q for _, q in samples if q is not None]
+        steps[step] = {
+            'count': len(samples),
+            'p50_ms': round(percentile(timings, 0.50), 1),
+            'p99_ms': round(percentile(timings, 0.99), 1),
+            'max_ms': round(timings[-1], 1) if timings else 0.0,
+            'queries_avg': round(sum(queries) / len(queries), 1) if queries else None,
+            'queries_max': max(queries) if queries else None,
+        }
+    requests = sum(step['count'] for step in steps.values())
+    return {
+        'vendor': connection.vendor,
+        'cashiers': cashiers,
+        'seconds': round(elapsed, 2),
+        'requests': requests,
+        'requests_per_second': round(requests / elapsed, 1) if elapsed else 0.0,
+        'checkouts': results.checkouts,
+        'checkouts_per_second': round(results.checkouts / elapsed, 1) if elapsed else 0.0,
+        'rejected': results.rejected,
+        'errors': sum(results.errors.values()),
+        'error_samples': [f"{count}× {error}" for error, count in results.errors.most_common(5)],
+        'steps': steps,
+    }
+
+
+def total_stock(product_ids):
+    return Product.objects.filter(pk__in=product_ids).aggregate(s=Sum('stock'))['s'] or 0
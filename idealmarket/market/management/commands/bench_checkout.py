@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from market.bench import measure, rolled_back, seed_products
+from market.checkout import checkout_cart
+
+
+class Command(BaseCommand):
+    help = "Chek yakunlash (checkout) uchun SQL so'rovlar soni va vaqtini savat hajmi bo'yicha o'lchaydi"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1, 5, 20, 50, 100])
+
+    def handle(self, *args, **options):
+        sizes = sorted(options['sizes'])
+        with rolled_back():
+            ids = seed_products(max(sizes))
+            self.stdout.write(f"{'savat':>8} {'so‘rovlar':>10} {'ms':>10}")
+            for size in sizes:
+                cart = {str(pid): 1 for pid in ids[:size]}
+                _, queries, elapsed = measure(checkout_cart, cart)
+                self.stdout.write(f"{size:>8} {queries:>10} {elapsed:>10.1f}")
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from market.bench import measure, rolled_back, seed_products
+from market.search import search_products
+
+
+class Command(BaseCommand):
+    help = "Kassa qidiruvini turli katalog hajmlarida o'lchaydi (so'rovlar soni va ms)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000])
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'katalog':>8} {'holat':<12} {'so‘rovlar':>10} {'natija':>7} {'ms':>9}")
+        for size in options['sizes']:
+            with rolled_back():
+                seed_products(size)
+                cases = [
+                    ('bo‘sh', ''),
+                    ('barcode', f"BENCH{size // 2:08d}"),
+                    ('prefiks', 'bench mahsulot 12'),
+                    ('matn', 'mahsulot'),
+                    ('topilmadi', 'yoqmahsulot'),
+                ]
+                for label, query in cases:
+                    timings = []
+                    for _ in range(options['repeat']):
+                        page, queries, elapsed = measure(search_products, query)
+                        timings.append(elapsed)
+                    self.stdout.write(
+                        f"{size:>8} {label:<12} {queries:>10} {len(page.products):>7} {min(timings):>9.2f}"
+                    )
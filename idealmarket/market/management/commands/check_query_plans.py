@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from market import queryplans
+
+
+class Command(BaseCommand):
+    help = ("Kassa, cheklar tarixi, sinxronizatsiya va navbatdagi issiq so'rovlarni EXPLAIN qiladi; "
+            "birortasi jadvalni to'liq o'qisa (full scan) xato bilan chiqadi")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--show', action='store_true', help="Har bir so'rov rejasini chiqarish")
+
+    def handle(self, *args, **options):
+        failed = []
+        for name, plan, scans in queryplans.check():
+            if scans:
+                failed.append(name)
+                self.stdout.write(self.style.ERROR(f"✗ {name}: to'liq o'qish — {', '.join(scans)}"))
+            else:
+                self.stdout.write(f"✓ {name}")
+            if options['show'] or scans:
+                for line in plan.splitlines():
+                    self.stdout.write(f"    {line}")
+        if failed:
+            raise CommandError(f"{len(failed)} ta so'rov indekssiz bajariladi ({connection.vendor}).")
+        self.stdout.write(self.style.SUCCESS("Barcha issiq so'rovlar indeks orqali bajariladi."))
@@ -0,0 +1,93 @@
+import json
+import logging
+import secrets
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from market import loadtest
+
+
+class Command(BaseCommand):
+    help = ("Kassa yuklama testi: N ta mahsulot va M ta tarixiy chek tayyorlaydi, K ta kassir parallel "
+            "qidiruv -> savatga qo'shish -> chek ssenariysini bajaradi; tezlik, p50/p99, SQL soni va "
+            "qoldiq izchilligini chiqaradi")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=1000)
+        parser.add_argument('--sales', type=int, default=1000, help="Tarixiy cheklar soni")
+        parser.add_argument('--cashiers', type=int, default=4, help="Parallel kassirlar (oqimlar) soni")
+        parser.add_argument('--iterations', type=int, default=25, help="Har bir kassir uchun ssenariylar soni")
+        parser.add_argument('--duration', type=float, help="Soniya: berilsa --iterations o'rniga vaqt bo'yicha")
+        parser.add_argument('--lines', type=int, default=3, help="Har bir chekdagi mahsulotlar soni")
+        parser.add_argument('--stock', type=int, default=1000,
+                            help="Har bir mahsulot qoldig'i (kichik qiymat — qoldiq uchun raqobat)")
+        parser.add_argument('--hot', type=int, help="Kassirlar faqat birinchi shuncha mahsulotni sotadi")
+        parser.add_argument('--url', help="Ishlayotgan server manzili (masalan http://127.0.0.1:8000); "
+                                          "berilmasa so'rovlar jarayon ichida bajariladi")
+        parser.add_argument('--prefix', default='LOAD')
+        parser.add_argument('--seed', type=int, default=0, help="Tasodifiy tanlovlar uchun urug'")
+        parser.add_argument('--keep', action='store_true', help="Yuklama ma'lumotlarini oxirida o'chirmaslik")
+        parser.add_argument('--json', help="Natijani JSON faylga yozish (SQLite/PostgreSQL solishtirish uchun)")
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        if loadtest.Product.objects.filter(barcode__startswith=prefix).exists():
+            raise CommandError(f"{prefix} prefiksli mahsulotlar bor: avvalgi yuklama ma'lumotlarini o'chiring "
+                               f"yoki boshqa --prefix bering.")
+        password = secrets.token_urlsafe(12)
+        self.stdout.write(f"Baza: {connection.vendor}. Ma'lumot tayyorlanmoqda...")
+        product_ids, users = loadtest.seed(
+            prefix, options['products'], options['sales'], options['cashiers'], options['stock'], password,
+            lines=options['lines'],
+        )
+        try:
+            hot = product_ids[:options['hot']] if options['hot'] else product_ids
+            initial = loadtest.total_stock(product_ids)
+            last_sale_id = loadtest.last_sale_id()
+            if options['url']:
+                transports = [loadtest.HttpTransport(options['url'], u.username, password) for u in users]
+            else:
+                transports = [loadtest.LocalTransport(u) for u in users]
+            duration = options['duration']
+            # 400/500 javoblar xulosada sanaladi; har biri uchun log yozuvi chiqishni ko'mib yubormasin
+            request_logger = logging.getLogger('django.request')
+            level = request_logger.level
+            request_logger.setLevel(logging.CRITICAL)
+            try:
+                results, elapsed = loadtest.run(
+                    transports, hot, prefix, iterations=None if duration else options['iterations'],
+                    duration=duration, lines=options['lines'], seed=options['seed'],
+                )
+            finally:
+                request_logger.setLevel(level)
+            summary = loadtest.report(results, elapsed, len(users))
+            summary['problems'] = loadtest.check_consistency(product_ids, initial, results, users, last_sale_id)
+        finally:
+            if not options['keep']:
+                loadtest.cleanup(prefix)
+
+        self.print_summary(summary)
+        if options['json']:
+            with open(options['json'], 'w', encoding='utf-8') as fp:
+                json.dump(summary, fp, ensure_ascii=False, indent=2)
+        if summary['problems']:
+            raise CommandError("Izchillik xatolari: " + "; ".join(summary['problems']))
+
+    def print_summary(self, summary):
+        self.stdout.write(
+            f"{summary['cashiers']} kassir, {summary['seconds']} s: {summary['requests']} so'rov "
+            f"({summary['requests_per_second']}/s), {summary['checkouts']} chek ({summary['checkouts_per_second']}/s), "
+            f"{summary['rejected']} rad etildi, {summary['errors']} xato"
+        )
+        self.stdout.write(f"{'qadam':<10} {'soni':>7} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'SQL o‘rt':>9} {'SQL max':>8}")
+        for step, row in summary['steps'].items():
+            self.stdout.write(
+                f"{step:<10} {row['count']:>7} {row['p50_ms']:>8} {row['p99_ms']:>8} {row['max_ms']:>8} "
+                f"{'-' if row['queries_avg'] is None else row['queries_avg']:>9} "
+                f"{'-' if row['queries_max'] is None else row['queries_max']:>8}"
+            )
+        for sample in summary['error_samples']:
+            self.stdout.write(self.style.WARNING(sample))
+        if not summary['problems']:
+            self.stdout.write(self.style.SUCCESS("Qoldiqlar izchil: oversell yo'q, jurnal va cheklar mos."))
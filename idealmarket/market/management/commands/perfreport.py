@@ -0,0 +1,52 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand
+
+from market import perf
+
+
+class Command(BaseCommand):
+    help = ("Barcha jarayonlar yozgan perf snapshot'laridan URL nomi bo'yicha javob vaqti, "
+            "SQL soni va takroriy so'rovlar jadvalini chiqaradi")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sort', choices=sorted(perf.SORT_KEYS), default='latency')
+        parser.add_argument('--limit', type=int, default=30, help="Nechta URL ko'rsatilsin")
+        parser.add_argument('--slow', type=int, default=10, help="Nechta so'nggi sekin so'rov ko'rsatilsin")
+        parser.add_argument('--reset', action='store_true', help="Snapshot fayllarini o'chiradi")
+
+    def handle(self, *args, **options):
+        if options['reset']:
+            perf.reset()
+            self.stdout.write(self.style.SUCCESS("Perf snapshot'lari o'chirildi."))
+            return
+
+        stats, slow = perf.collect()
+        if not stats:
+            self.stdout.write("Ma'lumot yo'q: PerfMiddleware hali snapshot yozmagan.")
+            return
+        rows = sorted(perf.summary_rows(stats), key=lambda row: row[perf.SORT_KEYS[options['sort']]], reverse=True)
+        self.stdout.write(
+            f"{'URL nomi':<36} {'soni':>7} {'o‘rt ms':>8} {'p95 ms':>7} {'max ms':>8} "
+            f"{'SQL':>6} {'SQL max':>7} {'takror':>6} {'N+1':>6} {'shablon':>8}"
+        )
+        for row in rows[:options['limit']]:
+            p95 = row['latency_p95_ms']
+            self.stdout.write(
+                f"{row['name'][:36]:<36} {row['count']:>7} {row['latency_avg_ms']:>8} "
+                f"{'>' + str(perf.LATENCY_BUCKETS[-1]) if p95 is None else p95:>7} {row['latency_max_ms']:>8} "
+                f"{row['queries_avg']:>6} {row['queries_max']:>7} {row['duplicates_avg']:>6} "
+                f"{row['duplicate_requests']:>6} {row['template_avg_ms']:>8}"
+            )
+
+        if slow and options['slow']:
+            self.stdout.write("")
+            self.stdout.write("So'nggi sekin so'rovlar:")
+            for row in slow[:options['slow']]:
+                at = datetime.fromtimestamp(row['at']).strftime('%Y-%m-%d %H:%M:%S')
+                self.stdout.write(
+                    f"{at} {row['path']} ({row['name']}): {row['latency_ms']} ms, "
+                    f"{row['queries']} SQL, {row['duplicates']} takroriy"
+                )
+                for sql, count in row['repeated']:
+                    self.stdout.write(f"    {count}× {sql}")
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from market import rollups
+from market.models import ReceiptRollup, SalesRollup
+
+
+class Command(BaseCommand):
+    help = "Statistika yig'ma jadvallarini (SalesRollup, ReceiptRollup) chek tarixidan qayta quradi"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--day', action='append', default=[],
+                            help="Faqat shu kunni qayta hisoblash (YYYY-MM-DD), bir necha marta berish mumkin")
+
+    def handle(self, *args, **options):
+        days = None
+        if options['day']:
+            days = [parse_date(value) for value in options['day']]
+            if None in days:
+                raise CommandError("Sana formati: YYYY-MM-DD")
+        rollups.rebuild(days)
+        self.stdout.write(self.style.SUCCESS(
+            f"Tayyor: {SalesRollup.objects.count()} ta mahsulot va {ReceiptRollup.objects.count()} ta chek yig'indisi."
+        ))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from market import stock
+
+
+class Command(BaseCommand):
+    help = ("Product.stock keshini va ombor qoldiqlarini (StockBalance) harakatlar jurnali (StockMovement) "
+            "bilan solishtiradi va farqni ko'rsatadi")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true',
+                            help="Farq bo'lsa, keshni jurnal yig'indisiga tenglashtirish")
+        parser.add_argument('--show', type=int, default=20,
+                            help="Nechta farqli mahsulot ko'rsatilsin")
+
+    def handle(self, *args, **options):
+        # Har biri bitta GROUP BY o'tishi; --fix ham shu natijalardan foydalanadi
+        drift = list(stock.ledger_drift())
+        balance_drift = stock.balance_drift()
+        for pk, barcode, cached, ledger in drift[:options['show']]:
+            self.stdout.write(f"#{pk} {barcode}: kesh {cached}, jurnal {ledger} (farq {ledger - cached:+d})")
+        for pk, ombor_id, quantity, ledger in balance_drift[:options['show']]:
+            self.stdout.write(f"#{pk} ombor {ombor_id}: qoldiq {quantity}, jurnal {ledger} (farq {ledger - quantity:+d})")
+        if not drift and not balance_drift:
+            self.stdout.write(self.style.SUCCESS("Barcha qoldiqlar jurnal bilan mos."))
+            return
+        if not options['fix']:
+            raise CommandError(
+                f"{len(drift)} ta mahsulotda umumiy qoldiq, {len(balance_drift)} ta ombor qoldig'i jurnaldan farq qiladi."
+            )
+        fixed = stock.fix_drift(drift, balance_drift)
+        self.stdout.write(self.style.SUCCESS(f"{fixed} ta qoldiq jurnal bo'yicha tuzatildi."))
@@ -0,0 +1,91 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from market import jobs, worker
+
+CLEANUP_INTERVAL = 60
+
+
+class Command(BaseCommand):
+    help = "Navbatdagi fon ishlarini (eksport/import) bajaradi. Tashqi broker kerak emas: navbat — Job jadvali"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=settings.JOB_WORKER_PROCESSES,
+                            help="Jarayonlar soni; 0 — ishlarni shu jarayonning o'zida bajarish")
+        parser.add_argument('--poll', type=float, default=settings.JOB_POLL_INTERVAL,
+                            help="Navbat bo'sh bo'lganda tekshirish oralig'i (soniya)")
+        parser.add_argument('--once', action='store_true',
+                            help="Navbatdagi ishlarni bajarib, navbat bo'shagach chiqish")
+
+    def handle(self, *args, **options):
+        processes = max(options['processes'], 0)
+        self.poll = options['poll']
+        self.once = options['once']
+        self.last_cleanup = 0
+        if processes == 0:
+            done = self.run_inline()
+        else:
+            done = self.run_pool(processes)
+        self.stdout.write(self.style.SUCCESS(f"Bajarilgan ishlar: {done}"))
+
+    def cleanup(self):
+        # Ishga tushganda ham (last_cleanup=0): oldingi worker yiqilganda qolgan ishlar shu yerda yopiladi
+        if time.monotonic() - self.last_cleanup >= CLEANUP_INTERVAL:
+            stale = jobs.fail_stale()
+            if stale:
+                self.stdout.write(f"To'xtab qolgan {stale} ta ish xato deb belgilandi")
+            removed = jobs.cleanup_expired()
+            if removed:
+                self.stdout.write(f"Muddati o'tgan {removed} ta natija o'chirildi")
+            self.last_cleanup = time.monotonic()
+
+    def report(self, job_id, status):
+        self.stdout.write(f"Job #{job_id}: {status}")
+
+    def run_inline(self):
+        done = 0
+        while True:
+            self.cleanup()
+            claimed = jobs.claim(1)
+            if not claimed:
+                if self.once:
+                    return done
+                time.sleep(self.poll)
+                continue
+            self.report(claimed[0], jobs.run_job(claimed[0]))
+            done += 1
+
+    def run_pool(self, processes):
+        done = 0
+        running = {}
+        # Ochiq ulanishlar bola jarayonlarga o'tmasligi kerak
+        connections.close_all()
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=processes, mp_context=context, initializer=worker.init) as pool:
+            while True:
+                self.cleanup()
+                free = processes - len(running)
+                if free > 0:
+                    for job_id in jobs.claim(free):
+                        running[pool.submit(worker.run, job_id)] = job_id
+                if not running:
+                    if self.once:
+                        return done
+                    time.sleep(self.poll)
+                    continue
+                finished, _ = wait(running, timeout=self.poll, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    job_id = running.pop(future)
+                    try:
+                        status = future.result()
+                    except Exception as e:
+                        # Jarayon o'zi yiqilgan bo'lsa ham ish "running"da qolib ketmasin
+                        jobs.fail(job_id, str(e))
+                        status = 'failed'
+                    self.report(job_id, status)
+                    done += 1
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import F, Q
+
+from market.models import Sale
+
+
+class Command(BaseCommand):
+    help = "Sale.total va Sale.item_count ni chek qatorlaridan to'ldiradi va tekshiradi"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help="Faqat tekshirish: farq bo'lsa xato bilan chiqadi")
+
+    def handle(self, *args, **options):
+        if not options['check']:
+            updated = Sale.objects.refresh_totals()
+            self.stdout.write(f"{updated} ta chek qayta hisoblandi.")
+
+        drift = (
+            Sale.objects.with_computed_totals()
+            .filter(~Q(total=F('computed_total')) | ~Q(item_count=F('computed_item_count')))
+            .values_list('pk', 'total', 'computed_total', 'item_count', 'computed_item_count')
+        )
+        bad = list(drift[:20])
+        if bad:
+            for pk, total, computed_total, item_count, computed_count in bad:
+                self.stdout.write(f"Chek #{pk}: summa {total} != {computed_total}, soni {item_count} != {computed_count}")
+            raise CommandError(f"{drift.count()} ta chekda saqlangan jami noto'g'ri.")
+        self.stdout.write(self.style.SUCCESS("Barcha cheklar jami to'g'ri."))
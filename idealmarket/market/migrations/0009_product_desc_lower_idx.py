@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:54
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market', '0008_alter_product_is_active_alter_product_r_price_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(django.db.models.functions.text.Lower('desc'), name='market_product_desc_lower_idx'),
+        ),
+    ]
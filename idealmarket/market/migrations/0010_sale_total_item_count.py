@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market', '0009_product_desc_lower_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sale',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Mahsulotlar soni'),
+        ),
+        migrations.AddField(
+            model_name='sale',
+            name='total',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Umumiy summa'),
+        ),
+    ]
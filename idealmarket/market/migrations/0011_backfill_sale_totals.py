@@ -0,0 +1,28 @@
+from django.db import migrations
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_sale_totals(apps, schema_editor):
+    Sale = apps.get_model('market', 'Sale')
+    SaleItem = apps.get_model('market', 'SaleItem')
+    money = DecimalField(max_digits=14, decimal_places=2)
+    items = SaleItem.objects.filter(sale=OuterRef('pk')).order_by().values('sale')
+    Sale.objects.update(
+        total=Coalesce(
+            Subquery(items.annotate(s=Sum(F('quantity') * F('price'), output_field=money)).values('s')),
+            Value(0), output_field=money,
+        ),
+        item_count=Coalesce(Subquery(items.annotate(s=Sum('quantity')).values('s')), Value(0)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market', '0010_sale_total_item_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_sale_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:58
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market', '0011_backfill_sale_totals'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['created_at', 'id'], name='market_sale_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['created_by', 'created_at', 'id'], name='market_sale_cashier_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+from itertools import islice
+
+from django.db import migrations
+
+
+def seed_changelog(apps, schema_editor):
+    # Mavjud katalog jurnalga bir marta yoziladi: since=0 bilan to'liq sinxronizatsiya qilish mumkin bo'ladi
+    ChangeLog = apps.get_model('market', 'ChangeLog')
+    for label, model_name in (('ombor', 'Ombor'), ('catagory', 'Catagory'), ('product', 'Product')):
+        model = apps.get_model('market', model_name)
+        ids = model.objects.order_by('pk').values_list('pk', flat=True).iterator(chunk_size=2000)
+        while chunk := list(islice(ids, 2000)):
+            ChangeLog.objects.bulk_create([ChangeLog(model=label, object_id=pk, action='upsert') for pk in chunk])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market', '0016_changelog'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_changelog, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:17
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market', '0017_seed_changelog'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('sale', 'Sotuv'), ('receipt', 'Kirim'), ('adjustment', 'Tuzatish'), ('transfer', "Ko'chirish")], max_length=10)),
+                ('quantity', models.IntegerField(verbose_name='Miqdor (+ kirim, − chiqim)')),
+                ('note', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movements', to='market.product')),
+                ('sale', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='movements', to='market.sale')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product', 'created_at'], name='market_stockmove_product_idx')],
+            },
+        ),
+    ]
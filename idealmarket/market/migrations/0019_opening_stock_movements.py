@@ -0,0 +1,26 @@
+from itertools import islice
+
+from django.db import migrations
+
+
+def opening_balances(apps, schema_editor):
+    # Jurnal bo'sh boshlanadi: mavjud qoldiqlar bitta "tuzatish" harakati sifatida yoziladi
+    Product = apps.get_model('market', 'Product')
+    StockMovement = apps.get_model('market', 'StockMovement')
+    rows = Product.objects.exclude(stock=0).order_by('pk').values_list('pk', 'stock').iterator(chunk_size=2000)
+    while chunk := list(islice(rows, 2000)):
+        StockMovement.objects.bulk_create([
+            StockMovement(product_id=pk, kind='adjustment', quantity=stock, note="Boshlang'ich qoldiq")
+            for pk, stock in chunk
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market', '0018_stock_movements'),
+    ]
+
+    operations = [
+        migrations.RunPython(opening_balances, migrations.RunPython.noop),
+    ]
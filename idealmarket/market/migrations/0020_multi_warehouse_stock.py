@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:20
+
+from itertools import islice
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_warehouses(apps, schema_editor):
+    # Hozirgacha har bir mahsulot bitta omborda edi: harakatlar va qoldiq shu omborga yoziladi
+    Product = apps.get_model('market', 'Product')
+    StockMovement = apps.get_model('market', 'StockMovement')
+    StockBalance = apps.get_model('market', 'StockBalance')
+    StockMovement.objects.filter(ombor__isnull=True).update(
+        ombor=Subquery(Product.objects.filter(pk=OuterRef('product_id')).values('ombor_id')[:1])
+    )
+    rows = Product.objects.order_by('pk').values_list('pk', 'ombor_id', 'stock').iterator(chunk_size=2000)
+    while chunk := list(islice(rows, 2000)):
+        StockBalance.objects.bulk_create([
+            StockBalance(product_id=pk, ombor_id=ombor_id, quantity=stock) for pk, ombor_id, stock in chunk
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market', '0019_opening_stock_movements'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stockmovement',
+            name='ombor',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='movements', to='market.ombor'),
+        ),
+        migrations.CreateModel(
+            name='Till',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('is_active', models.BooleanField(default=True)),
+                ('ombor', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='tills', to='market.ombor', verbose_name='Sotuv ombori')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StockBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField(default=0)),
+                ('ombor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balances', to='market.ombor')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balances', to='market.product')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('ombor', 'product'), name='market_stockbalance_key')],
+            },
+        ),
+        migrations.RunPython(backfill_warehouses, migrations.RunPython.noop),
+    ]
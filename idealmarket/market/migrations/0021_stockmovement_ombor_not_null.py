@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # 0020 dagi backfill'dan alohida: PostgreSQL'da deferrable FK yangilangan tranzaksiyada
+    # ALTER TABLE "pending trigger events" bilan yiqiladi
+
+    dependencies = [
+        ('market', '0020_multi_warehouse_stock'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='stockmovement',
+            name='ombor',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movements', to='market.ombor'),
+        ),
+    ]
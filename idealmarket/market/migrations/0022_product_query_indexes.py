@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:40
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market', '0021_stockmovement_ombor_not_null'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_active', 'start_date', 'end_date'], name='market_product_avail_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(django.db.models.functions.text.Lower('desc'), models.F('id'), condition=models.Q(('is_active', True)), name='market_product_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('end_date__isnull', False)), fields=['end_date'], name='market_product_expiry_idx'),
+        ),
+    ]
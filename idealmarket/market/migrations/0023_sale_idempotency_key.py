@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market', '0022_product_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sale',
+            name='idempotency_key',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:17
+
+import django.db.models.functions.comparison
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def merge_null_cashier_rows(apps, schema_editor):
+    # Eski kalitda NULL kassirli qatorlar to'qnashmagan va takrorlangan: yangi indeksdan oldin birlashtiriladi
+    for name, keys, sums in (
+        ('SalesRollup', ('day', 'hour', 'product_id', 'catagory_id'), ('quantity', 'revenue')),
+        ('ReceiptRollup', ('day', 'hour'), ('receipts', 'revenue')),
+    ):
+        model = apps.get_model('market', name)
+        orphans = model.objects.filter(cashier__isnull=True)
+        groups = (
+            orphans.values(*keys).annotate(rows=Count('id'), **{f'total_{f}': Sum(f) for f in sums})
+            .filter(rows__gt=1).order_by()
+        )
+        for group in list(groups):
+            key = {k: group[k] for k in keys}
+            orphans.filter(**key).delete()
+            model.objects.create(cashier=None, **key, **{f: group[f'total_{f}'] for f in sums})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market', '0023_sale_idempotency_key'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='receiptrollup',
+            name='market_receiptrollup_key',
+        ),
+        migrations.RemoveConstraint(
+            model_name='salesrollup',
+            name='market_salesrollup_key',
+        ),
+        migrations.RunPython(merge_null_cashier_rows, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='receiptrollup',
+            constraint=models.UniqueConstraint(models.F('day'), models.F('hour'), django.db.models.functions.comparison.Coalesce(models.F('cashier'), models.Value(0)), name='market_receiptrollup_key'),
+        ),
+        migrations.AddConstraint(
+            model_name='salesrollup',
+            constraint=models.UniqueConstraint(models.F('day'), models.F('hour'), models.F('product'), models.F('catagory'), django.db.models.functions.comparison.Coalesce(models.F('cashier'), models.Value(0)), name='market_salesrollup_key'),
+        ),
+    ]
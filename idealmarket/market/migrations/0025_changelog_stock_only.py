@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market', '0024_rollup_null_cashier_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='changelog',
+            name='stock_only',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='changelog',
+            index=models.Index(fields=['stock_only', 'id'], name='market_changelog_kind_idx'),
+        ),
+    ]
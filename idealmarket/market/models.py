@@ -1,16 +1,20 @@
 from django.db import models
+from django.db.models import DecimalField, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Lower
 from django.contrib.auth.models import User
 from django.utils import timezone
 
 class Catagory(models.Model):
     name = models.CharField(max_length=100)
     desc = models.TextField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
 
 class Ombor(models.Model):
     name = models.CharField(max_length=100)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
@@ -26,6 +30,22 @@ class Product(models.Model):
     start_date = models.DateField(default=timezone.now)
     end_date = models.DateField(blank=True, null=True)
     is_active = models.BooleanField(default=True, verbose_name="Faol (arxiv emas)")
+    # auto_now faqat save() da ishlaydi: QuerySet.update()/bulk_* yo'llari uni o'zi qo'yishi kerak
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Kassa qidiruvida nom bo'yicha prefiks (LOWER(desc) oraliq) qidiruvi uchun
+            models.Index(Lower('desc'), name='market_product_desc_lower_idx'),
+            # "shu vaqtdan beri o'zgarganlar" eksporti uchun
+            models.Index(fields=['updated_at', 'id'], name='market_product_updated_idx'),
+            # Sotuvdagi mahsulotlar filtri (available_products): faol + muddat oralig'i
+            models.Index(fields=['is_active', 'start_date', 'end_date'], name='market_product_avail_idx'),
+            # Kassa ro'yxati: faqat faol mahsulotlar, nom tartibida (arxivdagilar indeksga kirmaydi)
+            models.Index(Lower('desc'), F('id'), condition=Q(is_active=True), name='market_product_active_idx'),
+            # Muddati o'tganlar (statistika): muddatsiz mahsulotlar indeksga kirmaydi
+            models.Index(fields=['end_date'], condition=Q(end_date__isnull=False), name='market_product_expiry_idx'),
+        ]
 
     @property
     def is_available(self):
@@ -41,13 +61,50 @@ class Product(models.Model):
     def __str__(self):
         return f"{self.barcode} - {self.desc or ''}"
 
+def _sale_item_totals():
+    # Chek qatorlaridan hisoblanadigan (summa, miqdor) subquery ifodalari
+    money = DecimalField(max_digits=14, decimal_places=2)
+    items = SaleItem.objects.filter(sale=OuterRef('pk')).order_by().values('sale')
+    total = Coalesce(
+        Subquery(items.annotate(s=Sum(F('quantity') * F('price'), output_field=money)).values('s')),
+        Value(0), output_field=money,
+    )
+    item_count = Coalesce(Subquery(items.annotate(s=Sum('quantity')).values('s')), Value(0))
+    return total, item_count
+
+
+class SaleQuerySet(models.QuerySet):
+    def with_computed_totals(self):
+        total, item_count = _sale_item_totals()
+        return self.annotate(computed_total=total, computed_item_count=item_count)
+
+    def refresh_totals(self):
+        # Saqlangan total/item_count ni bitta UPDATE bilan qayta hisoblaydi
+        total, item_count = _sale_item_totals()
+        return self.update(total=total, item_count=item_count)
+
+
 class Sale(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    # Chek yozilayotganda to'ldiriladi, admin'da qatorlar o'zgarsa signal orqali yangilanadi
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Umumiy summa")
+    item_count = models.PositiveIntegerField(default=0, verbose_name="Mahsulotlar soni")
+    # Oflayn kassa chekni o'zi yaratgan kalit bilan yuboradi: qayta yuborilganda ikkinchi chek yozilmaydi
+    idempotency_key = models.CharField(max_length=64, null=True, blank=True, unique=True)
+
+    objects = SaleQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Cheklar tarixi: (created_at, id) keyset sahifalash va kassir filtri
+            models.Index(fields=['created_at', 'id'], name='market_sale_created_idx'),
+            models.Index(fields=['created_by', 'created_at', 'id'], name='market_sale_cashier_idx'),
+        ]
 
     @property
     def total_sum(self):
-        return sum(item.price * item.quantity for item in self.items.all())
+        return self.total
 
     def __str__(self):
         return f"Sale #{self.id} - {self.created_at.strftime('%Y-%m-%d %H:%M')}"
@@ -65,3 +122,147 @@ class SaleItem(models.Model):
 
     def __str__(self):
         return f"{self.product.barcode} ({self.quantity} x {self.price})"
+
+
+class SalesRollup(models.Model):
+    # Statistika uchun oldindan yig'ilgan sotuvlar: kun × soat × mahsulot × kategoriya × kassir
+    day = models.DateField()
+    hour = models.PositiveSmallIntegerField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    catagory = models.ForeignKey(Catagory, on_delete=models.CASCADE, related_name='+')
+    cashier = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    quantity = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+
+    class Meta:
+        # cashier NULL bo'lishi mumkin, NULL'lar esa indeksda teng emas: kalitda COALESCE(cashier, 0),
+        # aks holda kassirsiz cheklar uchun ON CONFLICT ishlamay, har safar yangi qator qo'shilardi
+        constraints = [
+            models.UniqueConstraint(F('day'), F('hour'), F('product'), F('catagory'), Coalesce(F('cashier'), Value(0)),
+                                    name='market_salesrollup_key'),
+        ]
+
+
+class ReceiptRollup(models.Model):
+    # Cheklar soni va tushum: kun × soat × kassir (bir chek bir nechta mahsulotni o'z ichiga oladi)
+    day = models.DateField()
+    hour = models.PositiveSmallIntegerField()
+    cashier = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    receipts = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(F('day'), F('hour'), Coalesce(F('cashier'), Value(0)),
+                                    name='market_receiptrollup_key'),
+        ]
+
+
+class Job(models.Model):
+    # Og'ir eksport/import ishlari uchun bazadagi navbat (manage.py runworker bajaradi)
+    PENDING, RUNNING, DONE, FAILED = 'pending', 'running', 'done', 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Navbatda'),
+        (RUNNING, 'Bajarilmoqda'),
+        (DONE, 'Tayyor'),
+        (FAILED, 'Xato'),
+    ]
+
+    kind = models.CharField(max_length=50)
+    params = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    message = models.TextField(blank=True)
+    result_file = models.CharField(max_length=255, blank=True)
+    result_name = models.CharField(max_length=255, blank=True)
+    content_type = models.CharField(max_length=100, blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='market_job_queue_idx'),
+            models.Index(fields=['expires_at'], name='market_job_expires_idx'),
+        ]
+
+    def __str__(self):
+        return f"Job #{self.id} {self.kind} ({self.status})"
+
+
+class ChangeLog(models.Model):
+    # Katalog o'zgarishlari jurnali (delta sinxronizatsiya). id o'sib boradi va mijoz uchun kursor bo'ladi.
+    UPSERT, DELETE = 'upsert', 'delete'
+    ACTION_CHOICES = [(UPSERT, "O'zgardi"), (DELETE, "O'chirildi")]
+
+    id = models.BigAutoField(primary_key=True)
+    model = models.CharField(max_length=20)
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=6, choices=ACTION_CHOICES, default=UPSERT)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Faqat qoldiq o'zgardi (checkout, kirim): kassa jadvali keshining katalog versiyasini oshirmaydi
+    stock_only = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            # Katalog versiyasi: stock_only=False bo'yicha oxirgi id bitta indeks qidiruvidan
+            models.Index(fields=['stock_only', 'id'], name='market_changelog_kind_idx'),
+        ]
+
+    def __str__(self):
+        return f"#{self.id} {self.model}:{self.object_id} {self.action}"
+
+
+class StockBalance(models.Model):
+    # Mahsulot × ombor qoldig'i. Product.stock — barcha omborlardagi qoldiqlar yig'indisi
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='balances')
+    ombor = models.ForeignKey(Ombor, on_delete=models.CASCADE, related_name='balances')
+    quantity = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            # (ombor, product) tartibi: kassa omboridagi qoldiqlar bitta indeks oralig'idan o'qiladi
+            models.UniqueConstraint(fields=['ombor', 'product'], name='market_stockbalance_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} @ {self.ombor_id}: {self.quantity}"
+
+
+class Till(models.Model):
+    # Kassa apparati; sotuv qaysi ombor qoldig'idan ayirilishini belgilaydi
+    name = models.CharField(max_length=100)
+    ombor = models.ForeignKey(Ombor, on_delete=models.PROTECT, related_name='tills', verbose_name="Sotuv ombori")
+    is_active = models.BooleanField(default=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.ombor})"
+
+
+class StockMovement(models.Model):
+    # Qoldiq harakatlari jurnali (faqat qo'shiladi). Product.stock — shu jurnal yig'indisining keshi.
+    SALE, RECEIPT, ADJUSTMENT, TRANSFER = 'sale', 'receipt', 'adjustment', 'transfer'
+    KIND_CHOICES = [
+        (SALE, 'Sotuv'),
+        (RECEIPT, 'Kirim'),
+        (ADJUSTMENT, 'Tuzatish'),
+        (TRANSFER, "Ko'chirish"),
+    ]
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='movements')
+    ombor = models.ForeignKey(Ombor, on_delete=models.CASCADE, related_name='movements')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    quantity = models.IntegerField(verbose_name="Miqdor (+ kirim, − chiqim)")
+    sale = models.ForeignKey(Sale, on_delete=models.SET_NULL, null=True, blank=True, related_name='movements')
+    note = models.CharField(max_length=255, blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['product', 'created_at'], name='market_stockmove_product_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.product_id}: {self.quantity:+d}"
@@ -0,0 +1,52 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+# Keyset (cursor) pagination uchun kursor: oxirgi qator kaliti base64 JSON ko'rinishida
+def encode_cursor(values):
+    raw = json.dumps(values, separators=(',', ':'), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        return None
+    return values if isinstance(values, list) else None
+
+
+def keyset_page(queryset, cursor, size, fields=('created_at', 'pk')):
+    """
+    ``fields`` bo'yicha kamayish tartibida keyset sahifa: OFFSET yo'q, shuning
+    uchun har qanday sahifa (created_at, id) indeksidan bir xil tezlikda o'qiladi.
+    Natija: (qatorlar, keyingi_kursor).
+    """
+    opts = queryset.model._meta
+    model_fields = [opts.pk if name == 'pk' else opts.get_field(name) for name in fields]
+    key = decode_cursor(cursor)
+    if key and len(key) == len(fields):
+        try:
+            values = [f.to_python(v) for f, v in zip(model_fields, key)]
+        except ValidationError:
+            values = None
+        if values:
+            condition = Q()
+            for i, name in enumerate(fields):
+                step = Q(**{f'{name}__lt': values[i]})
+                for prev_name, prev_value in zip(fields[:i], values[:i]):
+                    step &= Q(**{prev_name: prev_value})
+                condition |= step
+            queryset = queryset.filter(condition)
+    rows = list(queryset.order_by(*[f'-{name}' for name in fields])[:size + 1])
+    if len(rows) <= size:
+        return rows, None
+    last = rows[size - 1]
+    next_cursor = encode_cursor([f.value_to_string(last) for f in model_fields])
+    return rows[:size], next_cursor
@@ -0,0 +1,84 @@
+import zlib
+
+from reportlab.lib.pagesizes import A4
+
+# Juda kichik, oqimli PDF yozuvchi. reportlab'ning canvas'i butun hujjatni xotirada
+# ushlab, faqat save() da yozadi; bu yerda esa har bir sahifa tayyor bo'lishi bilan
+# baytlarga aylanib chiqib ketadi, xotirada faqat obyektlar ofsetlari qoladi.
+
+_CATALOG, _PAGES, _FONT, _FONT_BOLD = 1, 2, 3, 4
+_FONTS = {'Helvetica': 'F1', 'Helvetica-Bold': 'F2'}
+
+
+def _escape(text):
+    raw = str(text).encode('cp1252', errors='replace')
+    return raw.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+
+
+class Page:
+    def __init__(self):
+        self._ops = []
+        self._font = None
+
+    def set_font(self, name, size):
+        self._font = (name, size)
+        self._ops.append(b'/%s %d Tf' % (_FONTS[name].encode(), size))
+
+    def draw_string(self, x, y, text):
+        self._ops.append(b'BT %.2f %.2f Td (%s) Tj ET' % (x, y, _escape(text)))
+
+    def content(self):
+        return b'\n'.join(self._ops)
+
+
+class StreamingPDF:
+    def __init__(self, pagesize=A4):
+        self.width, self.height = pagesize
+        self._offset = 0
+        self._offsets = {}
+        self._next_id = 5
+        self._page_ids = []
+
+    def _object(self, number, body):
+        self._offsets[number] = self._offset
+        data = b'%d 0 obj\n%s\nendobj\n' % (number, body)
+        self._offset += len(data)
+        return data
+
+    def _raw(self, data):
+        self._offset += len(data)
+        return data
+
+    def begin(self):
+        return (
+            self._raw(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+            + self._object(_FONT, b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>')
+            + self._object(_FONT_BOLD, b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>')
+        )
+
+    def page(self, page):
+        stream = zlib.compress(page.content())
+        content_id, page_id = self._next_id, self._next_id + 1
+        self._next_id += 2
+        self._page_ids.append(page_id)
+        return (
+            self._object(content_id, b'<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream' % (len(stream), stream))
+            + self._object(page_id, (
+                b'<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %.2f %.2f] '
+                b'/Resources << /Font << /F1 %d 0 R /F2 %d 0 R >> >> /Contents %d 0 R >>'
+            ) % (_PAGES, self.width, self.height, _FONT, _FONT_BOLD, content_id))
+        )
+
+    def end(self):
+        kids = b' '.join(b'%d 0 R' % pid for pid in self._page_ids)
+        data = (
+            self._object(_PAGES, b'<< /Type /Pages /Kids [%s] /Count %d >>' % (kids, len(self._page_ids)))
+            + self._object(_CATALOG, b'<< /Type /Catalog /Pages %d 0 R >>' % _PAGES)
+        )
+        xref_offset = self._offset
+        size = self._next_id
+        xref = [b'xref\n0 %d\n' % size, b'0000000000 65535 f \n']
+        for number in range(1, size):
+            xref.append(b'%010d 00000 n \n' % self._offsets[number])
+        xref.append(b'trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (size, _CATALOG, xref_offset))
+        return data + b''.join(xref)
@@ -0,0 +1,313 @@
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from collections import Counter, deque
+from contextvars import ContextVar
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.backends.django import DjangoTemplates, Template
+
+logger = logging.getLogger(__name__)
+
+# Histogramma chegaralari: millisekund va so'rovlar soni uchun (oxirgi katak — "undan ko'p")
+LATENCY_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+SLOW_KEEP = 50  # har bir jarayonda saqlanadigan eng so'nggi sekin so'rovlar soni
+
+# Joriy so'rov o'lchovi; shablon vaqti backend orqali shu yerga qo'shiladi
+_current = ContextVar('perf_request', default=None)
+
+_lock = threading.Lock()
+_stats = {}
+_slow = deque(maxlen=SLOW_KEEP)
+_last_flush = time.monotonic()
+# Jarayon qayta ishga tushganda eski snapshot ustiga yozilmasin (pid qayta ishlatilishi mumkin)
+_snapshot_name = f"{os.getpid()}-{uuid.uuid4().hex[:8]}.json"
+
+
+class _Measure:
+    __slots__ = ('queries', 'sql', 'template_ms')
+
+    def __init__(self):
+        self.queries = 0
+        self.sql = Counter()
+        self.template_ms = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper: har bir SQL uchun bitta hisoblagich, parametrlarsiz matn bo'yicha.
+        # Bir xil matn qayta bajarilsa — takroriy so'rov (odatda sikl ichidagi N+1)
+        self.queries += 1
+        self.sql[sql] += 1
+        return execute(sql, params, many, context)
+
+    @property
+    def duplicates(self):
+        return self.queries - len(self.sql)
+
+
+def _histogram(buckets):
+    return [0] * (len(buckets) + 1)
+
+
+def _empty():
+    return {
+        'count': 0,
+        'latency_ms': {'sum': 0.0, 'max': 0.0, 'buckets': _histogram(LATENCY_BUCKETS)},
+        'queries': {'sum': 0, 'max': 0, 'buckets': _histogram(QUERY_BUCKETS)},
+        'duplicates': {'sum': 0, 'max': 0, 'requests': 0},
+        'template_ms': {'sum': 0.0, 'max': 0.0},
+    }
+
+
+def _observe(stat, value, buckets=None):
+    stat['sum'] += value
+    stat['max'] = max(stat['max'], value)
+    if buckets is not None:
+        stat['buckets'][bisect_left(buckets, value)] += 1
+
+
+def record(name, latency_ms, measure, path=''):
+    duplicates = measure.duplicates
+    with _lock:
+        stat = _stats.get(name)
+        if stat is None:
+            stat = _stats[name] = _empty()
+        stat['count'] += 1
+        _observe(stat['latency_ms'], latency_ms, LATENCY_BUCKETS)
+        _observe(stat['queries'], measure.queries, QUERY_BUCKETS)
+        _observe(stat['duplicates'], duplicates)
+        stat['duplicates']['requests'] += bool(duplicates)
+        _observe(stat['template_ms'], measure.template_ms)
+    if latency_ms >= settings.PERF_SLOW_MS:
+        repeated = [(sql[:200], n) for sql, n in measure.sql.most_common(3) if n > 1]
+        _slow.append({
+            'at': time.time(), 'name': name, 'path': path, 'latency_ms': round(latency_ms, 1),
+            'queries': measure.queries, 'duplicates': duplicates,
+            'template_ms': round(measure.template_ms, 1), 'repeated': repeated,
+        })
+        logger.warning("Sekin so'rov %s (%s): %.0f ms, %d SQL (%d takroriy)",
+                       path, name, latency_ms, measure.queries, duplicates)
+
+
+class PerfMiddleware:
+    """
+    Har bir so'rov uchun URL nomi bo'yicha: javob vaqti, SQL so'rovlar soni, takroriy
+    so'rovlar va shablon render vaqti. Natijalar jarayon xotirasidagi histogrammalarga
+    qo'shiladi va vaqti-vaqti bilan PERF_SNAPSHOT_DIR ga yoziladi (perfreport shu fayllarni
+    birlashtiradi). So'rov matni saqlanmaydi, faqat hisoblagichlar — DEBUG=False da ham yoqiq turadi.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not settings.PERF_ENABLED:
+            return self.get_response(request)
+        for conn in connections.all():
+            _install_hook(conn)
+        measure = _Measure()
+        token = _current.set(measure)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self._record(request, measure, start)
+        return response
+
+    async def __acall__(self, request):
+        # ASGI: view'ning SQL'i sync_to_async oqimlarida bajariladi; ContextVar u yerga ham o'tadi,
+        # hook esa o'sha oqimlardagi ulanishlarga connection_created orqali o'rnatilgan
+        if not settings.PERF_ENABLED:
+            return await self.get_response(request)
+        measure = _Measure()
+        token = _current.set(measure)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self._record(request, measure, start)
+        return response
+
+    @staticmethod
+    def _record(request, measure, start):
+        latency_ms = (time.perf_counter() - start) * 1000
+        match = request.resolver_match
+        record(match.view_name if match else '<404>', latency_ms, measure, request.path)
+        maybe_flush()
+
+
+def _measure_hook(execute, sql, params, many, context):
+    # Har bir ulanishda doimiy turadi; o'lchov faqat PerfMiddleware ichidagi so'rovlarda yoqiq
+    measure = _current.get()
+    if measure is None:
+        return execute(sql, params, many, context)
+    return measure(execute, sql, params, many, context)
+
+
+def _install_hook(connection, **kwargs):
+    if _measure_hook not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_measure_hook)
+
+
+connection_created.connect(_install_hook)
+
+
+class _TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        measure = _current.get()
+        if measure is None:
+            return super().render(context, request)
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            measure.template_ms += (time.perf_counter() - start) * 1000
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    # Oddiy DjangoTemplates, faqat render() vaqti PerfMiddleware o'lchoviga qo'shiladi
+    def from_string(self, template_code):
+        return _TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return _TimedTemplate(template.template, self)
+
+
+def snapshot():
+    with _lock:
+        return {
+            'pid': os.getpid(),
+            'written_at': time.time(),
+            'stats': json.loads(json.dumps(_stats)),
+            'slow': list(_slow),
+        }
+
+
+def snapshot_dir():
+    return Path(settings.PERF_SNAPSHOT_DIR)
+
+
+def flush():
+    global _last_flush
+    _last_flush = time.monotonic()
+    directory = snapshot_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / _snapshot_name
+    tmp = path.with_suffix('.tmp')
+    tmp.write_text(json.dumps(snapshot()))
+    # Atomar almashtirish: perfreport yarim yozilgan faylni o'qimaydi
+    os.replace(tmp, path)
+
+
+def maybe_flush():
+    if time.monotonic() - _last_flush < settings.PERF_FLUSH_INTERVAL:
+        return
+    try:
+        flush()
+    except OSError:
+        logger.exception("Perf snapshot yozilmadi")
+
+
+def reset():
+    with _lock:
+        _stats.clear()
+        _slow.clear()
+    for path in snapshot_dir().glob('*.json'):
+        path.unlink(missing_ok=True)
+
+
+def _merge_into(total, stats):
+    for name, stat in stats.items():
+        target = total.setdefault(name, _empty())
+        target['count'] += stat['count']
+        for key in ('latency_ms', 'queries', 'duplicates', 'template_ms'):
+            for field, value in stat[key].items():
+                if field == 'max':
+                    target[key]['max'] = max(target[key]['max'], value)
+                elif field == 'buckets':
+                    target[key]['buckets'] = [a + b for a, b in zip(target[key]['buckets'], value)]
+                else:
+                    target[key][field] += value
+
+
+def collect():
+    """
+    Barcha jarayonlarning snapshot fayllari va joriy jarayon xotirasi birlashtiriladi.
+    Joriy jarayonning o'z fayli o'tkazib yuboriladi — uning ma'lumoti xotiradan olinadi.
+    """
+    total, slow = {}, []
+    snapshots = [snapshot()]
+    for path in snapshot_dir().glob('*.json'):
+        if path.name == _snapshot_name:
+            continue
+        try:
+            snapshots.append(json.loads(path.read_text()))
+        except (OSError, ValueError):
+            continue
+    for snap in snapshots:
+        _merge_into(total, snap['stats'])
+        slow.extend(snap['slow'])
+    slow.sort(key=lambda row: row['at'], reverse=True)
+    return total, slow[:SLOW_KEEP]
+
+
+def percentile(buckets, bounds, fraction):
+    # Histogrammadan taxminiy persentil: katakning yuqori chegarasi (oxirgi katak uchun None)
+    count = sum(buckets)
+    if not count:
+        return 0
+    rank = fraction * count
+    seen = 0
+    for i, n in enumerate(buckets):
+        seen += n
+        if seen >= rank:
+            return bounds[i] if i < len(bounds) else None
+    return None
+
+
+def summary_rows(stats):
+    rows = []
+    for name, stat in stats.items():
+        count = stat['count'] or 1
+        rows.append({
+            'name': name,
+            'count': stat['count'],
+            'latency_avg_ms': round(stat['latency_ms']['sum'] / count, 1),
+            'latency_p50_ms': percentile(stat['latency_ms']['buckets'], LATENCY_BUCKETS, 0.5),
+            'latency_p95_ms': percentile(stat['latency_ms']['buckets'], LATENCY_BUCKETS, 0.95),
+            'latency_max_ms': round(stat['latency_ms']['max'], 1),
+            'queries_avg': round(stat['queries']['sum'] / count, 1),
+            'queries_max': stat['queries']['max'],
+            'duplicates_avg': round(stat['duplicates']['sum'] / count, 1),
+            'duplicates_max': stat['duplicates']['max'],
+            'duplicate_requests': stat['duplicates']['requests'],
+            'template_avg_ms': round(stat['template_ms']['sum'] / count, 1),
+        })
+    return rows
+
+
+SORT_KEYS = {
+    'latency': 'latency_avg_ms',
+    'queries': 'queries_avg',
+    'duplicates': 'duplicates_avg',
+    'count': 'count',
+    'template': 'template_avg_ms',
+}
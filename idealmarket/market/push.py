@@ -0,0 +1,120 @@
+"""
+Kassa uchun server push (Server-Sent Events). Har bir kassa sahifasi ``kassa/events/`` ga bitta
+uzoq ulanish ochadi va o'z savatining o'zgarishlarini (qator bo'yicha kichik delta) hamda
+savatdagi mahsulotlar qoldig'ining o'zgarishini oladi.
+
+Pub/sub jarayon ichida: obunachilar asyncio navbatlari, e'lon qilish esa istalgan oqimdan
+(sync view, checkout tranzaksiyasi) ``call_soon_threadsafe`` orqali. Shuning uchun kassalar bitta
+ASGI jarayoniga ulanishi kerak (masalan, ``uvicorn idealmarket.asgi:application``); boshqa
+jarayonlarda bo'lgan o'zgarishlar bu jarayon obunachilariga yetib bormaydi.
+"""
+import asyncio
+import json
+import threading
+from collections import defaultdict
+from contextlib import asynccontextmanager
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Product, StockBalance
+
+STOCK_CHANNEL = 'stock'
+PUSH_QUEUE_SIZE = 100
+PUSH_KEEPALIVE = 15  # soniya: proksi ulanishni uzmasligi uchun izoh qatori
+PUSH_RETRY_MS = 3000  # brauzer uzilgandan keyin qayta ulanish oralig'i
+
+_lock = threading.Lock()
+_subscribers = defaultdict(set)
+
+
+def cart_channel(cart_id):
+    return f"cart:{cart_id}"
+
+
+def has_subscribers(channel):
+    return bool(_subscribers.get(channel))
+
+
+def publish(channel, event):
+    with _lock:
+        targets = list(_subscribers.get(channel, ()))
+    for loop, queue in targets:
+        try:
+            loop.call_soon_threadsafe(_put, queue, (channel, event))
+        except RuntimeError:
+            # Obunachining event loop'i yopilgan: u o'zini navbatdan o'chirib ulgurmagan
+            pass
+
+
+def _put(queue, item):
+    if queue.full():
+        # Sekin mijoz: eng eski hodisa tashlanadi (delta'lar mutlaq qiymatli, keyingisi uni tuzatadi)
+        queue.get_nowait()
+    queue.put_nowait(item)
+
+
+@asynccontextmanager
+async def subscribe(*channels):
+    entry = (asyncio.get_running_loop(), asyncio.Queue(maxsize=PUSH_QUEUE_SIZE))
+    with _lock:
+        for channel in channels:
+            _subscribers[channel].add(entry)
+    try:
+        yield entry[1]
+    finally:
+        with _lock:
+            for channel in channels:
+                _subscribers[channel].discard(entry)
+                if not _subscribers[channel]:
+                    del _subscribers[channel]
+
+
+def stock_changed(product_ids):
+    """
+    Qoldig'i o'zgargan mahsulotlar (commit'dan keyin chaqiriladi). Kassa ulanmagan bo'lsa
+    so'rov yo'q; aks holda ombor qoldiqlari bitta so'rov bilan o'qiladi.
+    """
+    if not has_subscribers(STOCK_CHANNEL):
+        return
+    ids = list(product_ids)
+    homes = dict(Product.objects.filter(pk__in=ids).values_list('pk', 'ombor_id'))
+    balances = defaultdict(dict)
+    for pid, ombor_id, quantity in StockBalance.objects.filter(product_id__in=ids).values_list(
+            'product_id', 'ombor_id', 'quantity'):
+        balances[pid][ombor_id] = quantity
+    for pid, home in homes.items():
+        publish(STOCK_CHANNEL, {'product_id': pid, 'ombor_id': home, 'balances': balances[pid]})
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False)}\n\n"
+
+
+async def till_stream(cart_id, ombor_id, basket, keepalive=PUSH_KEEPALIVE):
+    """
+    Bitta kassa sahifasining SSE oqimi. ``basket`` — savatdagi mahsulotlar: qoldiq hodisalari
+    faqat ular uchun yuboriladi, savat delta'lari bilan birga yangilanib boradi. Qoldiq kassa
+    ombori bo'yicha, kassa tanlanmagan bo'lsa — mahsulotning asosiy ombori bo'yicha (checkout kabi).
+    """
+    basket = {int(pid) for pid in basket}
+    async with subscribe(cart_channel(cart_id), STOCK_CHANNEL) as queue:
+        yield f"retry: {PUSH_RETRY_MS}\n\n"
+        while True:
+            try:
+                channel, event = await asyncio.wait_for(queue.get(), keepalive)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            if channel == STOCK_CHANNEL:
+                if event['product_id'] in basket:
+                    source = ombor_id or event['ombor_id']
+                    yield _sse('stock', {'product_id': event['product_id'],
+                                         'available': event['balances'].get(source, 0)})
+                continue
+            if event.get('cleared'):
+                basket.clear()
+            elif event.get('quantity'):
+                basket.add(event['product_id'])
+            else:
+                basket.discard(event['product_id'])
+            yield _sse('cart', event)
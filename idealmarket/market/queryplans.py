@@ -0,0 +1,74 @@
+"""
+Issiq so'rovlar va ularning reja (EXPLAIN) tekshiruvi. ``manage.py check_query_plans``
+har bir so'rov indeks orqali bajarilishini tekshiradi: jadvalni to'liq o'qish (full scan)
+bo'lsa — xato. Kichik statistika jadvallari (rollup'lar) ataylab ro'yxatga kiritilmagan.
+"""
+import re
+from datetime import datetime, time, timedelta
+
+from django.db import connection, transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from .models import ChangeLog, Job, Product, Sale, SaleItem, StockBalance, StockMovement
+from .search import _prefix_q, available_products
+
+# SQLite: "SCAN market_product" (indekssiz), "SCAN t USING INDEX i" esa indeks bo'yicha o'qish
+_SQLITE_FULL_SCAN = re.compile(r'\bSCAN (\w+)(?! USING (?:COVERING )?INDEX)(?:\s|$)')
+_PG_FULL_SCAN = re.compile(r'Seq Scan on (\w+)')
+
+
+def _hot_queries():
+    today = timezone.localdate()
+    start = datetime.combine(today - timedelta(days=7), time.min, tzinfo=timezone.get_current_timezone())
+    available = available_products(today)
+    return [
+        ("Kassa ro'yxati (bo'sh qidiruv)",
+         available.annotate(desc_l=Lower('desc')).order_by('desc_l', 'pk')[:26]),
+        ("Kassa: aniq barcode", available.filter(barcode='4780000000001')),
+        ("Kassa: prefiks qidiruvi",
+         available.annotate(desc_l=Lower('desc')).filter(_prefix_q('cola', 'cola')).order_by('desc_l', 'pk')[:26]),
+        ("Muddati o'tgan mahsulotlar", Product.objects.filter(end_date__lt=today)),
+        ("O'zgargan mahsulotlar eksporti",
+         Product.objects.filter(updated_at__gte=start).order_by('updated_at', 'id')),
+        ("Cheklar tarixi", Sale.objects.order_by('-created_at', '-pk')[:51]),
+        ("Cheklar: sana oralig'i",
+         Sale.objects.filter(created_at__gte=start).order_by('-created_at', '-pk')[:51]),
+        ("Cheklar: kassir bo'yicha",
+         Sale.objects.filter(created_by_id=1).order_by('-created_at', '-pk')[:51]),
+        ("Chek qatorlari", SaleItem.objects.filter(sale_id=1)),
+        ("Sotuvda ishlatilgan mahsulotlar (bulk delete)",
+         SaleItem.objects.filter(product_id__in=[1, 2, 3]).values_list('product_id', flat=True).distinct()),
+        ("Ombor qoldig'i (kassa)", StockBalance.objects.filter(ombor_id=1, product_id__in=[1, 2, 3])),
+        ("Qoldiq harakatlari", StockMovement.objects.filter(product_id=1).order_by('-created_at')),
+        ("Delta sinxronizatsiya", ChangeLog.objects.filter(id__gt=0, id__lte=1000).order_by('id')[:501]),
+        ("Fon ishlari navbati", Job.objects.filter(status=Job.PENDING).order_by('created_at', 'id')[:4]),
+        ("Muddati o'tgan fon ishlari", Job.objects.filter(expires_at__lt=timezone.now())),
+    ]
+
+
+def full_scans(plan):
+    # Rejadagi to'liq o'qilgan jadvallar; FTS5 virtual jadvali (market_product_fts) hisobga olinmaydi
+    pattern = _PG_FULL_SCAN if connection.vendor == 'postgresql' else _SQLITE_FULL_SCAN
+    return sorted({table for table in pattern.findall(plan) if not table.endswith('_fts')})
+
+
+def explain(queryset):
+    if connection.vendor == 'postgresql':
+        # Bo'sh yoki kichik jadvalda planner Seq Scan'ni afzal ko'radi: uni o'chirib qo'yamiz,
+        # shunda ham Seq Scan chiqsa — mos indeks umuman yo'q
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+            return queryset.explain()
+    return queryset.explain()
+
+
+def check():
+    # [(nom, reja, to'liq_o'qilgan_jadvallar)]
+    results = []
+    for name, queryset in _hot_queries():
+        plan = explain(queryset)
+        results.append((name, plan, full_scans(plan)))
+    return results
+
@@ -0,0 +1,119 @@
+from datetime import datetime, time, timedelta
+
+import pandas as pd
+from django.db.models import Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+from .models import SalesRollup
+from .pdfstream import Page, StreamingPDF
+
+SALES_PDF_CHUNK_SIZE = 2000
+
+
+def filter_sales(sales, params):
+    # Sana oralig'i (mahalliy kunlar) va kassir filtri; filtrlangan queryset va qo'llangan filtrlar
+    filters = {}
+    date_from = parse_date(params.get('date_from') or '')
+    date_to = parse_date(params.get('date_to') or '')
+    cashier = str(params.get('cashier') or '')
+    tz = timezone.get_current_timezone()
+    if date_from:
+        sales = sales.filter(created_at__gte=datetime.combine(date_from, time.min, tzinfo=tz))
+        filters['date_from'] = date_from.isoformat()
+    if date_to:
+        sales = sales.filter(created_at__lt=datetime.combine(date_to + timedelta(days=1), time.min, tzinfo=tz))
+        filters['date_to'] = date_to.isoformat()
+    if cashier.isdigit():
+        sales = sales.filter(created_by_id=int(cashier))
+        filters['cashier'] = cashier
+    return sales, filters
+
+
+def sales_report_rows(sales):
+    # Har bir chek uchun bitta qator: (id, sana, kassir, summa) — qo'shimcha so'rovlarsiz
+    return (
+        sales.order_by('-created_at', '-id')
+        .values_list('id', 'created_at', 'created_by__username', 'total')
+        .iterator(chunk_size=SALES_PDF_CHUNK_SIZE)
+    )
+
+
+def sales_pdf(rows, title="Cheklar Tarixi (Sales History)"):
+    """
+    Cheklar tarixini PDF sifatida bo'lak-bo'lak (sahifama-sahifa) qaytaruvchi generator.
+    StreamingHttpResponse'ga ham, faylga yozishga ham to'g'ridan-to'g'ri beriladi.
+    """
+    pdf = StreamingPDF()
+    height = pdf.height
+    yield pdf.begin()
+
+    page = Page()
+    page.set_font("Helvetica-Bold", 14)
+    page.draw_string(200, height - 40, title)
+    y = height - 70
+    page.set_font("Helvetica", 10)
+    page.draw_string(30, y, "ID")
+    page.draw_string(70, y, "Sana")
+    page.draw_string(160, y, "Foydalanuvchi")
+    page.draw_string(250, y, "Umumiy summa")
+    y -= 15
+
+    for sale_id, created_at, username, total in rows:
+        page.draw_string(30, y, sale_id)
+        page.draw_string(70, y, timezone.localtime(created_at).strftime('%Y-%m-%d %H:%M'))
+        page.draw_string(160, y, username or "-")
+        page.draw_string(250, y, total)
+        y -= 14
+        if y < 40:
+            yield pdf.page(page)
+            page = Page()
+            page.set_font("Helvetica", 10)
+            y = height - 40
+
+    yield pdf.page(page)
+    yield pdf.end()
+
+
+def statistics_pdf(fp):
+    # Eng ko'p sotilgan mahsulotlar (yig'ma jadvaldan), reportlab bilan
+    p = canvas.Canvas(fp, pagesize=A4)
+    width, height = A4
+
+    p.setFont("Helvetica-Bold", 14)
+    p.drawString(200, height-40, "Statistika va Hisobotlar")
+    y = height - 70
+
+    # Eng ko‘p sotilgan mahsulotlar
+    p.setFont("Helvetica-Bold", 12)
+    p.drawString(30, y, "Eng ko‘p sotilgan mahsulotlar")
+    y -= 20
+    p.setFont("Helvetica", 10)
+
+    stats = (
+        SalesRollup.objects.values('product__desc')
+        .annotate(total=Sum('quantity'))
+        .order_by('-total')[:10]
+    )
+    p.drawString(30, y, "Mahsulot"); p.drawString(250, y, "Soni")
+    y -= 16
+    for row in stats:
+        p.drawString(30, y, (row['product__desc'] or '')[:30])
+        p.drawString(250, y, str(row['total']))
+        y -= 14
+        if y < 40: p.showPage(); y = height - 40
+
+    p.save()
+
+
+def statistics_excel(fp):
+    stats = (
+        SalesRollup.objects.values('product__desc')
+        .annotate(total=Sum('quantity'), total_sum=Sum('revenue'))
+        .order_by('-total')[:10]
+    )
+    df = pd.DataFrame(list(stats))
+    df.to_excel(fp, index=False)
+
@@ -0,0 +1,47 @@
+import threading
+import time
+
+# Foydalanuvchi guruhlari (rollari) uchun jarayon ichidagi kesh: har bir kassa sahifasida
+# auth_group bo'yicha so'rov bo'lmasin. A'zolik yoki guruh o'zgarganda signal orqali tozalanadi
+# (market.signals); TTL esa boshqa worker jarayonlaridagi o'zgarishlar uchun yuqori chegara.
+ROLES_CACHE_TTL = 60
+
+KASSIR_GROUP = 'Kassir'
+
+_lock = threading.Lock()
+_groups_by_user = {}
+
+
+def group_names(user):
+    if not user.is_authenticated:
+        return frozenset()
+    entry = _groups_by_user.get(user.pk)
+    if entry is not None and time.monotonic() - entry[1] < ROLES_CACHE_TTL:
+        return entry[0]
+    names = frozenset(user.groups.values_list('name', flat=True))
+    with _lock:
+        _groups_by_user[user.pk] = (names, time.monotonic())
+    return names
+
+
+def is_admin(user):
+    return user.is_superuser
+
+
+def is_kassir(user):
+    return KASSIR_GROUP in group_names(user)
+
+
+def is_kassir_or_admin(user):
+    return user.is_superuser or is_kassir(user)
+
+
+def forget(user_ids):
+    with _lock:
+        for user_id in user_ids:
+            _groups_by_user.pop(user_id, None)
+
+
+def clear():
+    with _lock:
+        _groups_by_user.clear()
@@ -0,0 +1,170 @@
+import threading
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Count, DecimalField, F, Sum
+from django.db.models.functions import ExtractHour, TruncDate
+from django.utils import timezone
+
+from .dbutils import upsert_add
+from .models import ReceiptRollup, Sale, SaleItem, SalesRollup
+
+ROLLUP_BATCH_SIZE = 500
+
+_MONEY = DecimalField(max_digits=16, decimal_places=2)
+
+
+def record_sale(sale, lines):
+    """
+    Yangi chekni yig'ma jadvallarga qo'shadi (checkout tranzaksiyasi ichida chaqiriladi).
+    ``lines``: (product, quantity, price) ro'yxati. So'rovlar soni qatorlar soniga bog'liq emas.
+    """
+    record_sales([(sale, lines)])
+
+
+def record_sales(sales):
+    # [(sale, lines), ...] — bir nechta chek (batch checkout): so'rovlar soni cheklar soniga bog'liq emas
+    per_product = defaultdict(lambda: [0, Decimal('0')])
+    per_receipt = defaultdict(lambda: [0, Decimal('0')])
+    for sale, lines in sales:
+        local = timezone.localtime(sale.created_at)
+        day = connection.ops.adapt_datefield_value(local.date())
+        hour = local.hour
+        cashier_id = sale.created_by_id
+        for product, quantity, price in lines:
+            acc = per_product[(day, hour, product.pk, product.catagory_id, cashier_id)]
+            acc[0] += quantity
+            acc[1] += price * quantity
+        acc = per_receipt[(day, hour, cashier_id)]
+        acc[0] += 1
+        acc[1] += sale.total
+    upsert_add(
+        SalesRollup, ['day', 'hour', 'product', 'catagory', 'cashier'], ['quantity', 'revenue'],
+        [(*key, qty, str(revenue)) for key, (qty, revenue) in per_product.items()], null_keys=['cashier'],
+    )
+    upsert_add(
+        ReceiptRollup, ['day', 'hour', 'cashier'], ['receipts', 'revenue'],
+        [(*key, receipts, str(revenue)) for key, (receipts, revenue) in per_receipt.items()], null_keys=['cashier'],
+    )
+
+
+def forget_cashier(user_id):
+    """
+    Kassir o'chirilmoqda: uning yig'indilari kassirsiz (NULL) qatorlarga qo'shiladi. SET_NULL'ni
+    kutsak, noyob kalit (COALESCE(cashier, 0)) mavjud kassirsiz qator bilan to'qnashadi.
+    """
+    with transaction.atomic():
+        upsert_add(
+            SalesRollup, ['day', 'hour', 'product', 'catagory', 'cashier'], ['quantity', 'revenue'],
+            [(connection.ops.adapt_datefield_value(day), hour, pid, cid, None, qty, str(revenue))
+             for day, hour, pid, cid, qty, revenue in SalesRollup.objects.filter(cashier_id=user_id).values_list(
+                 'day', 'hour', 'product_id', 'catagory_id', 'quantity', 'revenue')],
+            null_keys=['cashier'],
+        )
+        upsert_add(
+            ReceiptRollup, ['day', 'hour', 'cashier'], ['receipts', 'revenue'],
+            [(connection.ops.adapt_datefield_value(day), hour, None, receipts, str(revenue))
+             for day, hour, receipts, revenue in ReceiptRollup.objects.filter(cashier_id=user_id).values_list(
+                 'day', 'hour', 'receipts', 'revenue')],
+            null_keys=['cashier'],
+        )
+        SalesRollup.objects.filter(cashier_id=user_id).delete()
+        ReceiptRollup.objects.filter(cashier_id=user_id).delete()
+
+
+def rebuild(days=None):
+    """
+    Yig'ma jadvallarni xom SaleItem/Sale ma'lumotlaridan qayta quradi.
+    ``days`` berilsa, faqat o'sha kunlar (mahalliy vaqt bo'yicha) qayta hisoblanadi.
+    """
+    items = SaleItem.objects.all()
+    sales = Sale.objects.all()
+    sales_rollups = SalesRollup.objects.all()
+    receipt_rollups = ReceiptRollup.objects.all()
+    if days is not None:
+        days = list(days)
+        items = items.filter(sale__created_at__date__in=days)
+        sales = sales.filter(created_at__date__in=days)
+        sales_rollups = sales_rollups.filter(day__in=days)
+        receipt_rollups = receipt_rollups.filter(day__in=days)
+
+    item_rows = (
+        items.annotate(day=TruncDate('sale__created_at'), hour=ExtractHour('sale__created_at'))
+        .values('day', 'hour', 'product_id', 'product__catagory_id', 'sale__created_by_id')
+        .annotate(total_quantity=Sum('quantity'), total_revenue=Sum(F('quantity') * F('price'), output_field=_MONEY))
+        .order_by()
+    )
+    receipt_rows = (
+        sales.annotate(day=TruncDate('created_at'), hour=ExtractHour('created_at'))
+        .values('day', 'hour', 'created_by_id')
+        .annotate(total_receipts=Count('id'), total_revenue=Sum('total'))
+        .order_by()
+    )
+    with transaction.atomic():
+        sales_rollups.delete()
+        receipt_rollups.delete()
+        SalesRollup.objects.bulk_create(
+            (
+                SalesRollup(
+                    day=row['day'], hour=row['hour'], product_id=row['product_id'],
+                    catagory_id=row['product__catagory_id'], cashier_id=row['sale__created_by_id'],
+                    quantity=row['total_quantity'], revenue=row['total_revenue'],
+                )
+                for row in item_rows.iterator(chunk_size=2000)
+            ),
+            batch_size=ROLLUP_BATCH_SIZE,
+        )
+        ReceiptRollup.objects.bulk_create(
+            (
+                ReceiptRollup(
+                    day=row['day'], hour=row['hour'], cashier_id=row['created_by_id'],
+                    receipts=row['total_receipts'], revenue=row['total_revenue'],
+                )
+                for row in receipt_rows.iterator(chunk_size=2000)
+            ),
+            batch_size=ROLLUP_BATCH_SIZE,
+        )
+
+
+class _SalesRefresh:
+    # Tranzaksiya oxirida bir marta: o'zgargan cheklarning jami va ularning kunlari qayta hisoblanadi
+    def __init__(self):
+        self.sale_ids = set()
+        self.days = set()
+
+    def __call__(self):
+        if self.sale_ids:
+            Sale.objects.filter(pk__in=self.sale_ids).refresh_totals()
+            for created_at in Sale.objects.filter(pk__in=self.sale_ids).values_list('created_at', flat=True):
+                self.days.add(timezone.localdate(created_at))
+        if self.days:
+            rebuild(self.days)
+
+
+# Oqimning hali bajarilmagan yig'ma ishi (bir tranzaksiyadagi o'zgarishlar shu yerga yig'iladi)
+_pending = threading.local()
+
+
+def _run_pending():
+    job = getattr(_pending, 'job', None)
+    _pending.job = None
+    if job is not None:
+        job()
+
+
+def schedule_refresh(sale_id=None, day=None):
+    """
+    Admin'dagi tahrir/o'chirishlardan keyin (signal orqali) chaqiriladi. Har bir chaqiruv o'z
+    on_commit'ini qo'shadi, lekin o'zgarishlar oqimdagi bitta ishga yig'iladi: commit'dan keyin
+    birinchi callback hammasini bajaradi, qolganlari bo'sh. Rollback bo'lsa callback'lar tashlanadi,
+    yig'ilgan id/kunlar esa keyingi commit bilan qayta hisoblanadi (qayta hisoblash zararsiz).
+    """
+    job = getattr(_pending, 'job', None)
+    if job is None:
+        job = _pending.job = _SalesRefresh()
+    if sale_id is not None:
+        job.sale_ids.add(sale_id)
+    if day is not None:
+        job.days.add(day)
+    transaction.on_commit(_run_pending)
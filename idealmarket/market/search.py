@@ -0,0 +1,224 @@
+import logging
+import re
+from dataclasses import dataclass, field
+
+from django.db import DatabaseError, connection, connections
+from django.db.models import Q
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from .models import Product
+from .pagination import decode_cursor, encode_cursor
+
+logger = logging.getLogger(__name__)
+
+SEARCH_PAGE_SIZE = 25
+SEARCH_MAX_PAGE_SIZE = 100
+# To'liq matnli qidiruv faqat shu chuqurlikkacha varaqlanadi
+FULLTEXT_MAX_RESULTS = 200
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+@dataclass
+class SearchPage:
+    products: list = field(default_factory=list)
+    next_cursor: str = None
+
+
+def available_products(today=None):
+    today = today or timezone.localdate()
+    return Product.objects.filter(
+        is_active=True,
+        start_date__lte=today,
+    ).filter(
+        Q(end_date__isnull=True) | Q(end_date__gte=today)
+    )
+
+
+def _prefix_q(query, needle):
+    # LIKE 'abc%' o'rniga oraliq (>= 'abc', < 'abc\uffff'): bu barcode unique indeksi
+    # va LOWER(desc) ifoda indeksidan SQLite'da ham, PostgreSQL'da ham foydalanadi
+    return (
+        Q(desc_l__gte=needle, desc_l__lt=needle + '\uffff', desc_l__startswith=needle)
+        | Q(barcode__gte=query, barcode__lt=query + '\uffff', barcode__startswith=query)
+    )
+
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _search_state(cursor):
+    # Kursor mijozdan keladi: shakli buzuq bo'lsa (qo'lda yozilgan, eski versiya) birinchi sahifa
+    state = decode_cursor(cursor)
+    if state == ['b'] or state == ['p']:
+        return state
+    if (state and len(state) == 3 and state[0] == 'p' and isinstance(state[1], str)
+            and _is_int(state[2])):
+        return state
+    if state and len(state) == 2 and state[0] == 'f' and _is_int(state[1]) and state[1] >= 0:
+        return state
+    return ['b']
+
+
+def page_size(limit):
+    # Mijoz bergan limit [1, SEARCH_MAX_PAGE_SIZE] oralig'iga (kesh kaliti ham shu qiymatdan)
+    return max(1, min(int(limit), SEARCH_MAX_PAGE_SIZE))
+
+
+def search_products(query, cursor=None, limit=SEARCH_PAGE_SIZE):
+    """
+    Kassa qidiruvi: avval aniq barcode, keyin indeksli prefiks (nom yoki barcode),
+    oxirida reytingli to'liq matnli qidiruv. Natija ``limit`` bilan cheklangan
+    va kursor orqali varaqlanadi.
+    """
+    query = (query or '').strip()
+    limit = page_size(limit)
+    state = _search_state(cursor)
+    products = []
+    base = available_products().select_related('ombor')
+    needle = query.lower()
+
+    if state[0] == 'b':
+        if query:
+            products.extend(base.filter(barcode=query))
+        state = ['p']
+
+    if state[0] == 'p':
+        qs = base.annotate(desc_l=Lower('desc'))
+        if query:
+            qs = qs.filter(_prefix_q(query, needle)).exclude(barcode=query)
+        if len(state) == 3:
+            desc_l, last_id = state[1], state[2]
+            qs = qs.filter(Q(desc_l__gt=desc_l) | Q(desc_l=desc_l, pk__gt=last_id))
+        room = limit - len(products)
+        rows = list(qs.order_by('desc_l', 'pk')[:room + 1])
+        if len(rows) > room:
+            products.extend(rows[:room])
+            last = rows[room - 1] if room else None
+            next_state = ['p', last.desc_l, last.pk] if last else state
+            return SearchPage(products, encode_cursor(next_state))
+        products.extend(rows)
+        if not query:
+            return SearchPage(products)
+        state = ['f', 0]
+
+    if state[0] == 'f':
+        offset = state[1]
+        room = limit - len(products)
+        if room <= 0:
+            return SearchPage(products, encode_cursor(['f', offset]))
+        if offset >= FULLTEXT_MAX_RESULTS:
+            return SearchPage(products)
+        matched, exhausted = _fulltext_search(base, query, needle, room, offset)
+        products.extend(matched)
+        if not exhausted and offset + room < FULLTEXT_MAX_RESULTS:
+            return SearchPage(products, encode_cursor(['f', offset + room]))
+    return SearchPage(products)
+
+
+def _fulltext_search(base, query, needle, limit, offset):
+    # Prefiks bosqichida chiqqan mahsulotlar bu yerda takrorlanmaydi
+    ids = _fulltext_ids(query, limit, offset)
+    if ids is None:
+        qs = base.filter(Q(desc__icontains=query) | Q(barcode__icontains=query))
+        rows = list(qs.order_by('pk')[offset:offset + limit])
+        exhausted = len(rows) < limit
+    else:
+        by_id = base.in_bulk(ids)
+        rows = [by_id[pk] for pk in ids if pk in by_id]
+        exhausted = len(ids) < limit
+    rows = [
+        p for p in rows
+        if not (p.barcode.startswith(query) or (p.desc or '').lower().startswith(needle))
+    ]
+    return rows, exhausted
+
+
+def _fulltext_ids(query, limit, offset):
+    # Reyting bo'yicha tartiblangan id'lar; backend qo'llamasa None (icontains'ga qaytamiz)
+    if connection.vendor == 'sqlite':
+        tokens = _TOKEN_RE.findall(query)
+        if not tokens:
+            return []
+        match = ' '.join(f'"{token}"*' for token in tokens)
+        sql = (
+            "SELECT rowid FROM market_product_fts WHERE market_product_fts MATCH %s "
+            "ORDER BY rank LIMIT %s OFFSET %s"
+        )
+        params = [match, limit, offset]
+    elif connection.vendor == 'postgresql':
+        sql = (
+            'SELECT id FROM market_product WHERE "desc" %% %s OR barcode %% %s '
+            'ORDER BY GREATEST(similarity("desc", %s), similarity(barcode, %s)) DESC, id '
+            'LIMIT %s OFFSET %s'
+        )
+        params = [query, query, query, query, limit, offset]
+    else:
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [row[0] for row in cursor.fetchall()]
+    except DatabaseError:
+        logger.warning("To'liq matnli qidiruv indeksi topilmadi, icontains ishlatiladi", exc_info=True)
+        return None
+
+
+# SQLite FTS5 jadvali va triggerlari. Django SQLite'da ko'p AlterField/AddField
+# migratsiyalarida jadvalni qayta yaratadi va triggerlar yo'qoladi, shuning uchun
+# ular har bir migrate'dan keyin (post_migrate) tekshirilib, kerak bo'lsa tiklanadi.
+_SQLITE_FTS_TRIGGERS = {
+    'market_product_fts_ai': (
+        "CREATE TRIGGER market_product_fts_ai AFTER INSERT ON market_product BEGIN "
+        "INSERT INTO market_product_fts(rowid, \"desc\", barcode) VALUES (new.id, new.\"desc\", new.barcode); "
+        "END"
+    ),
+    'market_product_fts_ad': (
+        "CREATE TRIGGER market_product_fts_ad AFTER DELETE ON market_product BEGIN "
+        "INSERT INTO market_product_fts(market_product_fts, rowid, \"desc\", barcode) "
+        "VALUES ('delete', old.id, old.\"desc\", old.barcode); "
+        "END"
+    ),
+    'market_product_fts_au': (
+        "CREATE TRIGGER market_product_fts_au AFTER UPDATE OF \"desc\", barcode ON market_product BEGIN "
+        "INSERT INTO market_product_fts(market_product_fts, rowid, \"desc\", barcode) "
+        "VALUES ('delete', old.id, old.\"desc\", old.barcode); "
+        "INSERT INTO market_product_fts(rowid, \"desc\", barcode) VALUES (new.id, new.\"desc\", new.barcode); "
+        "END"
+    ),
+}
+
+
+def install_fulltext_index(using=None):
+    conn = connections[using or 'default']
+    try:
+        with conn.cursor() as cursor:
+            if conn.vendor == 'sqlite':
+                cursor.execute(
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS market_product_fts USING fts5("
+                    "\"desc\", barcode, content='market_product', content_rowid='id', "
+                    "tokenize='unicode61 remove_diacritics 2')"
+                )
+                cursor.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = %s", ['market_product']
+                )
+                existing = {row[0] for row in cursor.fetchall()}
+                missing = [name for name in _SQLITE_FTS_TRIGGERS if name not in existing]
+                for name in missing:
+                    cursor.execute(_SQLITE_FTS_TRIGGERS[name])
+                if missing:
+                    cursor.execute("INSERT INTO market_product_fts(market_product_fts) VALUES ('rebuild')")
+            elif conn.vendor == 'postgresql':
+                cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+                cursor.execute(
+                    'CREATE INDEX IF NOT EXISTS market_product_desc_trgm '
+                    'ON market_product USING gin ("desc" gin_trgm_ops)'
+                )
+                cursor.execute(
+                    'CREATE INDEX IF NOT EXISTS market_product_barcode_trgm '
+                    'ON market_product USING gin (barcode gin_trgm_ops)'
+                )
+    except DatabaseError:
+        logger.warning("To'liq matnli qidiruv indeksini o'rnatib bo'lmadi", exc_info=True)
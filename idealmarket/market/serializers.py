@@ -0,0 +1,35 @@
+from rest_framework import serializers
+
+from .checkout import IDEMPOTENCY_KEY_MAX_LENGTH
+
+
+class ReceiptSerializer(serializers.Serializer):
+    # Batch checkout'dagi bitta chek: {"idempotency_key": "...", "lines": {"<product_id>": miqdor},
+    # "prices": {"<product_id>": "narx"}} — prices: kassa (oflayn nusxadan) olgan narx, ixtiyoriy
+    idempotency_key = serializers.CharField(max_length=IDEMPOTENCY_KEY_MAX_LENGTH)
+    lines = serializers.DictField(child=serializers.IntegerField(min_value=1), allow_empty=False)
+    prices = serializers.DictField(child=serializers.DecimalField(max_digits=12, decimal_places=2),
+                                   required=False)
+
+    def _by_id(self, value):
+        try:
+            return {int(product_id): item for product_id, item in value.items()}
+        except ValueError:
+            raise serializers.ValidationError("Mahsulot id butun son bo'lishi kerak.")
+
+    def validate_lines(self, value):
+        return self._by_id(value)
+
+    def validate_prices(self, value):
+        return self._by_id(value)
+
+
+def error_messages(errors):
+    # {'lines': {'12': ['...']}} -> ["lines.12: ..."] (chek natijasida oddiy ro'yxat)
+    messages = []
+    for field, value in errors.items():
+        if isinstance(value, dict):
+            messages.extend(f"{field}.{message}" for message in error_messages(value))
+        else:
+            messages.extend(f"{field}: {message}" for message in value)
+    return messages
@@ -0,0 +1,68 @@
+from django.contrib.auth.models import Group, User
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import roles, rollups, sku_cache, sync
+from .models import Catagory, ChangeLog, Ombor, Product, Sale, SaleItem
+
+
+@receiver([post_save, post_delete], sender=Product)
+def product_changed(sender, instance, **kwargs):
+    sku_cache.forget(product_id=instance.pk, barcode=instance.barcode)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Catagory)
+@receiver(post_save, sender=Ombor)
+def catalogue_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        sync.record_changes(sender, [instance.pk])
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Catagory)
+@receiver(post_delete, sender=Ombor)
+def catalogue_deleted(sender, instance, **kwargs):
+    sync.record_changes(sender, [instance.pk], ChangeLog.DELETE)
+
+
+@receiver([post_save, post_delete], sender=SaleItem)
+def sale_item_changed(sender, instance, **kwargs):
+    # Checkout bulk_create ishlatadi (signal yo'q); bu faqat admin'dagi tahrirlar uchun.
+    # Chek jami va statistika yig'indilari tranzaksiya oxirida bir marta yangilanadi.
+    rollups.schedule_refresh(sale_id=instance.sale_id)
+
+
+@receiver(pre_delete, sender=Sale)
+def sale_deleted(sender, instance, **kwargs):
+    rollups.schedule_refresh(day=timezone.localdate(instance.created_at))
+
+
+@receiver(pre_delete, sender=User)
+def cashier_deleted(sender, instance, **kwargs):
+    rollups.forget_cashier(instance.pk)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def user_groups_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        roles.forget([instance.pk])
+    elif pk_set is not None:
+        roles.forget(pk_set)
+    else:
+        # group.user_set.clear(): qaysi foydalanuvchilar ekani noma'lum
+        roles.clear()
+
+
+@receiver([post_save, post_delete], sender=Group)
+def group_changed(sender, **kwargs):
+    # Nomi o'zgargan (masalan, 'Kassir' emas bo'lib qolgan) yoki o'chirilgan guruh
+    roles.clear()
+
+
+@receiver([post_save, post_delete], sender=User)
+def user_changed(sender, instance, **kwargs):
+    roles.forget([instance.pk])
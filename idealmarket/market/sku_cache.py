@@ -0,0 +1,91 @@
+import threading
+import time
+from collections import namedtuple
+
+from django.utils import timezone
+
+from . import sync
+from .models import Product
+
+# Skaner uchun barcode -> (id, narx, mavjudlik) jarayon ichidagi keshi.
+# Shu jarayondagi o'zgarishlar signal orqali darhol tozalanadi (market.signals). Boshqa jarayonlar
+# (runworker'dagi import, boshqa web worker'lar) uchun umumiy katalog versiyasi (ChangeLog) ko'pi bilan
+# SKU_VERSION_CHECK soniyada bir tekshiriladi: versiya oshgan bo'lsa kesh butunlay tashlanadi.
+# TTL — qo'shimcha yuqori chegara.
+SKU_CACHE_TTL = 300
+SKU_VERSION_CHECK = 1
+
+_FIELDS = ('id', 'desc', 's_price', 'is_active', 'start_date', 'end_date')
+
+
+class SkuEntry(namedtuple('SkuEntry', _FIELDS + ('loaded_at',))):
+    __slots__ = ()
+
+    @property
+    def is_available(self):
+        today = timezone.localdate()
+        if not self.is_active:
+            return False
+        if self.start_date and self.start_date > today:
+            return False
+        if self.end_date and self.end_date < today:
+            return False
+        return True
+
+
+_lock = threading.Lock()
+_by_barcode = {}
+_barcode_by_id = {}
+_version = None
+_version_checked_at = 0.0
+
+
+def _version_changed():
+    # Faqat keshdan javob berishdan oldin: miss yo'li baribir bazadan o'qiydi
+    global _version, _version_checked_at
+    now = time.monotonic()
+    if now - _version_checked_at < SKU_VERSION_CHECK:
+        return False
+    version = sync.catalogue_version()
+    _version_checked_at = now
+    if version == _version:
+        return False
+    clear()
+    _version = version
+    return True
+
+
+def lookup(barcode):
+    entry = _by_barcode.get(barcode)
+    if (entry is not None and time.monotonic() - entry.loaded_at < SKU_CACHE_TTL
+            and not _version_changed()):
+        return entry
+    row = Product.objects.filter(barcode=barcode).values_list(*_FIELDS).first()
+    if row is None:
+        return None
+    entry = SkuEntry(*row, time.monotonic())
+    with _lock:
+        stale = _barcode_by_id.get(entry.id)
+        if stale is not None and stale != barcode:
+            _by_barcode.pop(stale, None)
+        _by_barcode[barcode] = entry
+        _barcode_by_id[entry.id] = barcode
+    return entry
+
+
+def forget(product_id=None, barcode=None):
+    with _lock:
+        if product_id is not None:
+            barcode_for_id = _barcode_by_id.pop(product_id, None)
+            if barcode_for_id is not None:
+                _by_barcode.pop(barcode_for_id, None)
+        if barcode is not None:
+            entry = _by_barcode.pop(barcode, None)
+            if entry is not None:
+                _barcode_by_id.pop(entry.id, None)
+
+
+def clear():
+    with _lock:
+        _by_barcode.clear()
+        _barcode_by_id.clear()
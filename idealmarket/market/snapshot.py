@@ -0,0 +1,52 @@
+"""
+Oflayn kassa uchun katalog nusxasi. Kassa sahifasi nusxani brauzerda saqlaydi va qidiruvni
+o'zi bajaradi; aloqa bo'lganda ``?since=<versiya>`` bilan faqat o'zgargan mahsulotlarni oladi.
+Versiya — o'zgarishlar jurnalidagi kursor (market.sync). Ma'lumot ustunlar bo'yicha
+(``columns`` + ``rows``) yuboriladi: kalit nomlari har bir qatorda takrorlanmaydi.
+"""
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ChangeLog, Ombor, Product
+
+SNAPSHOT_COLUMNS = ('id', 'barcode', 'desc', 's_price', 'start_date', 'end_date', 'ombor_id')
+
+# Bundan ko'p mahsulot o'zgargan bo'lsa, farq o'rniga to'liq nusxa yuboriladi
+SNAPSHOT_MAX_DIFF = 5000
+
+
+def _sellable(today):
+    # Sotuv oynasini (start_date/end_date) kassa o'zi tekshiradi, shuning uchun hali boshlanmaganlar
+    # ham kiradi; faol bo'lmagan va muddati o'tganlari kirmaydi
+    return Product.objects.filter(Q(end_date__isnull=True) | Q(end_date__gte=today), is_active=True)
+
+
+def _rows(queryset):
+    return [
+        [pk, barcode, desc or '', str(price), start and start.isoformat(), end and end.isoformat(), ombor_id]
+        for pk, barcode, desc, price, start, end, ombor_id in queryset.order_by('pk').values_list(*SNAPSHOT_COLUMNS)
+    ]
+
+
+def build(since, latest):
+    """
+    ``since`` versiyasidan ``latest`` gacha bo'lgan farq: o'zgargan (sotiladigan) mahsulotlar
+    ``rows`` da, sotuvdan chiqqan yoki o'chirilganlari ``removed`` da. ``since`` 0 bo'lsa,
+    jurnaldan oldinda bo'lsa (baza qayta yaratilgan) yoki farq juda katta bo'lsa — to'liq nusxa.
+    """
+    today = timezone.localdate()
+    payload = {
+        'version': latest,
+        'columns': SNAPSHOT_COLUMNS,
+        'ombors': dict(Ombor.objects.values_list('pk', 'name')),
+    }
+    if 0 < since <= latest:
+        changed = set(
+            ChangeLog.objects.filter(id__gt=since, id__lte=latest, model='product')
+            .values_list('object_id', flat=True).distinct()[:SNAPSHOT_MAX_DIFF + 1]
+        )
+        if len(changed) <= SNAPSHOT_MAX_DIFF:
+            rows = _rows(_sellable(today).filter(pk__in=changed)) if changed else []
+            kept = {row[0] for row in rows}
+            return {**payload, 'full': False, 'rows': rows, 'removed': sorted(changed - kept)}
+    return {**payload, 'full': True, 'rows': _rows(_sellable(today)), 'removed': []}
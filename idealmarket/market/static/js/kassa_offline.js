@@ -0,0 +1,171 @@
+// Oflayn kassa: katalog nusxasi brauzerda (localStorage) saqlanadi va aloqa yo'qligida qidiruv shu
+// yerda bajariladi; oflayn yakunlangan cheklar navbatda turadi va aloqa tiklanganda
+// idempotency kaliti bilan yuboriladi (qayta yuborilsa server ikkinchi chek yozmaydi).
+(function(window){
+    'use strict';
+
+    var CATALOGUE_KEY = 'kassa.catalogue', QUEUE_KEY = 'kassa.receipts', FAILED_KEY = 'kassa.failedReceipts';
+    var CLEAR_CART_KEY = 'kassa.clearServerCart', BATCH_SIZE = 200;
+
+    function load(key, fallback){
+        try { return JSON.parse(window.localStorage.getItem(key)) || fallback; } catch(e){ return fallback; }
+    }
+    function save(key, value){
+        try { window.localStorage.setItem(key, JSON.stringify(value)); } catch(e){ /* joy tugagan */ }
+    }
+    function today(){
+        var d = new Date(), pad = function(n){ return (n < 10 ? '0' : '') + n; };
+        return d.getFullYear() + '-' + pad(d.getMonth() + 1) + '-' + pad(d.getDate());
+    }
+    function newKey(){
+        if(window.crypto && window.crypto.randomUUID){ return window.crypto.randomUUID(); }
+        return Date.now().toString(36) + '-' + Math.random().toString(36).slice(2);
+    }
+
+    function KassaOffline(options){
+        this.snapshotUrl = options.snapshotUrl;
+        this.batchUrl = options.batchUrl;
+        this.clearUrl = options.clearUrl;
+        this.csrfToken = options.csrfToken;
+        this.catalogue = load(CATALOGUE_KEY, {version: 0, products: {}, ombors: {}});
+        this.queue = load(QUEUE_KEY, []);
+        this.flushing = false;
+    }
+
+    // Katalog: since=versiya bilan faqat farq olinadi; o'zgarish bo'lmasa server 304 qaytaradi
+    KassaOffline.prototype.refresh = function(){
+        var self = this;
+        return window.fetch(this.snapshotUrl + '?since=' + this.catalogue.version, {credentials: 'same-origin'})
+            .then(function(response){ return response.status === 200 ? response.json() : null; })
+            .then(function(data){ if(data){ self.apply(data); } })
+            .catch(function(){ /* aloqa yo'q: eski nusxa bilan ishlaymiz */ });
+    };
+
+    KassaOffline.prototype.apply = function(data){
+        var products = data.full ? {} : this.catalogue.products, columns = data.columns;
+        data.rows.forEach(function(row){
+            var product = {};
+            columns.forEach(function(name, i){ product[name] = row[i]; });
+            products[product.id] = product;
+        });
+        data.removed.forEach(function(id){ delete products[id]; });
+        this.catalogue = {version: data.version, products: products, ombors: data.ombors};
+        save(CATALOGUE_KEY, this.catalogue);
+    };
+
+    KassaOffline.prototype.get = function(id){
+        return this.catalogue.products[id] || null;
+    };
+
+    // Serverdagi tartib: aniq barcode, keyin nom/barcode prefiksi, keyin nomi ichida uchraganlar
+    KassaOffline.prototype.search = function(query, limit){
+        var needle = (query || '').trim().toLowerCase(), day = today(), exact = [], prefix = [], rest = [];
+        Object.keys(this.catalogue.products).forEach(function(id){
+            var p = this.catalogue.products[id], desc = (p.desc || '').toLowerCase();
+            if((p.start_date && p.start_date > day) || (p.end_date && p.end_date < day)){ return; }
+            if(needle && p.barcode === query.trim()){ exact.push(p); }
+            else if(!needle || desc.indexOf(needle) === 0 || p.barcode.toLowerCase().indexOf(needle) === 0){ prefix.push(p); }
+            else if(desc.indexOf(needle) > -1){ rest.push(p); }
+        }, this);
+        var text = function(p){ return (p.desc || '').toLowerCase(); };
+        var byDesc = function(a, b){ return text(a) < text(b) ? -1 : text(a) > text(b) ? 1 : a.id - b.id; };
+        return exact.concat(prefix.sort(byDesc), rest.sort(byDesc)).slice(0, limit || 25);
+    };
+
+    KassaOffline.prototype.ombor = function(id){
+        return this.catalogue.ombors[id] || '';
+    };
+
+    KassaOffline.prototype.pending = function(){
+        return this.queue.length;
+    };
+
+    // Oflayn chek: serverdagi savat ham tozalanishi kerak (aloqa tiklanganda, yuborishdan oldin).
+    // prices — mijozdan olingan narxlar: server joriy narx bilan solishtiradi
+    KassaOffline.prototype.queueReceipt = function(lines, prices){
+        this.queue.push({idempotency_key: newKey(), lines: lines, prices: prices, queued_at: new Date().toISOString()});
+        save(QUEUE_KEY, this.queue);
+        save(CLEAR_CART_KEY, true);
+    };
+
+    // Server rad etgan cheklar: mijoz to'lagan, shuning uchun kassir ko'rib chiqmaguncha saqlanadi
+    KassaOffline.prototype.failed = function(){
+        return load(FAILED_KEY, []);
+    };
+
+    function takeFailed(key){
+        var failed = load(FAILED_KEY, []), entry = null;
+        failed = failed.filter(function(item){
+            if(item.receipt.idempotency_key === key){ entry = item; return false; }
+            return true;
+        });
+        save(FAILED_KEY, failed);
+        return entry;
+    }
+
+    // Qayta yuborish (masalan, qoldiq kiritilgandan keyin): xuddi shu kalit bilan — server chekni bir marta yozadi
+    KassaOffline.prototype.retry = function(key){
+        var entry = takeFailed(key);
+        if(entry){
+            this.queue.push(entry.receipt);
+            save(QUEUE_KEY, this.queue);
+        }
+        return this.flush();
+    };
+
+    // Kassir chekni qo'lda rasmiylashtirdi yoki bekor qildi: ro'yxatdan olib tashlanadi
+    KassaOffline.prototype.dismiss = function(key){
+        takeFailed(key);
+    };
+
+    KassaOffline.prototype.post = function(url, body, json){
+        return window.fetch(url, {
+            method: 'POST', credentials: 'same-origin', body: body,
+            headers: json ? {'Content-Type': 'application/json', 'X-CSRFToken': this.csrfToken()}
+                          : {'X-CSRFToken': this.csrfToken()}
+        });
+    };
+
+    KassaOffline.prototype.flush = function(){
+        var self = this;
+        if(this.flushing || (!this.queue.length && !load(CLEAR_CART_KEY, false))){ return Promise.resolve(null); }
+        this.flushing = true;
+        var clear = load(CLEAR_CART_KEY, false)
+            ? this.post(this.clearUrl, '', false).then(function(){ save(CLEAR_CART_KEY, false); })
+            : Promise.resolve();
+        var batch = this.queue.slice(0, BATCH_SIZE);
+        return clear.then(function(){
+            if(!batch.length){ return null; }
+            return self.post(self.batchUrl, JSON.stringify({receipts: batch}), true)
+                .then(function(response){
+                    if(!response.ok){ throw new Error(response.status); }
+                    return response.json();
+                })
+                .then(function(data){
+                    // Har bir chek uchun javob keldi: navbatdan olinadi, rad etilganlari alohida saqlanadi
+                    var done = {}, failed = load(FAILED_KEY, []), summary = {sent: 0, rejected: []};
+                    data.results.forEach(function(result){
+                        var receipt = batch.filter(function(r){ return r.idempotency_key === result.idempotency_key; })[0];
+                        if(!receipt || done[result.idempotency_key]){ return; }
+                        done[result.idempotency_key] = true;
+                        if(result.status === 'created' || result.status === 'duplicate'){
+                            summary.sent += 1;
+                        } else {
+                            var entry = {receipt: receipt, errors: result.errors || [], rejected_at: new Date().toISOString()};
+                            failed.push(entry);
+                            summary.rejected.push(entry);
+                        }
+                    });
+                    self.queue = self.queue.filter(function(r){ return !done[r.idempotency_key]; });
+                    save(QUEUE_KEY, self.queue);
+                    save(FAILED_KEY, failed);
+                    return summary;
+                });
+        }).catch(function(){ return null; }).then(function(results){
+            self.flushing = false;
+            return results;
+        });
+    };
+
+    window.KassaOffline = KassaOffline;
+})(window);
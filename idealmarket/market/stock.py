@@ -0,0 +1,252 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Q, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import push, sync
+from .dbutils import upsert_add
+from .models import Product, StockBalance, StockMovement
+
+STOCK_BATCH_SIZE = 500
+
+
+class StockError(Exception):
+    # Qoldiq amalini bajarib bo'lmadi: barcha xato qatorlar bitta ro'yxatda
+    def __init__(self, errors):
+        self.errors = list(errors)
+        super().__init__("; ".join(self.errors))
+
+
+def record(movements):
+    """
+    Harakatlarni jurnalga bitta bulk INSERT bilan yozadi. Qoldiq keshi chaqiruvchi
+    tomonidan allaqachon yangilangan bo'lishi kerak (masalan, checkout'ning shartli UPDATE'i).
+    """
+    StockMovement.objects.bulk_create([m for m in movements if m.quantity], batch_size=STOCK_BATCH_SIZE)
+
+
+def _add_balances(deltas):
+    # {(product_id, ombor_id): farq} — ombor qoldiqlariga qo'shiladi, qator bo'lmasa yaratiladi
+    upsert_add(StockBalance, ['ombor', 'product'], ['quantity'],
+               [(oid, pid, delta) for (pid, oid), delta in deltas.items() if delta])
+
+
+def adjust_totals(deltas):
+    # {product_id: farq} — Product.stock (barcha omborlar yig'indisi) F() bilan o'zgaradi.
+    # Chaqiruvchi jurnal va ombor qoldig'ini o'zi yozadi (apply(), checkout)
+    deltas = {pid: delta for pid, delta in deltas.items() if delta}
+    items = list(deltas.items())
+    for start in range(0, len(items), STOCK_BATCH_SIZE):
+        chunk = items[start:start + STOCK_BATCH_SIZE]
+        Product.objects.filter(pk__in=[pid for pid, _ in chunk]).update(
+            stock=Case(*[When(pk=pid, then=F('stock') + delta) for pid, delta in chunk], default=F('stock')),
+            updated_at=timezone.now(),
+        )
+    sync.record_stock_changes(deltas)
+    # Kassalarga jonli qoldiq: faqat commit'dan keyin (bekor qilingan sotuv e'lon qilinmaydi)
+    if deltas:
+        transaction.on_commit(lambda: push.stock_changed(deltas))
+
+
+def _fill_home_ombors(movements):
+    # Ombori ko'rsatilmagan harakat mahsulotning asosiy omboriga yoziladi
+    missing = {m.product_id for m in movements if m.ombor_id is None}
+    if missing:
+        homes = dict(Product.objects.filter(pk__in=missing).values_list('pk', 'ombor_id'))
+        for movement in movements:
+            if movement.ombor_id is None:
+                movement.ombor_id = homes[movement.product_id]
+
+
+def apply(movements):
+    """
+    Harakatlarni yozadi va ombor qoldiqlari hamda Product.stock keshini atomar F()/upsert bilan
+    o'zgartiradi: qoldiq o'qib-yozilmaydi, shuning uchun parallel sotuvlar bilan to'qnashmaydi.
+    """
+    movements = [m for m in movements if m.quantity]
+    if not movements:
+        return
+    _fill_home_ombors(movements)
+    balances = defaultdict(int)
+    totals = defaultdict(int)
+    for movement in movements:
+        balances[(movement.product_id, movement.ombor_id)] += movement.quantity
+        totals[movement.product_id] += movement.quantity
+    with transaction.atomic():
+        record(movements)
+        _add_balances(balances)
+        adjust_totals(totals)
+
+
+def open_balances(products, user=None, note="Boshlang'ich qoldiq"):
+    # Yangi yaratilgan mahsulotlar: stock allaqachon yozilgan, jurnal va ombor qoldig'i ochiladi
+    movements = [
+        StockMovement(product_id=p.pk, ombor_id=p.ombor_id, kind=StockMovement.RECEIPT, quantity=p.stock,
+                      created_by=user, note=note)
+        for p in products if p.stock
+    ]
+    record(movements)
+    _add_balances({(m.product_id, m.ombor_id): m.quantity for m in movements})
+
+
+def receive(quantities, user=None, note='', ombor_id=None):
+    # Kirim: {product_id: miqdor}; ombor berilmasa — mahsulotning asosiy ombori
+    apply([StockMovement(product_id=pid, ombor_id=ombor_id, kind=StockMovement.RECEIPT, quantity=qty,
+                         created_by=user, note=note)
+           for pid, qty in quantities.items()])
+
+
+def set_balance(product_id, target, user=None, note=''):
+    """
+    Inventarizatsiya: umumiy qoldiqni ``target`` ga keltiradi. Farq asosiy omborga "tuzatish"
+    harakati bo'lib yoziladi; qator qulflanadi, shuning uchun shu orada bo'lgan sotuv yo'qolmaydi.
+    """
+    with transaction.atomic():
+        current, ombor_id = (
+            Product.objects.select_for_update().filter(pk=product_id).values_list('stock', 'ombor_id').get()
+        )
+        apply([StockMovement(product_id=product_id, ombor_id=ombor_id, kind=StockMovement.ADJUSTMENT,
+                             quantity=target - current, created_by=user, note=note)])
+
+
+def transfer(from_ombor_id, to_ombor_id, quantities, user=None, note=''):
+    """
+    Bir ombordan boshqasiga ko'chirish: {product_id: miqdor}. So'rovlar soni qatorlar soniga
+    bog'liq emas; manba qoldig'i shartli UPDATE bilan kamayadi, yetmasa hech narsa o'zgarmaydi.
+    """
+    quantities = {pid: qty for pid, qty in quantities.items() if qty > 0}
+    if from_ombor_id == to_ombor_id:
+        raise StockError(["Manba va qabul qiluvchi ombor bir xil."])
+    if not quantities:
+        raise StockError(["Ko'chiriladigan mahsulot yo'q."])
+    with transaction.atomic():
+        available = dict(
+            StockBalance.objects.select_for_update()
+            .filter(ombor_id=from_ombor_id, product_id__in=quantities)
+            .values_list('product_id', 'quantity')
+        )
+        short = [pid for pid, qty in quantities.items() if available.get(pid, 0) < qty]
+        if short:
+            names = dict(Product.objects.filter(pk__in=short).values_list('pk', 'desc'))
+            raise StockError([f"{names.get(pid) or pid} yetarli emas, qolgan: {available.get(pid, 0)}"
+                              for pid in short])
+        enough = Q()
+        for pid, qty in quantities.items():
+            enough |= Q(product_id=pid, quantity__gte=qty)
+        updated = StockBalance.objects.filter(enough, ombor_id=from_ombor_id).update(
+            quantity=Case(*[When(product_id=pid, then=F('quantity') - qty) for pid, qty in quantities.items()],
+                          default=F('quantity'))
+        )
+        if updated != len(quantities):
+            raise StockError(["Qoldiq o'zgardi, ko'chirishni qayta bajaring."])
+        _add_balances({(pid, to_ombor_id): qty for pid, qty in quantities.items()})
+        movements = []
+        for pid, qty in quantities.items():
+            movements.append(StockMovement(product_id=pid, ombor_id=from_ombor_id, kind=StockMovement.TRANSFER,
+                                           quantity=-qty, created_by=user, note=note))
+            movements.append(StockMovement(product_id=pid, ombor_id=to_ombor_id, kind=StockMovement.TRANSFER,
+                                           quantity=qty, created_by=user, note=note))
+        record(movements)
+        # Umumiy qoldiq o'zgarmaydi, lekin ombor qoldig'i o'zgardi: kassa jadvali keshi eskirishi kerak
+        sync.record_stock_changes(quantities)
+        transaction.on_commit(lambda: push.stock_changed(quantities))
+    return len(quantities)
+
+
+def move_home(changes, user=None, note="Asosiy ombor o'zgardi"):
+    """
+    Mahsulotning asosiy ombori o'zgardi: {product_id: (eski_ombor, yangi_ombor)}. Eski ombordagi
+    qoldiq yangisiga ko'chirish juftligi bilan o'tadi, aks holda kassasiz checkout (asosiy
+    ombordan sotadi) Product.stock bor bo'lsa ham "qolgan: 0" deydi. Umumiy qoldiq o'zgarmaydi.
+    """
+    changes = {pid: (old, new) for pid, (old, new) in changes.items() if old and old != new}
+    if not changes:
+        return
+    with transaction.atomic():
+        balances = {
+            (pid, oid): qty
+            for pid, oid, qty in StockBalance.objects.select_for_update()
+            .filter(product_id__in=changes, ombor_id__in={old for old, _ in changes.values()})
+            .values_list('product_id', 'ombor_id', 'quantity')
+        }
+        movements = []
+        for pid, (old, new) in changes.items():
+            quantity = balances.get((pid, old), 0)
+            movements.append(StockMovement(product_id=pid, ombor_id=old, kind=StockMovement.TRANSFER,
+                                           quantity=-quantity, created_by=user, note=note))
+            movements.append(StockMovement(product_id=pid, ombor_id=new, kind=StockMovement.TRANSFER,
+                                           quantity=quantity, created_by=user, note=note))
+        apply(movements)
+
+
+def available_in(ombor_id, product_ids):
+    # Kassa ombori bo'yicha qoldiqlar: (ombor, product) noyob indeksidan bitta so'rov
+    return dict(
+        StockBalance.objects.filter(ombor_id=ombor_id, product_id__in=product_ids).values_list('product_id', 'quantity')
+    )
+
+
+def save_product_form(form, user=None, note=''):
+    """
+    Mahsulot formasini saqlaydi (admin, list_editable, boshqaruv sahifasi). ``stock`` maydoni
+    to'g'ridan-to'g'ri yozilmaydi: yangi mahsulotda boshlang'ich kirim, mavjudida tuzatish bo'ladi.
+    """
+    # commit=False: save_m2m() paydo bo'ladi (admin bu chaqiruvni o'zi qilgan, takrorlash zararsiz)
+    product = form.save(commit=False)
+    with transaction.atomic():
+        if product._state.adding:
+            product.save()
+            open_balances([product], user, note or "Boshlang'ich qoldiq")
+        else:
+            target = product.stock
+            fields = [name for name in form.changed_data if name != 'stock']
+            if fields:
+                product.save(update_fields=fields + ['updated_at'])
+            if 'ombor' in form.changed_data:
+                move_home({product.pk: (form.initial.get('ombor'), product.ombor_id)}, user, note or "Asosiy ombor o'zgardi")
+            if 'stock' in form.changed_data:
+                set_balance(product.pk, target, user, note)
+                product.refresh_from_db(fields=['stock', 'updated_at'])
+        form.save_m2m()
+    return product
+
+
+def ledger_drift():
+    # Bitta GROUP BY: jurnal yig'indisi keshdagi umumiy qoldiqdan farq qiladigan mahsulotlar
+    return (
+        Product.objects.annotate(ledger=Coalesce(Sum('movements__quantity'), Value(0), output_field=IntegerField()))
+        .exclude(ledger=F('stock'))
+        .order_by('pk')
+        .values_list('pk', 'barcode', 'stock', 'ledger')
+    )
+
+
+def balance_drift():
+    """
+    Ombor qoldiqlarini jurnal bilan solishtiradi: jurnal bir marta (product, ombor) bo'yicha
+    GROUP BY qilinadi, qoldiqlar jadvali bir marta o'qiladi. Natija: [(product_id, ombor_id, qoldiq, jurnal)].
+    """
+    ledger = {
+        (row['product_id'], row['ombor_id']): row['total']
+        for row in StockMovement.objects.order_by().values('product_id', 'ombor_id').annotate(total=Sum('quantity'))
+        .iterator(chunk_size=2000)
+    }
+    drift = []
+    for pid, oid, quantity in StockBalance.objects.values_list('product_id', 'ombor_id', 'quantity').iterator(chunk_size=2000):
+        expected = ledger.pop((pid, oid), 0)
+        if expected != quantity:
+            drift.append((pid, oid, quantity, expected))
+    drift.extend((pid, oid, 0, total) for (pid, oid), total in ledger.items() if total)
+    return sorted(drift)
+
+
+def fix_drift(rows, balance_rows=()):
+    # Jurnal — haqiqat manbai. Farq F()/upsert bilan qo'shiladi: shu orada bo'lgan sotuv keshni ham,
+    # jurnalni ham bir xil kamaytiradi, farq esa o'zgarmaydi
+    rows = list(rows)
+    with transaction.atomic():
+        adjust_totals({pk: ledger - cached for pk, _, cached, ledger in rows})
+        _add_balances({(pid, oid): ledger - quantity for pid, oid, quantity, ledger in balance_rows})
+    return len(rows) + len(balance_rows)
@@ -0,0 +1,122 @@
+from django.db import connection, transaction
+
+from .exports import CATEGORY_COLUMNS, PRODUCT_COLUMNS
+from .models import Catagory, ChangeLog, Ombor, Product
+
+SYNC_PAGE_SIZE = 500
+SYNC_MAX_PAGE_SIZE = 2000
+
+OMBOR_COLUMNS = (
+    ('id', 'id'),
+    ('name', 'name'),
+    ('updated_at', 'updated_at'),
+)
+
+# Jurnaldagi nom -> (model, javobdagi kalit, ustunlar)
+SYNC_MODELS = {
+    'ombor': (Ombor, 'ombors', OMBOR_COLUMNS),
+    'catagory': (Catagory, 'categories', CATEGORY_COLUMNS),
+    'product': (Product, 'products', PRODUCT_COLUMNS),
+}
+_LABELS = {model: label for label, (model, _, _) in SYNC_MODELS.items()}
+
+# PostgreSQL'da jurnalga yozuvchilarni navbatga qo'yish uchun advisory lock kaliti
+_SYNC_LOCK_KEY = 7_312_001
+
+
+def record_changes(model, ids, action=ChangeLog.UPSERT, stock_only=False):
+    """
+    O'zgargan obyektlarni jurnalga bitta bulk INSERT bilan yozadi. save()/delete() uchun
+    signallar chaqiradi; QuerySet.update() va bulk_* yo'llari buni o'zi chaqirishi kerak.
+    Katalog tahrirlari uchun (kam va qisqa); qoldiq o'zgarishlari — record_stock_changes().
+    """
+    ids = list(ids)
+    if not ids:
+        return
+    if connection.vendor == 'postgresql':
+        # Ketma-ketlik qiymatlari commit tartibida emas: kichik id kechroq commit bo'lsa,
+        # mijoz uni kursordan o'tib ketgan holda o'tkazib yuborardi. Yozuvchilar navbat bilan commit qiladi.
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)', [_SYNC_LOCK_KEY])
+    label = _LABELS[model]
+    ChangeLog.objects.bulk_create(
+        [ChangeLog(model=label, object_id=pk, action=action, stock_only=stock_only) for pk in ids], batch_size=500,
+    )
+
+
+def record_stock_changes(product_ids):
+    """
+    Qoldig'i o'zgargan mahsulotlar (checkout, kirim, ko'chirish). PostgreSQL'da jurnal qatori
+    commit'dan keyin alohida qisqa tranzaksiyada yoziladi: advisory lock checkout tranzaksiyasi
+    davomida ushlanmaydi, shuning uchun kassalar bir-birini kutmaydi. Jarayon commit bilan shu
+    yozuv orasida yiqilsa, qoldiq o'zgarishi jurnalga tushmay qoladi (keyingi o'zgarish yoki
+    to'liq sinxronizatsiya tuzatadi). SQLite yozuvchilarni baribir navbatga qo'yadi — u yerda
+    jurnal shu tranzaksiyada yoziladi.
+    """
+    ids = list(product_ids)
+    if not ids:
+        return
+    if connection.vendor != 'postgresql':
+        record_changes(Product, ids, stock_only=True)
+        return
+
+    def write():
+        with transaction.atomic():
+            record_changes(Product, ids, stock_only=True)
+
+    transaction.on_commit(write)
+
+
+def latest_cursor():
+    # Birlamchi kalit indeksidan bitta qidiruv (MAX(id))
+    return ChangeLog.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+
+def catalogue_version():
+    """
+    Katalog versiyasi (kassa jadvali va SKU keshlari uchun): jurnaldagi oxirgi katalog
+    yozuvi. Mahsulot, kategoriya va ombor tahrirlari yangi yozuv qo'shadi, shuning uchun versiya
+    barcha jarayonlarda birdan oshadi; qoldiq yozuvlari (stock_only) hisobga olinmaydi — har bir
+    checkout keshni bekor qilmasligi uchun. Vaqt belgisi qo'shilgan: rollback'dan keyin SQLite
+    id'ni qayta ishlatsa ham versiya takrorlanmaydi.
+    """
+    row = ChangeLog.objects.filter(stock_only=False).order_by('-id').values_list('id', 'created_at').first()
+    return f"{row[0]}.{row[1].timestamp():.6f}" if row else '0'
+
+
+def changes_since(cursor, latest, limit=SYNC_PAGE_SIZE):
+    """
+    ``cursor`` dan keyingi (``latest`` gacha) o'zgarishlar: har bir obyektning joriy
+    holati yoki o'chirilgani. Bir obyekt bir necha marta o'zgargan bo'lsa, bir marta qaytadi.
+    """
+    entries = list(
+        ChangeLog.objects.filter(id__gt=cursor, id__lte=latest).order_by('id')
+        .values_list('id', 'model', 'object_id', 'action')[:limit + 1]
+    )
+    more = len(entries) > limit
+    entries = entries[:limit]
+
+    final = {}
+    for _, label, object_id, action in entries:
+        final.pop((label, object_id), None)
+        final[(label, object_id)] = action
+
+    payload = {
+        'cursor': entries[-1][0] if entries else max(min(cursor, latest), 0),
+        'more': more,
+        'deleted': {},
+    }
+    for label, (model, key, columns) in SYNC_MODELS.items():
+        upserted = [pk for (lbl, pk), action in final.items() if lbl == label and action == ChangeLog.UPSERT]
+        deleted = [pk for (lbl, pk), action in final.items() if lbl == label and action == ChangeLog.DELETE]
+        names = [name for name, _ in columns]
+        rows = []
+        if upserted:
+            rows = [
+                dict(zip(names, row))
+                for row in model.objects.filter(pk__in=upserted).order_by('pk').values_list(*[p for _, p in columns])
+            ]
+        payload[key] = rows
+        if deleted:
+            payload['deleted'][label] = deleted
+    return payload
@@ -1,3 +1,1607 @@
+import asyncio
+from datetime import timedelta
+from decimal import Decimal
+import csv
+import gzip
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+from io import StringIO
+from pathlib import Path
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.forms.models import model_to_dict
+from django.db import connection, transaction
+from django.db.models import Sum
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+import tablib
+from openpyxl import Workbook
+
+from .admin import ProductResource
+from .checkout import CheckoutError, checkout_cart
+from .forms import ProductForm
+from .models import (
+    Catagory, ChangeLog, Job, Ombor, Product, ReceiptRollup, Sale, SaleItem, SalesRollup, StockBalance,
+    StockMovement, Till,
+)
+from .pagination import encode_cursor
+from .search import search_products
+from . import cart_store, importers, jobs, perf, push, queryplans, roles, sku_cache, sync
+from .cart import Cart
+from . import stock as stock_module
+
+
+def make_products(count, stock=10, prefix='P'):
+    catagory = Catagory.objects.create(name=f"{prefix} kategoriya")
+    ombor = Ombor.objects.create(name=f"{prefix} ombor")
+    products = [
+        Product.objects.create(
+            catagory=catagory, ombor=ombor, barcode=f"{prefix}{i:05d}", desc=f"{prefix} mahsulot {i}",
+            r_price=Decimal('100'), s_price=Decimal('150'), stock=stock,
+        )
+        for i in range(count)
+    ]
+    # Qoldiq jurnal va ombor qoldig'i bilan ochiladi (checkout ombor qoldig'idan sotadi)
+    stock_module.open_balances(products)
+    return products
+
+
+def make_sales(products, count, user=None, lines=3):
+    # Har bir chekda bir nechta qator: ro'yxat, tafsilot va statistika sahifalari uchun
+    return [
+        checkout_cart({str(products[(i + j) % len(products)].pk): 1 for j in range(lines)}, user)
+        for i in range(count)
+    ]
+
+
+def make_cashiers(count, prefix='kassir'):
+    group, _ = Group.objects.get_or_create(name='Kassir')
+    users = [User.objects.create_user(f"{prefix}{i}") for i in range(count)]
+    group.user_set.add(*users)
+    return users
+
+
+class CheckoutTests(TestCase):
+    def test_query_count_does_not_grow_with_cart_size(self):
+        products = make_products(30)
+        counts = []
+        for size in (1, 10, 30):
+            cart = {str(p.pk): 1 for p in products[:size]}
+            with CaptureQueriesContext(connection) as ctx:
+                checkout_cart(cart)
+            counts.append(len(ctx.captured_queries))
+        self.assertEqual(len(set(counts)), 1, counts)
+
+    def test_checkout_creates_items_and_decrements_stock(self):
+        a, b = make_products(2, stock=5)
+        sale = checkout_cart({str(a.pk): 2, str(b.pk): 5})
+        self.assertEqual(sale.items.count(), 2)
+        self.assertEqual(SaleItem.objects.get(sale=sale, product=a).price, Decimal('150'))
+        a.refresh_from_db()
+        b.refresh_from_db()
+        self.assertEqual((a.stock, b.stock), (3, 0))
+
+    def test_all_failing_lines_reported_and_nothing_written(self):
+        a, b, c = make_products(3, stock=1)
+        b.is_active = False
+        b.save()
+        with self.assertRaises(CheckoutError) as ctx:
+            checkout_cart({str(a.pk): 2, str(b.pk): 1, str(c.pk): 1, '999999': 1})
+        self.assertEqual(len(ctx.exception.errors), 3)
+        self.assertFalse(Sale.objects.exists())
+        c.refresh_from_db()
+        self.assertEqual(c.stock, 1)
+
+    def test_checkout_view_reports_errors(self):
+        user = User.objects.create_user('kassir', password='x')
+        (a,) = make_products(1, stock=1)
+        self.client.force_login(user)
+        session = self.client.session
+        session['cart'] = {str(a.pk): 3}
+        session.save()
+        response = self.client.post(reverse('cart_checkout'))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(response.json()['errors']), 1)
+
+    def test_price_change_after_scan_is_not_charged_silently(self):
+        self.client.force_login(User.objects.create_user('kassir'))
+        a, b = make_products(2)
+        self.client.post(reverse('cart_add', args=[a.pk]), {'quantity': 2})
+        self.client.post(reverse('cart_add', args=[b.pk]), {'quantity': 1})
+        Product.objects.filter(pk=a.pk).update(s_price=Decimal('175'))
+        response = self.client.post(reverse('cart_checkout'))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("narxi o'zgardi: 150.00 -> 175.00", response.json()['message'])
+        self.assertEqual([(line['product_id'], line['price'], line['total']) for line in response.json()['lines']],
+                         [(a.pk, '175.00', '500.00')])
+        self.assertFalse(Sale.objects.exists())
+        # Savat yangi narxni oldi: ikkinchi urinish kassir ko'rgan summani yozadi
+        self.client.post(reverse('cart_checkout'))
+        self.assertEqual(Sale.objects.get().total, Decimal('500'))
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.products = make_products(30, prefix='S')
+
+    def test_exact_barcode_comes_first(self):
+        page = search_products('S00007')
+        self.assertEqual(page.products[0].barcode, 'S00007')
+
+    def test_prefix_pages_cover_every_match_once(self):
+        seen = []
+        cursor = None
+        while True:
+            page = search_products('s mahsulot', cursor=cursor, limit=7)
+            seen.extend(p.pk for p in page.products)
+            cursor = page.next_cursor
+            if not cursor:
+                break
+        self.assertEqual(sorted(seen), sorted(p.pk for p in self.products))
+
+    def test_fulltext_fallback_and_unavailable_products_hidden(self):
+        self.products[3].desc = 'Qizil olma'
+        self.products[3].save()
+        self.products[4].desc = 'Yashil olma'
+        self.products[4].is_active = False
+        self.products[4].save()
+        page = search_products('olma')
+        self.assertEqual([p.pk for p in page.products], [self.products[3].pk])
+
+    def test_malformed_cursor_falls_back_to_first_page(self):
+        first = [p.pk for p in search_products('S0000', limit=5).products]
+        for state in (['f', 'x'], ['p', None, 1], ['p', 'a', 'b'], ['f', -5], ['z'], {'p': 1}, 'x'):
+            page = search_products('S0000', cursor=encode_cursor(state), limit=5)
+            self.assertEqual([p.pk for p in page.products], first, state)
+        self.client.force_login(User.objects.create_user('kassir'))
+        response = self.client.get(reverse('product_search'), {'q': 'S', 'cursor': encode_cursor(['f', 'x'])})
+        self.assertEqual(response.status_code, 200)
+
+    def test_search_endpoint_query_count_is_capped(self):
+        user = User.objects.create_user('kassir', password='x')
+        self.client.force_login(user)
+        make_products(60, prefix='T')
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('product_search'), {'q': 't', 'limit': 10})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['next_cursor'])
+        self.assertLessEqual(len(ctx.captured_queries), 6)
+
+
+class KassaFragmentCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('kassir')
+        self.client.force_login(self.user)
+        self.products = make_products(5, prefix='K')
+
+    def search(self, q='k mahsulot'):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('product_search'), {'q': q})
+        self.data = response.json()
+        return self.data['products_html'], ctx.captured_queries
+
+    def test_repeat_search_is_served_from_cache(self):
+        html, _ = self.search()
+        cached, queries = self.search()
+        self.assertEqual(html, cached)
+        # Faqat qoldiq o'qiladi (bitta so'rov), qidiruv va render keshdan
+        self.assertEqual(len([q for q in queries if 'market_product' in q['sql']]), 1)
+        self.assertNotIn('csrfmiddlewaretoken', html)
+
+    def test_oversized_limits_share_one_entry(self):
+        self.client.get(reverse('product_search'), {'q': 'k', 'limit': 1000})
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse('product_search'), {'q': 'k', 'limit': 5000})
+        self.assertFalse([q for q in ctx.captured_queries if 'LIKE' in q['sql'].upper()])
+
+    def test_product_change_bumps_version(self):
+        self.search()
+        self.products[0].desc = 'K mahsulot yangi nom'
+        self.products[0].save()
+        html, _ = self.search()
+        self.assertIn('K mahsulot yangi nom', html)
+
+    def test_sale_refreshes_availability(self):
+        html, _ = self.search()
+        checkout_cart({str(self.products[0].pk): 4}, self.user)
+        cached, queries = self.search()
+        self.assertEqual(self.data['available'][str(self.products[0].pk)], 6)
+        # Sotuv katalog versiyasini oshirmaydi: jadval HTML'i keshdan qoladi
+        self.assertEqual(html, cached)
+        self.assertFalse([q for q in queries if 'LIKE' in q['sql'].upper()])
+
+
+class ScanTests(TestCase):
+    def setUp(self):
+        sku_cache.clear()
+        self.user = User.objects.create_user('kassir', password='x')
+        self.client.force_login(self.user)
+        (self.product,) = make_products(1, prefix='SC')
+
+    def test_repeat_scan_is_served_from_cache(self):
+        url = reverse('cart_scan')
+        self.client.post(url, {'barcode': self.product.barcode})
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(url, {'barcode': self.product.barcode})
+        self.assertEqual(response.json()['quantity'], 2)
+        self.assertFalse([q for q in ctx.captured_queries if 'market_product' in q['sql']])
+
+    def test_cache_invalidated_on_product_save(self):
+        sku_cache.lookup(self.product.barcode)
+        self.product.is_active = False
+        self.product.save()
+        response = self.client.post(reverse('cart_scan'), {'barcode': self.product.barcode})
+        self.assertEqual(response.status_code, 400)
+
+    def test_change_from_another_process_reaches_cache(self):
+        # Boshqa jarayon (masalan, runworker'dagi import): bu jarayonda signal yo'q, faqat jurnal
+        sku_cache._version_checked_at = 0
+        sku_cache.lookup(self.product.barcode)
+        sku_cache.lookup(self.product.barcode)
+        Product.objects.filter(pk=self.product.pk).update(s_price=Decimal('777'))
+        sync.record_changes(Product, [self.product.pk])
+        sku_cache._version_checked_at = time.monotonic()
+        self.assertNotEqual(sku_cache.lookup(self.product.barcode).s_price, Decimal('777'))
+        sku_cache._version_checked_at = 0
+        self.assertEqual(sku_cache.lookup(self.product.barcode).s_price, Decimal('777'))
+
+    def test_unknown_barcode(self):
+        response = self.client.post(reverse('cart_scan'), {'barcode': 'NOPE'})
+        self.assertEqual(response.status_code, 404)
+
+
+class RoleCacheTests(TestCase):
+    def setUp(self):
+        roles.clear()
+        (self.cashier,) = make_cashiers(1)
+        self.client.force_login(self.cashier)
+
+    def test_group_lookup_is_cached(self):
+        self.assertEqual(self.client.get(reverse('sales_list')).status_code, 200)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.client.get(reverse('sales_list')).status_code, 200)
+            self.assertRedirects(self.client.get(reverse('dashboard')), reverse('kassa'),
+                                 fetch_redirect_response=False)
+        self.assertFalse([q for q in ctx.captured_queries if 'FROM "auth_group"' in q['sql']])
+
+    def test_role_change_in_admin_invalidates_cache(self):
+        self.client.get(reverse('sales_list'))
+        admin = User.objects.create_superuser('admin', password='x')
+        admin_client = self.client_class()
+        admin_client.force_login(admin)
+        admin_client.post(reverse('admin_user_edit', args=[self.cashier.pk]),
+                          {'username': self.cashier.username, 'role': ''})
+        self.assertEqual(self.client.get(reverse('sales_list')).status_code, 302)
+
+    def test_group_rename_invalidates_cache(self):
+        self.client.get(reverse('sales_list'))
+        group = Group.objects.get(name=roles.KASSIR_GROUP)
+        group.name = 'Sotuvchi'
+        group.save()
+        self.assertEqual(self.client.get(reverse('sales_list')).status_code, 302)
+
+
+class CartTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('kassir', password='x')
+        self.client.force_login(self.user)
+        self.products = make_products(40, prefix='C')
+
+    def test_cart_mutations_do_not_requery_lines(self):
+        for p in self.products:
+            self.client.post(reverse('cart_add', args=[p.pk]), {'quantity': 2})
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(reverse('cart_update', args=[self.products[0].pk]), {'action': 'remove'})
+        self.assertFalse([q for q in ctx.captured_queries if 'market_product' in q['sql']])
+        # Javob — butun savat emas, faqat o'zgargan qator va yangi jami
+        data = response.json()
+        self.assertEqual((data['product_id'], data['quantity']), (self.products[0].pk, 1))
+        self.assertEqual(Decimal(data['total']), Decimal('150') * 79)
+        self.assertNotIn('cart_html', data)
+
+    def test_legacy_session_loaded_in_one_query(self):
+        session = self.client.session
+        session['cart'] = {str(p.pk): 1 for p in self.products}
+        session.save()
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.post(reverse('cart_remove', args=[self.products[0].pk]),
+                             HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(len([q for q in ctx.captured_queries if 'market_product' in q['sql']]), 1)
+        # Sessiyadagi eski savat omborga ko'chdi
+        self.assertNotIn('cart', self.client.session)
+        self.assertEqual(Cart(self.client.session).total, Decimal('150.00') * 39)
+
+    def test_cart_clicks_do_not_rewrite_session(self):
+        self.client.post(reverse('cart_add', args=[self.products[0].pk]), {'quantity': 1})
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.post(reverse('cart_add', args=[self.products[1].pk]), {'quantity': 1})
+            self.client.post(reverse('cart_update', args=[self.products[1].pk]), {'action': 'remove'})
+        self.assertFalse([q for q in ctx.captured_queries if q['sql'].startswith('UPDATE "django_session"')])
+        self.assertEqual(Cart(self.client.session).quantities(), {str(self.products[0].pk): 1})
+
+
+class FakeRedis:
+    # Redis'ning savat ombori ishlatadigan buyruqlari (redis-py interfeysi, bytes qaytaradi).
+    # interleave(fn): fn keyingi buyruqdan keyingisi oldidan bajariladi — boshqa worker shu oraliqda yozgandek
+    def __init__(self):
+        self.data = {}
+        self.expiry = {}
+        self._pending = None
+
+    def interleave(self, fn):
+        self._pending = [1, fn]
+
+    def _command(self):
+        if self._pending:
+            self._pending[0] -= 1
+            if self._pending[0] < 0:
+                fn, self._pending = self._pending[1], None
+                fn()
+
+    def hgetall(self, key):
+        self._command()
+        return {k.encode(): v.encode() for k, v in self.data.get(key, {}).items()}
+
+    def hdel(self, key, *fields):
+        self._command()
+        removed = sum(self.data.get(key, {}).pop(field, None) is not None for field in fields)
+        if not self.data.get(key):
+            self.data.pop(key, None)
+        return removed
+
+    def delete(self, key):
+        self._command()
+        return int(self.data.pop(key, None) is not None)
+
+    def register_script(self, script):
+        emulate = {cart_store.CART_ADD_SCRIPT: self._cart_add, cart_store.CART_REMOVE_SCRIPT: self._cart_remove}[script]
+
+        def run(keys, args):
+            self._command()
+            return emulate(keys[0], *args)
+        return run
+
+    def _drop_if_empty(self, key):
+        if set(self.data.get(key, {})) <= {'t'}:
+            self.data.pop(key, None)
+
+    # CART_*_SCRIPT'larning Python nusxalari: skript bitta buyruq, orasiga boshqasi kirmaydi
+    def _cart_add(self, key, pid, quantity, meta, ttl, cents):
+        fields = self.data.setdefault(key, {})
+        fields.setdefault(f'm:{pid}', meta)
+        fields.setdefault(f'c:{pid}', str(cents))
+        old = int(fields.get(f'q:{pid}', 0))
+        new = max(old + int(quantity), 0)
+        meta = fields[f'm:{pid}'].encode()
+        fields['t'] = str(int(fields.get('t', 0)) + int(fields[f'c:{pid}']) * (new - old))
+        total = int(fields['t'])
+        if new > 0:
+            fields[f'q:{pid}'] = str(new)
+            self.expiry[key] = int(ttl)
+        else:
+            for field in (f'q:{pid}', f'm:{pid}', f'c:{pid}'):
+                fields.pop(field, None)
+            self._drop_if_empty(key)
+        return [new, meta, total]
+
+    def _cart_remove(self, key, pid):
+        fields = self.data.setdefault(key, {})
+        old = int(fields.pop(f'q:{pid}', 0))
+        cents = int(fields.pop(f'c:{pid}', 0))
+        fields.pop(f'm:{pid}', None)
+        fields['t'] = str(int(fields.get('t', 0)) - cents * old)
+        total = int(fields['t'])
+        self._drop_if_empty(key)
+        return total
+
+
+class CartStoreTests(TestCase):
+    def check_store(self, store):
+        store.add('s1', 7, Decimal('2.50'), 'Non', 3)
+        store.add('s1', 7, Decimal('9.99'), 'Boshqa nom', 1)  # nusxa birinchi qo'shilgandagi
+        store.add('s1', 8, Decimal('1'), 'Suv', 1)
+        store.add('s2', 7, Decimal('2.50'), 'Non', 1)
+        self.assertEqual(store.load('s1'), ({
+            '7': {'quantity': 4, 'price': '2.50', 'desc': 'Non'},
+            '8': {'quantity': 1, 'price': '1', 'desc': 'Suv'},
+        }, Decimal('11')))
+        self.assertEqual(store.add('s1', 8, Decimal('1'), 'Suv', -5), (None, Decimal('10')))
+        self.assertEqual(store.remove('s1', 7), 0)
+        self.assertEqual(store.load('s1'), ({}, 0))
+        store.clear('s2')
+        self.assertEqual(store.load('s2'), ({}, 0))
+
+    def test_cache_store(self):
+        self.check_store(cart_store.CacheCartStore(alias='default', ttl=60))
+
+    def test_file_cache_store_is_atomic_across_processes(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            store = cart_store.CacheCartStore(alias='default', ttl=60)
+            store.cache = FileBasedCache(tmp, {})
+
+            def scan():
+                for _ in range(25):
+                    store.add('s1', 7, Decimal('1'), 'Non', 1)
+
+            context = multiprocessing.get_context('fork')
+            workers = [context.Process(target=scan) for _ in range(4)]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            lines, total = store.load('s1')
+            self.assertEqual((lines['7']['quantity'], total), (100, Decimal('100')))
+
+    def test_cart_total_follows_line_changes(self):
+        store = cart_store.CacheCartStore(alias='default', ttl=60)
+        cart = Cart(self.client.session, store=store)
+        cart.add(1, Decimal('2.50'), 'Non', 2)
+        cart.add(2, Decimal('1'), 'Suv', 3)
+        cart.decrement(1)
+        cart.remove(2)
+        self.assertEqual(cart.total, Decimal('2.50'))
+        self.assertEqual(cart.total, Cart(self.client.session, store=store).total)
+        # Jami omborda: boshqa worker'dagi o'zgarish keyingi amal javobida ko'rinadi
+        Cart(self.client.session, store=store).add(3, Decimal('4'), 'Choy', 1)
+        cart.add(1, Decimal('2.50'), 'Non', 1)
+        self.assertEqual(cart.total, Decimal('9'))
+
+    def test_redis_store(self):
+        client = FakeRedis()
+        self.check_store(cart_store.RedisCartStore(client, ttl=60))
+        self.assertEqual(client.data, {})
+
+    def test_redis_add_is_one_atomic_step(self):
+        client = FakeRedis()
+        store = cart_store.RedisCartStore(client, ttl=60)
+        store.add('s1', 7, Decimal('1'), 'Non', 1)
+        # Boshqa kassa shu qatorni oshiradi, aynan shu kamaytirish "o'rtasida" (buyruqlar orasida)
+        client.interleave(lambda: store.add('s1', 7, Decimal('1'), 'Non', 2))
+        self.assertEqual(store.add('s1', 7, Decimal('1'), 'Non', -1), (None, 0))
+        self.assertEqual(store.load('s1'), ({'7': {'quantity': 2, 'price': '1', 'desc': 'Non'}}, Decimal('2')))
+
+    def test_cart_on_redis_store(self):
+        store = cart_store.RedisCartStore(FakeRedis(), ttl=60)
+        session = self.client.session
+        cart = Cart(session, store=store)
+        cart.add(1, Decimal('3'), 'Choy', 2)
+        cart.decrement(1)
+        self.assertEqual(Cart(session, store=store).total, Decimal('3'))
+
+
+class PushTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('kassir', password='x')
+        self.client.force_login(self.user)
+        self.products = make_products(3, prefix='Q')
+
+    def receive(self, quantities):
+        # Push commit'dan keyin yuboriladi: TestCase tranzaksiyasida on_commit qo'lda bajariladi
+        with self.captureOnCommitCallbacks(execute=True):
+            stock_module.receive(quantities)
+
+    def frame(self, text):
+        event, data = text.split('\n')[:2]
+        return event[len('event: '):], json.loads(data[len('data: '):])
+
+    def test_stock_pushed_only_for_basket_items(self):
+        a, b, _ = self.products
+
+        async def scenario():
+            stream = push.till_stream('kassa-1', None, [str(a.pk)])
+            self.assertEqual(await anext(stream), f"retry: {push.PUSH_RETRY_MS}\n\n")
+            await sync_to_async(self.receive)({b.pk: 5, a.pk: 2})
+            frame = await asyncio.wait_for(anext(stream), 5)
+            await stream.aclose()
+            return frame
+
+        self.assertEqual(self.frame(async_to_sync(scenario)()), ('stock', {'product_id': a.pk, 'available': 12}))
+        self.assertFalse(push.has_subscribers(push.STOCK_CHANNEL))
+
+    def test_cart_delta_pushed_to_own_channel(self):
+        a = self.products[0]
+        cart_id = Cart(self.client.session).cart_id
+
+        async def scenario():
+            stream = push.till_stream(cart_id, None, [])
+            await anext(stream)
+            response = await sync_to_async(self.client.post)(reverse('cart_add', args=[a.pk]), {'quantity': 2})
+            cart_frame = await asyncio.wait_for(anext(stream), 5)
+            # Endi mahsulot savatda: uning qoldig'i ham keladi
+            await sync_to_async(self.receive)({a.pk: 1})
+            stock_frame = await asyncio.wait_for(anext(stream), 5)
+            await stream.aclose()
+            return response, cart_frame, stock_frame
+
+        response, cart_frame, stock_frame = async_to_sync(scenario)()
+        self.assertEqual(response.json()['quantity'], 2)
+        event, delta = self.frame(cart_frame)
+        self.assertEqual(event, 'cart')
+        self.assertEqual((delta['product_id'], delta['quantity'], Decimal(delta['total'])), (a.pk, 2, Decimal('300')))
+        self.assertEqual(self.frame(stock_frame), ('stock', {'product_id': a.pk, 'available': 11}))
+
+    def test_clear_and_checkout_return_cleared_delta(self):
+        a = self.products[0]
+        self.client.post(reverse('cart_add', args=[a.pk]), {'quantity': 1})
+        data = self.client.post(reverse('cart_checkout')).json()
+        self.assertEqual((data['cleared'], data['total']), (True, '0'))
+        self.assertEqual(Sale.objects.get().pk, data['sale_id'])
+        self.assertTrue(self.client.post(reverse('cart_clear')).json()['cleared'])
+
+    def test_stock_change_without_listeners_is_free(self):
+        with self.assertNumQueries(0):
+            push.stock_changed([self.products[0].pk])
+
+    async def test_events_endpoint_is_event_stream_under_asgi(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('till_events'))
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+
+    def test_events_endpoint_not_opened_under_wsgi(self):
+        # WSGI cheksiz oqimni to'liq o'qiydi: kanal yopiq, sahifa uni ochmaydi
+        self.assertEqual(self.client.get(reverse('till_events')).status_code, 204)
+        self.assertFalse(self.client.get(reverse('kassa')).context['push_enabled'])
+
+
+class SaleTotalsTests(TestCase):
+    def test_checkout_fills_totals_and_admin_edits_keep_them(self):
+        a, b = make_products(2)
+        sale = checkout_cart({str(a.pk): 2, str(b.pk): 3})
+        sale.refresh_from_db()
+        self.assertEqual((sale.total, sale.item_count), (Decimal('750'), 5))
+        item = sale.items.get(product=a)
+        item.quantity = 4
+        with self.captureOnCommitCallbacks(execute=True):
+            item.save()
+            sale.items.get(product=b).delete()
+        sale.refresh_from_db()
+        self.assertEqual((sale.total, sale.item_count), (Decimal('600'), 4))
+
+    def test_sale_totals_command_backfills_drift(self):
+        (a,) = make_products(1)
+        sale = checkout_cart({str(a.pk): 2})
+        Sale.objects.filter(pk=sale.pk).update(total=0, item_count=0)
+        with self.assertRaises(CommandError):
+            call_command('sale_totals', '--check', stdout=StringIO())
+        call_command('sale_totals', stdout=StringIO())
+        sale.refresh_from_db()
+        self.assertEqual((sale.total, sale.item_count), (Decimal('300'), 2))
+
+
+class SalesHistoryTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', password='x')
+        self.client.force_login(self.admin)
+        self.products = make_products(3, stock=1000)
+
+    def make_sales(self, count):
+        for _ in range(count):
+            checkout_cart({str(p.pk): 1 for p in self.products}, self.admin)
+
+    def query_count(self, url, **params):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_query_count_independent_of_history_size(self):
+        for name in ('sales_list', 'admin_sales'):
+            self.make_sales(3)
+            small = self.query_count(reverse(name))
+            self.make_sales(60)
+            self.assertEqual(small, self.query_count(reverse(name)), name)
+
+    def test_keyset_pages_cover_all_sales(self):
+        self.make_sales(120)
+        seen, params = [], {}
+        while True:
+            response = self.client.get(reverse('admin_sales'), params)
+            seen.extend(s.pk for s in response.context['sales'])
+            if not response.context['next_url']:
+                break
+            params = {'cursor': response.context['next_url'].split('cursor=')[1]}
+        self.assertEqual(sorted(seen), sorted(Sale.objects.values_list('pk', flat=True)))
+
+    def test_cashier_filter(self):
+        self.make_sales(2)
+        other = User.objects.create_user('boshqa', password='x')
+        checkout_cart({str(self.products[0].pk): 1}, other)
+        response = self.client.get(reverse('sales_list'), {'cashier': other.pk})
+        self.assertEqual([s.created_by for s in response.context['sales']], [other])
+
+
+class RollupTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', password='x')
+        self.a, self.b = make_products(2, stock=100)
+
+    def test_checkout_updates_rollups_with_correct_revenue(self):
+        checkout_cart({str(self.a.pk): 3, str(self.b.pk): 1}, self.admin)
+        checkout_cart({str(self.a.pk): 2}, self.admin)
+        row = SalesRollup.objects.get(product=self.a)
+        self.assertEqual((row.quantity, row.revenue), (5, Decimal('750')))
+        receipts = ReceiptRollup.objects.get()
+        self.assertEqual((receipts.receipts, receipts.revenue), (2, Decimal('900')))
+
+    def test_rebuild_matches_incremental_and_follows_deletes(self):
+        sale = checkout_cart({str(self.a.pk): 3, str(self.b.pk): 1}, self.admin)
+        checkout_cart({str(self.b.pk): 4}, self.admin)
+        incremental = sorted(SalesRollup.objects.values_list('product_id', 'quantity', 'revenue'))
+        call_command('rebuild_rollups', stdout=StringIO())
+        self.assertEqual(incremental, sorted(SalesRollup.objects.values_list('product_id', 'quantity', 'revenue')))
+        with self.captureOnCommitCallbacks(execute=True):
+            sale.delete()
+        self.assertEqual(list(SalesRollup.objects.values_list('product_id', 'quantity')), [(self.b.pk, 4)])
+        self.assertEqual(ReceiptRollup.objects.get().receipts, 1)
+
+    def test_admin_edits_refresh_once_after_commit(self):
+        sale = checkout_cart({str(self.a.pk): 3, str(self.b.pk): 1}, self.admin)
+        other = checkout_cart({str(self.b.pk): 4}, self.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            # Rollback qilingan savepoint: callback'i tashlanadi, keyingi commit baribir to'g'ri hisoblaydi
+            with self.assertRaises(ValueError), transaction.atomic():
+                other.items.get().delete()
+                raise ValueError
+            for item in sale.items.all():
+                item.quantity = 1
+                item.save()
+            other.delete()
+        sale.refresh_from_db()
+        self.assertEqual(sale.total, self.a.s_price + self.b.s_price)
+        self.assertEqual(sorted(SalesRollup.objects.values_list('product_id', 'quantity')),
+                         [(self.a.pk, 1), (self.b.pk, 1)])
+        self.assertEqual(ReceiptRollup.objects.get().receipts, 1)
+
+    def test_sales_without_cashier_share_one_rollup_row(self):
+        checkout_cart({str(self.a.pk): 1})
+        checkout_cart({str(self.a.pk): 2})
+        row = SalesRollup.objects.get(product=self.a)
+        self.assertEqual((row.cashier_id, row.quantity), (None, 3))
+        self.assertEqual(ReceiptRollup.objects.get().receipts, 2)
+
+    def test_deleted_cashier_merges_into_no_cashier_rows(self):
+        cashier = User.objects.create_user('kassir')
+        checkout_cart({str(self.a.pk): 1})
+        checkout_cart({str(self.a.pk): 4}, cashier)
+        cashier.delete()
+        row = SalesRollup.objects.get(product=self.a)
+        self.assertEqual((row.cashier_id, row.quantity, row.revenue), (None, 5, Decimal('750')))
+        self.assertEqual(ReceiptRollup.objects.get().receipts, 2)
+
+    def test_statistics_query_count_flat(self):
+        self.client.force_login(self.admin)
+        checkout_cart({str(self.a.pk): 1}, self.admin)
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(reverse('statistics'))
+        for _ in range(30):
+            checkout_cart({str(self.a.pk): 1, str(self.b.pk): 1}, self.admin)
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get(reverse('statistics'))
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+        self.assertEqual(response.context['kassir_stats'][0]['total_sum'], Decimal('9150'))
+
+
+class JobsRootMixin:
+    def use_temp_jobs_root(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        override = self.settings(JOBS_ROOT=tmp.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def run_worker(self):
+        call_command('runworker', '--once', '--processes', '0', stdout=StringIO())
+
+    def download(self, job_id):
+        response = self.client.get(reverse('job_download', args=[job_id]))
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+
+class SalesPdfExportTests(JobsRootMixin, TestCase):
+    def setUp(self):
+        self.use_temp_jobs_root()
+        self.admin = User.objects.create_superuser('admin', password='x')
+        self.client.force_login(self.admin)
+        (self.product,) = make_products(1, stock=1000)
+
+    def export(self, **params):
+        response = self.client.get(reverse('export_sales_pdf'), params, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(response.status_code, 202)
+        job_id = response.json()['job_id']
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(jobs.run_job(jobs.claim()[0]), Job.DONE)
+        return self.download(job_id), len(ctx.captured_queries)
+
+    def test_streamed_pdf_is_complete_and_query_count_flat(self):
+        checkout_cart({str(self.product.pk): 1}, self.admin)
+        _, small = self.export()
+        for _ in range(150):
+            checkout_cart({str(self.product.pk): 1}, self.admin)
+        data, large = self.export()
+        self.assertEqual(small, large)
+        self.assertTrue(data.startswith(b'%PDF-1.4'))
+        self.assertTrue(data.rstrip().endswith(b'%%EOF'))
+        self.assertIn(b'/Count 3', data)
+
+    def test_date_range_filter(self):
+        sale = checkout_cart({str(self.product.pk): 1}, self.admin)
+        Sale.objects.filter(pk=sale.pk).update(created_at=timezone.now() - timedelta(days=10))
+        checkout_cart({str(self.product.pk): 1}, self.admin)
+        data, _ = self.export(date_from=timezone.localdate().isoformat())
+        self.assertIn(b'/Count 1', data)
+        self.assertNotIn(b'(%d) Tj' % sale.pk, data)
+
+
+class JobQueueTests(JobsRootMixin, TestCase):
+    def setUp(self):
+        self.use_temp_jobs_root()
+        self.admin = User.objects.create_superuser('admin', password='x')
+        self.client.force_login(self.admin)
+
+    def test_export_runs_in_worker_and_expires(self):
+        make_products(3)
+        response = self.client.get(reverse('management_product_export'))
+        job = Job.objects.get()
+        self.assertRedirects(response, reverse('job_detail', args=[job.pk]))
+        self.assertEqual(self.client.get(reverse('job_status', args=[job.pk])).json()['status'], Job.PENDING)
+
+        self.run_worker()
+        status = self.client.get(reverse('job_status', args=[job.pk])).json()
+        self.assertEqual(status['status'], Job.DONE)
+        self.assertEqual(len(json.loads(self.download(job.pk))), 3)
+
+        Job.objects.filter(pk=job.pk).update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.client.get(reverse('job_download', args=[job.pk])).status_code, 410)
+        self.assertEqual(jobs.cleanup_expired(), 1)
+        self.assertFalse(any(Path(settings.JOBS_ROOT).glob(f'{job.pk}-*')))
+
+    def test_import_job_reports_result(self):
+        category = Catagory.objects.create(name='Ichimlik')
+        ombor = Ombor.objects.create(name='Asosiy')
+        payload = json.dumps([{
+            'barcode': '4780001', 'desc': 'Suv', 'r_price': '3000', 's_price': '4000', 'stock': 5,
+            'catagory': category.name, 'ombor': ombor.name,
+            'start_date': '2024-01-01', 'end_date': '2030-01-01',
+        }]).encode()
+        upload = SimpleUploadedFile('products.json', payload, content_type='application/json')
+        response = self.client.post(reverse('management_product_import'), {'file': upload},
+                                    HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(response.status_code, 202)
+        self.run_worker()
+        job = Job.objects.get(pk=response.json()['job_id'])
+        self.assertEqual(job.status, Job.DONE, job.message)
+        self.assertTrue(Product.objects.filter(barcode='4780001', stock=5).exists())
+        self.assertFalse(any((Path(settings.JOBS_ROOT) / 'uploads').iterdir()))
+
+    def test_worker_fails_jobs_left_running_by_a_crash(self):
+        stale = jobs.enqueue('export_products', user=self.admin)
+        fresh = jobs.enqueue('export_products', user=self.admin)
+        jobs.claim(2)
+        Job.objects.filter(pk=stale.pk).update(
+            started_at=timezone.now() - timedelta(seconds=settings.JOB_STALE_TIMEOUT + 60))
+        self.run_worker()
+        stale.refresh_from_db()
+        fresh.refresh_from_db()
+        self.assertEqual((stale.status, fresh.status), (Job.FAILED, Job.RUNNING))
+        self.assertTrue(stale.message)
+        self.assertEqual(self.client.get(reverse('job_status', args=[stale.pk])).json()['status'], Job.FAILED)
+
+    def test_other_users_cannot_see_job(self):
+        job = jobs.enqueue('export_products', user=self.admin)
+        kassir = User.objects.create_user('kassir', password='x')
+        self.client.force_login(kassir)
+        self.assertEqual(self.client.get(reverse('job_status', args=[job.pk])).status_code, 404)
+        self.assertEqual(self.client.post(reverse('management_product_import')).status_code, 302)
+
+
+class ProductImportTests(TestCase):
+    def setUp(self):
+        self.category = Catagory.objects.create(name='Ichimlik')
+        self.ombor = Ombor.objects.create(name='Asosiy')
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def write_csv(self, rows, name='products.csv'):
+        path = Path(self.tmp.name) / name
+        with open(path, 'w', newline='', encoding='utf-8') as fp:
+            writer = csv.DictWriter(fp, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+        return path
+
+    def row(self, barcode, **extra):
+        row = {'barcode': barcode, 'desc': f'Mahsulot {barcode}', 'r_price': '1000', 's_price': '1500',
+               'stock': '3', 'catagory': 'Ichimlik', 'ombor': 'Asosiy'}
+        row.update(extra)
+        return row
+
+    def test_creates_updates_and_reports_bad_rows(self):
+        Product.objects.create(catagory=self.category, ombor=self.ombor, barcode='100', desc='Eski',
+                               r_price=1, s_price=2, stock=1)
+        path = self.write_csv([
+            self.row('100', desc='Yangi nom', stock='9'),
+            self.row('200'),
+            self.row('300', catagory='Yo‘q'),
+            self.row('400', s_price='abc'),
+        ])
+        report = importers.import_products(path)
+        self.assertEqual((report.created, report.updated), (1, 1))
+        self.assertEqual([number for number, _ in report.errors], [4, 5])
+        self.assertIn('Kategoriya topilmadi', report.errors[0][1])
+        updated = Product.objects.get(barcode='100')
+        self.assertEqual((updated.desc, updated.stock), ('Yangi nom', 9))
+        self.assertTrue(Product.objects.filter(barcode='200', catagory=self.category).exists())
+        self.assertFalse(Product.objects.filter(barcode__in=['300', '400']).exists())
+
+    def test_query_count_does_not_grow_with_rows(self):
+        def run(count, prefix):
+            path = self.write_csv([self.row(f'{prefix}{i}') for i in range(count)], name=f'{prefix}.csv')
+            with CaptureQueriesContext(connection) as ctx:
+                importers.import_products(path)
+            return len(ctx.captured_queries)
+        # 60 qator SQLite'ning bitta INSERT partiyasiga sig'adi
+        self.assertEqual(run(5, 'A'), run(60, 'B'))
+        self.assertEqual(Product.objects.count(), 65)
+
+    def test_xlsx_and_chunked_updates(self):
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(['barcode', 'desc', 'r_price', 's_price', 'catagory_id', 'ombor_id'])
+        for i in range(5):
+            sheet.append([4780000 + i, f'Excel {i}', 10, 12.5, self.category.pk, self.ombor.pk])
+        path = Path(self.tmp.name) / 'products.xlsx'
+        workbook.save(path)
+        report = importers.import_products(path, chunk_size=2)
+        self.assertEqual((report.created, report.errors), (5, []))
+        self.assertEqual(Product.objects.get(barcode='4780003').s_price, Decimal('12.5'))
+        report = importers.import_products(path, chunk_size=2)
+        self.assertEqual((report.created, report.updated), (0, 5))
+
+
+class CatalogueExportTests(JobsRootMixin, TestCase):
+    def setUp(self):
+        self.use_temp_jobs_root()
+        self.admin = User.objects.create_superuser('admin', password='x')
+        self.client.force_login(self.admin)
+
+    def export(self, **params):
+        response = self.client.get(reverse('management_product_export'), params,
+                                   HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        job_id = response.json()['job_id']
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(jobs.run_job(jobs.claim()[0]), Job.DONE)
+        return self.download(job_id), len(ctx.captured_queries)
+
+    def test_jsonl_filters_and_flat_query_count(self):
+        products = make_products(4)
+        other = Ombor.objects.create(name='Ikkinchi')
+        Product.objects.filter(pk=products[0].pk).update(ombor=other)
+        data, small = self.export(format='jsonl', ombor=products[1].ombor_id)
+        lines = [json.loads(line) for line in data.decode().splitlines()]
+        self.assertEqual([row['id'] for row in lines], [p.pk for p in products[1:]])
+        self.assertEqual(lines[0]['catagory'], products[1].catagory.name)
+
+        make_products(50, prefix='Q')
+        _, large = self.export(format='jsonl')
+        self.assertEqual(small, large)
+
+    def test_changed_since_uses_updated_at(self):
+        old, fresh = make_products(2)
+        Product.objects.filter(pk=old.pk).update(updated_at=timezone.now() - timedelta(days=3))
+        Product.objects.filter(pk=fresh.pk).update(updated_at=timezone.now() - timedelta(days=3))
+        checkout_cart({str(fresh.pk): 1}, self.admin)
+        since = (timezone.now() - timedelta(days=1)).isoformat()
+        data, _ = self.export(format='csv', changed_since=since)
+        rows = list(csv.DictReader(data.decode('utf-8-sig').splitlines()))
+        self.assertEqual([row['barcode'] for row in rows], [fresh.barcode])
+        self.assertEqual(rows[0]['stock'], str(fresh.stock - 1))
+
+    def test_category_export_applies_changed_since(self):
+        old = Catagory.objects.create(name='Eski')
+        fresh = Catagory.objects.create(name='Yangi')
+        Catagory.objects.filter(pk=old.pk).update(updated_at=timezone.now() - timedelta(days=3))
+        since = (timezone.now() - timedelta(days=1)).isoformat()
+        response = self.client.get(reverse('management_category_export'), {'format': 'csv', 'changed_since': since},
+                                   HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(jobs.run_job(jobs.claim()[0]), Job.DONE)
+        data = self.download(response.json()['job_id'])
+        rows = list(csv.DictReader(data.decode('utf-8-sig').splitlines()))
+        self.assertEqual([row['name'] for row in rows], [fresh.name])
+
+    def test_xlsx_round_trips_through_import(self):
+        products = make_products(3)
+        data, _ = self.export(format='xlsx')
+        path = Path(settings.JOBS_ROOT) / 'roundtrip.xlsx'
+        path.write_bytes(data)
+        Product.objects.filter(pk__in=[p.pk for p in products]).update(stock=0)
+        report = importers.import_products(path)
+        self.assertEqual((report.created, report.updated, report.errors), (0, 3, []))
+        self.assertEqual(set(Product.objects.values_list('stock', flat=True)), {products[0].stock})
+
+
+class DeltaSyncTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('display', password='x')
+        self.client.force_login(self.user)
+
+    def poll(self, since, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get(reverse('sync_changes'), {'since': since}, **headers)
+
+    def test_changes_since_cursor_and_not_modified(self):
+        products = make_products(3)
+        first = self.poll(0).json()
+        self.assertEqual(len(first['products']), 3)
+        self.assertEqual(len(first['categories']), 1)
+        self.assertEqual(len(first['ombors']), 1)
+
+        response = self.poll(first['cursor'])
+        self.assertEqual(response.json()['products'], [])
+        etag = response['ETag']
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.poll(first['cursor'], etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len([q for q in ctx.captured_queries if 'market_changelog' in q['sql']]), 1)
+        self.assertFalse([q for q in ctx.captured_queries if 'market_product' in q['sql']])
+
+        checkout_cart({str(products[0].pk): 2}, self.user)
+        deleted_pk = products[1].pk
+        products[1].delete()
+        response = self.poll(first['cursor'], etag)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([(p['id'], p['stock']) for p in data['products']], [(products[0].pk, 8)])
+        self.assertEqual(data['deleted'], {'product': [deleted_pk]})
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_pages_and_collapses_repeated_changes(self):
+        (product,) = make_products(1)
+        for price in (200, 300, 400):
+            product.s_price = price
+            product.save()
+        cursor = 0
+        seen = []
+        while True:
+            data = self.client.get(reverse('sync_changes'), {'since': cursor, 'limit': 2}).json()
+            seen.extend((p['id'], p['s_price']) for p in data['products'])
+            cursor = data['cursor']
+            if not data['more']:
+                break
+        self.assertEqual(seen[-1], (product.pk, '400.00'))
+        self.assertEqual(ChangeLog.objects.latest('id').id, cursor)
+
+    def test_bulk_import_is_logged(self):
+        category = Catagory.objects.create(name='Ichimlik')
+        Ombor.objects.create(name='Asosiy')
+        cursor = sync.latest_cursor()
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False) as fp:
+            for i in range(3):
+                fp.write(json.dumps({'barcode': f'S{i}', 'r_price': 1, 's_price': 2,
+                                     'catagory': category.name, 'ombor': 'Asosiy'}) + '\n')
+        self.addCleanup(os.unlink, fp.name)
+        importers.import_products(fp.name)
+        data = self.poll(cursor).json()
+        self.assertEqual(sorted(p['barcode'] for p in data['products']), ['S0', 'S1', 'S2'])
+
+
+class OfflineTillTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('kassir')
+        self.client.force_login(self.user)
+        self.products = make_products(4, prefix='O')
+
+    def snapshot(self, since=0, **extra):
+        response = self.client.get(reverse('catalogue_snapshot'), {'since': since},
+                                   HTTP_ACCEPT_ENCODING='gzip', **extra)
+        if response.status_code != 200:
+            return response, None
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        return response, json.loads(gzip.decompress(response.content))
+
+    def test_full_snapshot_then_diff(self):
+        self.products[1].end_date = timezone.localdate() - timedelta(days=1)
+        self.products[1].save()
+        response, full = self.snapshot()
+        self.assertTrue(full['full'])
+        ids = [row[full['columns'].index('id')] for row in full['rows']]
+        self.assertEqual(ids, [p.pk for p in self.products if p.pk != self.products[1].pk])
+
+        not_modified, _ = self.snapshot(full['version'], HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+
+        self.products[0].s_price = Decimal('175')
+        self.products[0].save()
+        self.products[2].is_active = False
+        self.products[2].save()
+        _, diff = self.snapshot(full['version'])
+        self.assertFalse(diff['full'])
+        self.assertEqual([(row[0], row[3]) for row in diff['rows']], [(self.products[0].pk, '175.00')])
+        self.assertEqual(diff['removed'], [self.products[2].pk])
+
+    def test_snapshot_desc_never_null(self):
+        # Kassa qidiruvi desc.toLowerCase() qiladi: null bitta mahsulot bilan butun qidiruvni buzardi
+        Product.objects.filter(pk=self.products[0].pk).update(desc=None)
+        _, full = self.snapshot()
+        self.assertEqual(full['rows'][0][full['columns'].index('desc')], '')
+
+    def test_batch_checkout_is_idempotent(self):
+        url = reverse('checkout_batch')
+        receipts = [
+            {'idempotency_key': 'till1-0001', 'lines': {str(self.products[0].pk): 2}},
+            {'idempotency_key': 'till1-0002', 'lines': {str(self.products[1].pk): 50}},
+            {'lines': {str(self.products[2].pk): 1}},
+        ]
+        first = self.client.post(url, {'receipts': receipts}, content_type='application/json').json()['results']
+        self.assertEqual([r['status'] for r in first], ['created', 'rejected', 'rejected'])
+        again = self.client.post(url, {'receipts': receipts[:1]}, content_type='application/json').json()['results']
+        self.assertEqual(again, [{'idempotency_key': 'till1-0001', 'status': 'duplicate', 'sale_id': first[0]['sale_id']}])
+        self.assertEqual(Sale.objects.count(), 1)
+        self.products[0].refresh_from_db()
+        self.assertEqual(self.products[0].stock, 8)
+
+    def test_batch_checkout_rejects_bad_payload(self):
+        response = self.client.post(reverse('checkout_batch'), 'nope', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+class BatchCheckoutApiTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('kiosk')
+        self.client.force_login(self.user)
+        self.products = make_products(30, prefix='B')
+
+    def post(self, receipts):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(reverse('checkout_batch'), {'receipts': receipts},
+                                        content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results'], len(ctx)
+
+    def receipts(self, count, tag):
+        return [{'idempotency_key': f"{tag}-{i}", 'lines': {str(self.products[i].pk): 1, str(self.products[i + 1].pk): 2}}
+                for i in range(count)]
+
+    def test_query_count_does_not_depend_on_batch_size(self):
+        small, small_queries = self.post(self.receipts(2, 'a'))
+        large, large_queries = self.post(self.receipts(20, 'b'))
+        self.assertEqual({r['status'] for r in small + large}, {'created'})
+        self.assertEqual(small_queries, large_queries)
+        self.assertEqual(Sale.objects.count(), 22)
+        self.assertEqual(ReceiptRollup.objects.aggregate(n=Sum('receipts'))['n'], 22)
+        self.assertEqual(StockMovement.objects.filter(kind=StockMovement.SALE).count(), 44)
+        self.assertIn('mos', _reconcile())
+
+    def test_receipts_compete_for_stock_in_order(self):
+        pk = str(self.products[0].pk)
+        results, _ = self.post([
+            {'idempotency_key': 'k1', 'lines': {pk: 6}},
+            {'idempotency_key': 'k2', 'lines': {pk: 6}},
+            {'idempotency_key': 'k1', 'lines': {pk: 6}},
+            {'idempotency_key': 'k3', 'lines': {pk: 'x'}},
+            {'idempotency_key': 'k4', 'lines': {pk: 4}},
+        ])
+        self.assertEqual([r['status'] for r in results], ['created', 'rejected', 'duplicate', 'rejected', 'created'])
+        self.assertEqual(results[0]['sale_id'], results[2]['sale_id'])
+        self.assertEqual(Sale.objects.filter(idempotency_key='k1').count(), 1)
+        self.assertIn('lines', results[3]['errors'][0])
+        self.products[0].refresh_from_db()
+        self.assertEqual(self.products[0].stock, 0)
+
+    def test_repeated_key_in_batch_reported_once(self):
+        pk = str(self.products[0].pk)
+        results, _ = self.post([
+            {'idempotency_key': 'r1', 'lines': {pk: 50}},
+            {'idempotency_key': 'c1', 'lines': {pk: 1}},
+            {'idempotency_key': 'r1', 'lines': {pk: 50}},
+            {'idempotency_key': 'c1', 'lines': {pk: 1}},
+        ])
+        self.assertEqual([r['status'] for r in results], ['rejected', 'created', 'rejected', 'duplicate'])
+        self.assertEqual(results[3], {'idempotency_key': 'c1', 'status': 'duplicate', 'sale_id': results[1]['sale_id']})
+        self.assertIsNot(results[0], results[2])
+
+    def test_stale_offline_price_is_not_charged(self):
+        product = self.products[0]
+        pk = str(product.pk)
+        results, _ = self.post([
+            {'idempotency_key': 'p1', 'lines': {pk: 1}, 'prices': {pk: str(product.s_price)}},
+            {'idempotency_key': 'p2', 'lines': {pk: 1}, 'prices': {pk: str(product.s_price - 1)}},
+            {'idempotency_key': 'p3', 'lines': {pk: 1}, 'prices': {pk: 'x'}},
+        ])
+        self.assertEqual([r['status'] for r in results], ['created', 'rejected', 'rejected'])
+        self.assertIn("narxi o'zgardi", results[1]['errors'][0])
+        self.assertIn('prices', results[2]['errors'][0])
+        self.assertEqual(Sale.objects.get().total, product.s_price)
+
+    def test_requires_login(self):
+        self.client.logout()
+        response = self.client.post(reverse('checkout_batch'), {'receipts': self.receipts(1, 'c')},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 403)
+
+
+class StockLedgerTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', password='x')
+        self.client.force_login(self.admin)
+        self.products = make_products(2, stock=0)
+        stock_module.receive({p.pk: 10 for p in self.products}, self.admin)
+
+    def reconcile(self, *args):
+        out = StringIO()
+        call_command('reconcile_stock', *args, stdout=out)
+        return out.getvalue()
+
+    def test_checkout_writes_sale_movements(self):
+        sale = checkout_cart({str(self.products[0].pk): 3, str(self.products[1].pk): 1}, self.admin)
+        movements = StockMovement.objects.filter(sale=sale, kind=StockMovement.SALE)
+        self.assertEqual(sorted(movements.values_list('quantity', flat=True)), [-3, -1])
+        self.assertIn('mos', self.reconcile())
+
+    def test_admin_list_editable_does_not_write_stock(self):
+        product = self.products[0]
+        data = {
+            'form-TOTAL_FORMS': '1', 'form-INITIAL_FORMS': '1', '_save': 'Save',
+            'form-0-id': str(product.pk), 'form-0-stock': '4',
+        }
+        response = self.client.post(reverse('admin:market_product_changelist'), data)
+        self.assertEqual(response.status_code, 302)
+        product.refresh_from_db()
+        self.assertEqual((product.stock, product.is_active), (10, False))
+        self.assertFalse(StockMovement.objects.filter(kind=StockMovement.ADJUSTMENT).exists())
+
+    def test_admin_import_resource_does_not_write_stock(self):
+        dataset = ProductResource().export()
+        column = dataset.headers.index('stock')
+        rows = [list(row) for row in dataset]
+        for row in rows:
+            row[column] = 99
+        result = ProductResource().import_data(tablib.Dataset(*rows, headers=dataset.headers), dry_run=False)
+        self.assertFalse(result.has_errors())
+        self.assertEqual(set(Product.objects.values_list('stock', flat=True)), {10})
+        self.assertIn('mos', self.reconcile())
+
+    def test_reconcile_reports_and_fixes_drift(self):
+        product = self.products[0]
+        Product.objects.filter(pk=product.pk).update(stock=99)
+        with self.assertRaises(CommandError):
+            self.reconcile()
+        with CaptureQueriesContext(connection) as ctx:
+            output = self.reconcile('--fix')
+        self.assertIn('kesh 99, jurnal 10', output)
+        product.refresh_from_db()
+        self.assertEqual(product.stock, 10)
+        # Umumiy qoldiq va ombor qoldiqlari uchun bittadan GROUP BY
+        self.assertEqual(len([q for q in ctx.captured_queries if 'GROUP BY' in q['sql']]), 2)
+        self.assertIn('mos', self.reconcile())
+
+    def test_reconcile_fixes_balance_drift(self):
+        product = self.products[0]
+        StockBalance.objects.filter(product=product).update(quantity=3)
+        with self.assertRaises(CommandError):
+            self.reconcile()
+        self.assertIn('qoldiq 3, jurnal 10', self.reconcile('--fix'))
+        self.assertEqual(StockBalance.objects.get(product=product).quantity, 10)
+        self.assertIn('mos', self.reconcile())
+
+
+class MultiWarehouseTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', password='x')
+        self.client.force_login(self.admin)
+        self.products = make_products(3)
+        self.home = self.products[0].ombor
+        self.shop = Ombor.objects.create(name="Do'kon")
+        self.till = Till.objects.create(name='Kassa 1', ombor=self.shop)
+
+    def balance(self, product, ombor):
+        row = StockBalance.objects.filter(product=product, ombor=ombor).first()
+        return row.quantity if row else 0
+
+    def test_transfer_moves_balance_in_constant_queries(self):
+        with CaptureQueriesContext(connection) as small:
+            stock_module.transfer(self.home.pk, self.shop.pk, {self.products[0].pk: 4})
+        with CaptureQueriesContext(connection) as large:
+            stock_module.transfer(self.home.pk, self.shop.pk, {p.pk: 1 for p in self.products})
+        self.assertEqual(len(small), len(large))
+        self.assertEqual((self.balance(self.products[0], self.home), self.balance(self.products[0], self.shop)), (5, 5))
+        self.products[0].refresh_from_db()
+        self.assertEqual(self.products[0].stock, 10)
+        self.assertIn('mos', _reconcile())
+
+    def test_transfer_shortfall_changes_nothing(self):
+        with self.assertRaises(stock_module.StockError) as ctx:
+            stock_module.transfer(self.home.pk, self.shop.pk, {self.products[0].pk: 5, self.products[1].pk: 11})
+        self.assertIn('qolgan: 10', str(ctx.exception))
+        self.assertEqual(self.balance(self.products[0], self.home), 10)
+        self.assertFalse(StockMovement.objects.filter(kind=StockMovement.TRANSFER).exists())
+
+    def test_home_ombor_change_moves_balance(self):
+        product = self.products[0]
+        data = model_to_dict(product)
+        data['ombor'] = self.shop.pk
+        form = ProductForm(data, instance=product)
+        self.assertTrue(form.is_valid(), form.errors)
+        stock_module.save_product_form(form, self.admin)
+        self.assertEqual((self.balance(product, self.home), self.balance(product, self.shop)), (0, 10))
+        # Kassasiz checkout yangi asosiy ombordan sotadi
+        checkout_cart({str(product.pk): 10}, self.admin)
+        self.assertIn('mos', _reconcile())
+
+    def test_import_ombor_change_moves_balance(self):
+        product = self.products[1]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'p.csv'
+            path.write_text(f"barcode,ombor,stock\n{product.barcode},{self.shop.name},12\n", encoding='utf-8')
+            importers.import_products(path)
+        self.assertEqual((self.balance(product, self.home), self.balance(product, self.shop)), (0, 12))
+        self.assertIn('mos', _reconcile())
+
+    def test_checkout_sells_from_till_ombor(self):
+        stock_module.transfer(self.home.pk, self.shop.pk, {self.products[0].pk: 2})
+        with self.assertRaises(CheckoutError):
+            checkout_cart({str(self.products[0].pk): 3}, self.admin, ombor_id=self.shop.pk)
+        checkout_cart({str(self.products[0].pk): 2}, self.admin, ombor_id=self.shop.pk)
+        checkout_cart({str(self.products[0].pk): 1}, self.admin)
+        self.assertEqual((self.balance(self.products[0], self.shop), self.balance(self.products[0], self.home)), (0, 7))
+        self.products[0].refresh_from_db()
+        self.assertEqual(self.products[0].stock, 7)
+        self.assertIn('mos', _reconcile())
+
+    def test_kassa_shows_till_availability(self):
+        stock_module.transfer(self.home.pk, self.shop.pk, {self.products[0].pk: 6})
+        self.client.post(reverse('till_select'), {'till': self.till.pk})
+        self.assertEqual(self.client.session['till_id'], self.till.pk)
+        response = self.client.get(reverse('kassa'))
+        available = response.context['available']
+        self.assertEqual((available[self.products[0].pk], available[self.products[1].pk]), (6, 0))
+        self.assertContains(response, 'id="products-available"')
+
+    def test_admin_transfer_view(self):
+        lines = f"{self.products[0].barcode} 3\n{self.products[1].barcode} 2\n"
+        response = self.client.post(reverse('admin_stock_transfer'), {
+            'from_ombor': self.home.pk, 'to_ombor': self.shop.pk, 'lines': lines,
+        })
+        self.assertRedirects(response, reverse('admin_stock_transfer'))
+        self.assertEqual(self.balance(self.products[1], self.shop), 2)
+        response = self.client.post(reverse('admin_stock_transfer'), {
+            'from_ombor': self.home.pk, 'to_ombor': self.shop.pk, 'lines': 'YOQ 1',
+        })
+        self.assertContains(response, 'Barcode topilmadi: YOQ')
+
+
+def _reconcile():
+    out = StringIO()
+    call_command('reconcile_stock', stdout=out)
+    return out.getvalue()
+
+
+class PerfTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        override = self.settings(PERF_SNAPSHOT_DIR=tmp.name, PERF_SLOW_MS=10_000)
+        override.enable()
+        self.addCleanup(override.disable)
+        perf.reset()
+        self.addCleanup(perf.reset)
+        self.admin = User.objects.create_superuser('admin', password='x')
+        self.client.force_login(self.admin)
+
+    def test_records_queries_and_template_time_per_url_name(self):
+        make_products(3)
+        self.client.get(reverse('kassa'))
+        self.client.get(reverse('kassa'))
+        stats, _ = perf.collect()
+        kassa = stats['kassa']
+        self.assertEqual(kassa['count'], 2)
+        self.assertGreater(kassa['queries']['sum'], 0)
+        self.assertGreater(kassa['template_ms']['sum'], 0)
+        self.assertEqual(sum(kassa['latency_ms']['buckets']), 2)
+
+    def test_repeated_sql_counts_as_duplicate_and_slow(self):
+        measure = perf._Measure()
+        for pk in range(5):
+            measure(lambda *args: None, 'SELECT 1 FROM t WHERE id = %s', [pk], False, {})
+        measure(lambda *args: None, 'SELECT 2', [], False, {})
+        with self.settings(PERF_SLOW_MS=0), self.assertLogs('market.perf', 'WARNING'):
+            perf.record('demo', 12.0, measure, '/demo/')
+        stats, slow = perf.collect()
+        self.assertEqual((stats['demo']['queries']['sum'], stats['demo']['duplicates']['sum']), (6, 4))
+        self.assertEqual(slow[0]['repeated'], [('SELECT 1 FROM t WHERE id = %s', 5)])
+
+    def test_report_merges_snapshots_of_other_processes(self):
+        self.client.get(reverse('kassa'))
+        perf.flush()
+        other = json.loads((Path(settings.PERF_SNAPSHOT_DIR) / perf._snapshot_name).read_text())
+        (Path(settings.PERF_SNAPSHOT_DIR) / 'boshqa.json').write_text(json.dumps(other))
+        out = StringIO()
+        call_command('perfreport', '--sort', 'queries', stdout=out)
+        stats, _ = perf.collect()
+        # O'z fayli xotiradan olinadi, boshqa jarayon fayli qo'shiladi
+        self.assertEqual(stats['kassa']['count'], 2)
+        self.assertIn('kassa', out.getvalue())
+
+    def test_endpoint_is_superuser_only(self):
+        self.client.get(reverse('kassa'))
+        data = self.client.get(reverse('perf_report')).json()
+        self.assertIn('kassa', [row['name'] for row in data['views']])
+        cashier = User.objects.create_user('kassir', password='x')
+        self.client.force_login(cashier)
+        self.assertEqual(self.client.get(reverse('perf_report')).status_code, 302)
+
+
+class QueryBudgetTests(JobsRootMixin, TestCase):
+    """
+    market/urls.py dagi har bir sahifa uchun SQL so'rovlar budjeti. Har bir sahifa kichik va
+    katta hajmdagi ma'lumot bilan ochiladi: so'rovlar soni hajmga bog'liq bo'lsa (N+1) test yiqiladi.
+    """
+    SMALL, LARGE = 2, 25
+
+    def setUp(self):
+        self.use_temp_jobs_root()
+        self.admin = User.objects.create_superuser('admin', password='x')
+        (self.cashier,) = make_cashiers(1)
+        self.client.force_login(self.admin)
+        self.seed(self.SMALL, 'A')
+        self.product = Product.objects.order_by('pk').first()
+        self.sale = Sale.objects.order_by('pk').first()
+        self.category = self.product.catagory
+        self.ombor = self.product.ombor
+        self.group = Group.objects.get(name='Kassir')
+        self.till = Till.objects.create(name='Kassa 1', ombor=self.ombor)
+        self.job = Job.objects.create(kind='export_products', created_by=self.admin)
+
+    def seed(self, scale, prefix):
+        products = make_products(scale, stock=100, prefix=prefix)
+        make_sales(products, scale, self.cashier)
+        make_cashiers(scale, prefix=f"{prefix.lower()}kassir")
+        Catagory.objects.bulk_create([Catagory(name=f"{prefix} kategoriya {i}") for i in range(scale)])
+        Ombor.objects.bulk_create([Ombor(name=f"{prefix} ombor {i}") for i in range(scale)])
+        Group.objects.bulk_create([Group(name=f"{prefix} guruh {i}") for i in range(scale)])
+        return products
+
+    def count(self, method, name, args=(), data=None, **extra):
+        with CaptureQueriesContext(connection) as ctx:
+            response = getattr(self.client, method)(reverse(name, args=args), data, **extra)
+        self.assertLess(response.status_code, 400, f"{name}: {response.status_code}")
+        return len(ctx)
+
+    def assertBudgets(self, cases, grow):
+        # cases: [(budjet, method, url_nomi, args, data), ...]; grow() ma'lumot hajmini oshiradi
+        small = [self.count(method, name, args, data) for _, method, name, args, data in cases]
+        grow()
+        large = [self.count(method, name, args, data) for _, method, name, args, data in cases]
+        for (budget, _, name, _, _), before, after in zip(cases, small, large):
+            with self.subTest(url=name):
+                self.assertEqual(before, after, f"{name}: so'rovlar soni hajm bilan o'sdi ({before} -> {after})")
+                self.assertLessEqual(after, budget, f"{name}: {after} ta so'rov, budjet {budget}")
+
+    def test_read_pages(self):
+        self.client.post(reverse('till_select'), {'till': self.till.pk})
+        cases = [
+            (0, 'get', 'home', (), None),
+            (2, 'get', 'dashboard', (), None),
+            (0, 'get', 'login', (), None),
+            # Kesh o'tkazib yuborilgandagi budjet (katalog versiyasi + qidiruv); keshdan 4 va 3
+            (7, 'get', 'kassa', (), None),
+            (9, 'get', 'product_search', (), {'q': 'mahsulot'}),
+            (4, 'get', 'sales_list', (), None),
+            (5, 'get', 'sale_detail', (self.sale.pk,), None),
+            (8, 'get', 'statistics', (), None),
+            (2, 'get', 'admin_management', (), None),
+            (5, 'get', 'admin_products', (), {'show_all': '1'}),
+            (4, 'get', 'admin_product_add', (), None),
+            (5, 'get', 'admin_product_edit', (self.product.pk,), None),
+            (3, 'get', 'admin_product_delete', (self.product.pk,), None),
+            (3, 'get', 'admin_categories', (), None),
+            (2, 'get', 'admin_category_add', (), None),
+            (3, 'get', 'admin_category_edit', (self.category.pk,), None),
+            (3, 'get', 'admin_category_delete', (self.category.pk,), None),
+            (3, 'get', 'admin_ombors', (), None),
+            (2, 'get', 'admin_ombor_add', (), None),
+            (3, 'get', 'admin_ombor_edit', (self.ombor.pk,), None),
+            (3, 'get', 'admin_ombor_delete', (self.ombor.pk,), None),
+            (3, 'get', 'admin_stock_transfer', (), None),
+            (4, 'get', 'admin_users', (), None),
+            (2, 'get', 'admin_user_add', (), None),
+            (5, 'get', 'admin_user_edit', (self.cashier.pk,), None),
+            (3, 'get', 'admin_user_delete', (self.cashier.pk,), None),
+            (3, 'get', 'admin_user_change_password', (self.cashier.pk,), None),
+            (3, 'get', 'admin_groups', (), None),
+            (2, 'get', 'admin_group_add', (), None),
+            (3, 'get', 'admin_group_edit', (self.group.pk,), None),
+            (3, 'get', 'admin_group_delete', (self.group.pk,), None),
+            (4, 'get', 'admin_sales', (), None),
+            (4, 'get', 'admin_sale_detail', (self.sale.pk,), None),
+            (3, 'get', 'admin_sale_delete', (self.sale.pk,), None),
+            (7, 'get', 'sync_changes', (), {'since': '0', 'limit': '50'}),
+            (6, 'get', 'catalogue_snapshot', (), {'since': '0'}),
+            (2, 'get', 'perf_report', (), None),
+            (3, 'get', 'job_detail', (self.job.pk,), None),
+            (3, 'get', 'job_status', (self.job.pk,), None),
+        ]
+        self.assertBudgets(cases, lambda: self.seed(self.LARGE, 'B'))
+
+    def test_enqueue_endpoints(self):
+        upload = lambda: SimpleUploadedFile('p.json', b'[]')  # noqa: E731
+        xhr = {'HTTP_X_REQUESTED_WITH': 'XMLHttpRequest'}
+        cases = [
+            (4, 'get', 'export_sales_pdf', (), None),
+            (4, 'get', 'statistics_export_pdf', (), None),
+            (4, 'get', 'statistics_export_excel', (), None),
+            (3, 'get', 'management_product_export', (), {'format': 'csv'}),
+            (3, 'get', 'management_category_export', (), None),
+        ]
+        self.assertBudgets(cases, lambda: self.seed(self.LARGE, 'B'))
+        for name in ('management_product_import', 'management_category_import'):
+            with self.subTest(url=name), CaptureQueriesContext(connection) as ctx:
+                self.client.post(reverse(name), {'file': upload()}, **xhr)
+            self.assertLessEqual(len(ctx), 3)
+
+    def test_cart_requests_do_not_depend_on_cart_size(self):
+        products = self.seed(self.LARGE, 'B')
+        xhr = {'HTTP_X_REQUESTED_WITH': 'XMLHttpRequest'}
+
+        def fill(count):
+            self.client.post(reverse('cart_clear'))
+            for product in products[:count]:
+                self.client.post(reverse('cart_add', args=[product.pk]), {'quantity': 1})
+
+        budgets = {}
+        for size in (1, 10):
+            fill(size)
+            target = products[size].pk
+            budgets[size] = [
+                self.count('post', 'cart_add', (target,), {'quantity': 1}),
+                self.count('post', 'cart_update', (target,), {'action': 'add'}),
+                self.count('post', 'cart_update', (target,), {'action': 'remove'}),
+                self.count('post', 'cart_scan', (), {'barcode': products[size + 1].barcode}),
+                self.count('post', 'cart_remove', (target,), None, **xhr),
+                self.count('post', 'till_select', (), {'till': self.till.pk}),
+            ]
+        self.assertEqual(budgets[1], budgets[10])
+        self.assertLessEqual(max(budgets[10]), 6)
+
+        # Savat asosiy ombordan sotadi (tanlangan kassa boshqa omborda)
+        self.client.post(reverse('till_select'), {'till': ''})
+        checkouts = {}
+        for size in (1, 10):
+            fill(size)
+            checkouts[size] = self.count('post', 'cart_checkout')
+        self.assertEqual(checkouts[1], checkouts[10])
+        self.assertLessEqual(checkouts[10], 22)
+        self.assertLessEqual(self.count('post', 'cart_clear'), 5)
+
+    def test_write_endpoints(self):
+        def product_data(barcode):
+            return {
+                'catagory': self.category.pk, 'ombor': self.ombor.pk, 'barcode': barcode, 'desc': 'Yangi',
+                'r_price': '1', 's_price': '2', 'stock': '5', 'start_date': '2024-01-01', 'is_active': 'on',
+            }
+
+        def writes(tag):
+            product = Product.objects.order_by('-pk').first()
+            category = Catagory.objects.create(name=f"{tag} o'chiriladi")
+            ombor = Ombor.objects.create(name=f"{tag} o'chiriladi")
+            user = User.objects.create_user(f"{tag}-del")
+            group = Group.objects.create(name=f"{tag} o'chiriladi")
+            sale = Sale.objects.order_by('-pk').first()
+            added = self.count('post', 'admin_product_add', (), product_data(f"{tag}-new"))
+            new_product = Product.objects.get(barcode=f"{tag}-new")
+            return [
+                added,
+                # Ombori o'zgarmaydi (o'zgarsa qoldiq ko'chiriladi — bu alohida yo'l)
+                self.count('post', 'admin_product_edit', (product.pk,),
+                           {**product_data(product.barcode), 'ombor': product.ombor_id, 'stock': '7'}),
+                self.count('post', 'admin_category_add', (), {'name': f"{tag} yangi"}),
+                self.count('post', 'admin_category_edit', (category.pk,), {'name': f"{tag} nom"}),
+                self.count('post', 'admin_category_delete', (category.pk,)),
+                self.count('post', 'admin_ombor_add', (), {'name': f"{tag} yangi"}),
+                self.count('post', 'admin_ombor_edit', (ombor.pk,), {'name': f"{tag} nom"}),
+                self.count('post', 'admin_ombor_delete', (ombor.pk,)),
+                self.count('post', 'admin_user_add', (), {'username': f"{tag}-u", 'password': 'x', 'role': 'kassir'}),
+                self.count('post', 'admin_user_edit', (user.pk,), {'username': user.username, 'role': 'kassir'}),
+                self.count('post', 'admin_user_delete', (user.pk,)),
+                self.count('post', 'admin_group_add', (), {'name': f"{tag} yangi"}),
+                self.count('post', 'admin_group_edit', (group.pk,), {'name': f"{tag} nom"}),
+                self.count('post', 'admin_group_delete', (group.pk,)),
+                self.count('post', 'admin_sale_delete', (sale.pk,)),
+                self.count('post', 'admin_product_delete', (new_product.pk,)),
+            ]
+
+        small = writes('a')
+        self.seed(self.LARGE, 'B')
+        large = writes('b')
+        self.assertEqual(small, large)
+        self.assertLessEqual(max(large), 25)
+
+    def test_stock_transfer_does_not_depend_on_line_count(self):
+        products = self.seed(self.LARGE, 'B')
+        target = Ombor.objects.create(name="Do'kon")
+
+        def transfer(count):
+            lines = "\n".join(f"{p.barcode} 1" for p in products[:count])
+            return self.count('post', 'admin_stock_transfer', (),
+                              {'from_ombor': products[0].ombor_id, 'to_ombor': target.pk, 'lines': lines})
+
+        self.assertEqual(transfer(1), transfer(20))
+
+
+    def test_bulk_delete_does_not_depend_on_selection_size(self):
+        # Sotuvda ishlatilgan mahsulotlar bitta UPDATE bilan arxivlanadi, qolganlari o'chiriladi
+        # (o'chirish jurnali har bir mahsulot uchun signal orqali yoziladi, shuning uchun ular soni bir xil)
+        def bulk_delete(count, prefix):
+            sold = self.seed(count, prefix)
+            fresh = make_products(2, prefix=f"{prefix}N")
+            ids = [p.pk for p in sold + fresh]
+            since = sync.latest_cursor()
+            queries = self.count('post', 'admin_product_bulk_delete', (), {'selected_products': ids})
+            self.assertEqual(Product.objects.filter(pk__in=ids, is_active=False).count(), count)
+            # Arxivlash update() bilan, lekin delta sinxronizatsiya jurnaliga baribir tushadi
+            logged = ChangeLog.objects.filter(id__gt=since, action=ChangeLog.UPSERT)
+            self.assertEqual(set(logged.values_list('object_id', flat=True)), {p.pk for p in sold})
+            self.assertFalse(Product.objects.filter(pk__in=[p.pk for p in fresh]).exists())
+            return queries
+
+        self.assertEqual(bulk_delete(self.SMALL, 'C'), bulk_delete(self.LARGE, 'D'))
+
+
+class LoadTestCommandTests(TestCase):
+    def test_single_cashier_run_is_consistent_and_cleans_up(self):
+        out = StringIO()
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'natija.json')
+            call_command('loadtest', products=30, sales=20, cashiers=1, iterations=4, stock=2, hot=3,
+                         json=path, stdout=out)
+            with open(path, encoding='utf-8') as fp:
+                summary = json.load(fp)
+        self.assertIn('izchil', out.getvalue())
+        self.assertEqual(summary['steps']['checkout']['count'], 4)
+        self.assertEqual(summary['checkouts'] + summary['rejected'], 4)
+        self.assertGreater(summary['rejected'], 0)  # 3 ta mahsulot, har birida 2 dona qoldiq
+        self.assertEqual((summary['errors'], summary['problems']), (0, []))
+        self.assertFalse(Product.objects.filter(barcode__startswith='LOAD').exists())
+        self.assertFalse(User.objects.filter(username__startswith='load-kassir-').exists())
+        self.assertFalse(Sale.objects.exists())
+
+
+class DatabaseSettingsTests(TestCase):
+    def test_sqlite_connection_is_tuned(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest("faqat SQLite profili")
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertGreaterEqual(cursor.fetchone()[0], 1000)
+        self.assertEqual(connection.settings_dict['OPTIONS']['transaction_mode'], 'IMMEDIATE')
+
+
+class QueryPlanTests(TestCase):
+    def test_hot_queries_use_indexes(self):
+        make_sales(make_products(5), 3)
+        call_command('check_query_plans', stdout=StringIO())
 
-# Create your tests here.
+    def test_full_scan_is_detected(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest("SQLite reja formati")
+        plan = "SCAN market_product\nSEARCH market_sale USING INDEX market_sale_created_idx (created_at>?)"
+        self.assertEqual(queryplans.full_scans(plan), ['market_product'])
+        self.assertEqual(queryplans.full_scans("SCAN market_product USING INDEX market_product_active_idx"), [])
+        self.assertEqual(queryplans.full_scans("SCAN market_product_fts VIRTUAL TABLE INDEX 0:M1"), [])
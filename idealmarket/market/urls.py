@@ -6,13 +6,18 @@ urlpatterns = [
     # 🌐 Bosh sahifa va Kassa
     path('', views.home, name='home'),
     path('kassa/', views.kassa, name='kassa'),
+    path('kassa/search/', views.product_search, name='product_search'),
+    path('kassa/till/', views.till_select, name='till_select'),
+    path('kassa/events/', views.till_events, name='till_events'),
 
     # 🛒 Savat funksiyalari
     path('cart/add/<int:product_id>/', views.cart_add, name='cart_add'),
     path('cart/remove/<int:product_id>/', views.cart_remove, name='cart_remove'),
+    path('cart/scan/', views.cart_scan, name='cart_scan'),
     path('cart/clear/', views.cart_clear, name='cart_clear'),
     path('cart/checkout/', views.cart_checkout, name='cart_checkout'),
     path('cart/update/<int:product_id>/', views.cart_update, name='cart_update'),
+    path('cart/checkout/batch/', views.checkout_batch, name='checkout_batch'),
 
     # 🧾 Cheklar (Sales history)
     path('cheklar/', views.sales_list, name='sales_list'),
@@ -49,6 +54,7 @@ urlpatterns = [
     path('management/ombors/add/', views.admin_ombor_add, name='admin_ombor_add'),
     path('management/ombors/<int:pk>/edit/', views.admin_ombor_edit, name='admin_ombor_edit'),
     path('management/ombors/<int:pk>/delete/', views.admin_ombor_delete, name='admin_ombor_delete'),
+    path('management/ombors/transfer/', views.admin_stock_transfer, name='admin_stock_transfer'),
 
     # 👤 Foydalanuvchilar boshqaruvi
     path('management/users/', views.admin_users, name='admin_users'),
@@ -67,6 +73,18 @@ urlpatterns = [
     path('management/sales/<int:sale_id>/', views.admin_sale_detail, name='admin_sale_detail'),
     path('management/sales/<int:sale_id>/delete/', views.admin_sale_delete, name='admin_sale_delete'),
 
+    # 🔄 Katalog delta sinxronizatsiyasi
+    path('sync/changes/', views.sync_changes, name='sync_changes'),
+    path('sync/catalogue/', views.catalogue_snapshot, name='catalogue_snapshot'),
+
+    # ⏱ So'rovlar tezligi hisoboti (faqat superuser)
+    path('perf/', views.perf_report, name='perf_report'),
+
+    # ⏳ Fon ishlari (eksport/import)
+    path('jobs/<int:job_id>/', views.job_detail, name='job_detail'),
+    path('jobs/<int:job_id>/status/', views.job_status, name='job_status'),
+    path('jobs/<int:job_id>/download/', views.job_download, name='job_download'),
+
     # Foydalanuvchi parolini o‘zgartirish
     path('management/users/<int:user_id>/change_password/', views.admin_user_change_password, name='admin_user_change_password'),
 
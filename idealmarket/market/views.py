@@ -1,21 +1,40 @@
-from django.shortcuts import render, redirect, get_object_or_404
-from django.http import JsonResponse, HttpResponse
+from django.shortcuts import render, redirect, get_object_or_404, aget_object_or_404
+from django.http import JsonResponse, HttpResponse, FileResponse, Http404, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import quote_etag
 from django.template.loader import render_to_string
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth.models import User, Group
+from django.core.cache import cache
 from django.utils import timezone
-from django.db.models import Q, Count, Sum
+from django.utils.safestring import mark_safe
+import gzip
+import hashlib
+import json
+from decimal import Decimal
+from urllib.parse import urlencode
+from django.db.models import Q, Sum
 from django.views.decorators.http import require_POST
-from .models import Product, Sale, SaleItem
+from .models import Product, Sale, SaleItem, SalesRollup, ReceiptRollup, Job, Till
+from .checkout import checkout_cart, checkout_receipts, CheckoutError
+from .serializers import ReceiptSerializer, error_messages
+from rest_framework.decorators import api_view
+from rest_framework.response import Response
+from .stock import StockError
+from .search import page_size, search_products, SEARCH_PAGE_SIZE
+from . import exports, jobs, perf, push, sku_cache, snapshot, stock, sync
+from .cart import Cart
+from .pagination import keyset_page
+from .reports import filter_sales
+from .roles import KASSIR_GROUP, is_admin, is_kassir, is_kassir_or_admin
 from django.contrib import messages
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
 
 
 from django import forms
-from .forms import ProductForm, OmborForm
-import pandas as pd
-from django.db.models.functions import ExtractHour
+from .forms import CatagoryForm, ProductForm, OmborForm
 
 #Models
 from .models import Ombor
@@ -29,11 +48,7 @@ from django.contrib.auth.forms import AdminPasswordChangeForm
 def home(request):
     return render(request, "index.html")
 
-# ROLLARNI ANIQLASH
-def is_kassir_or_admin(user):
-    return user.is_superuser or user.groups.filter(name='Kassir').exists()
-
-@user_passes_test(lambda u: u.is_superuser)
+@user_passes_test(is_admin)
 def admin_user_change_password(request, user_id):
     user = get_object_or_404(User, pk=user_id)
     if request.method == 'POST':
@@ -56,7 +71,7 @@ def dashboard_redirect(request):
     if user.is_superuser:
         # Eng to'g'ri variant: url nomi orqali redirect
         return redirect('admin_management')
-    elif user.groups.filter(name='Kassir').exists():
+    elif is_kassir(user):
         return redirect('kassa')
     else:
         return render(request, 'market/access_denied.html', {
@@ -64,280 +79,328 @@ def dashboard_redirect(request):
         })
 
 @login_required
-@user_passes_test(lambda u: u.is_superuser)
+@user_passes_test(is_admin)
 def admin_management(request):
     # Kerakli admin ma'lumotlar va funksiya
     return render(request, 'market/admin_management.html')
 
 
+def _line_delta(cart, product_id, line):
+    """
+    Savatning bitta qatori o'zgargandan keyingi holati (butun savat HTML'i emas). Xuddi shu delta
+    shu savatning SSE kanaliga ham yuboriladi; ``quantity`` 0 — qator o'chdi.
+    """
+    delta = {
+        'product_id': int(product_id),
+        'desc': line['desc'] if line else '',
+        'price': line['price'] if line else '0',
+        'quantity': line['quantity'] if line else 0,
+        'item_total': str(Decimal(line['price']) * line['quantity']) if line else '0',
+        'total': str(cart.total),
+    }
+    push.publish(push.cart_channel(cart.cart_id), delta)
+    return delta
+
+
+def _cart_delta(cart, product_id, line, message=None):
+    return JsonResponse({**_line_delta(cart, product_id, line), 'message': message})
+
+
+def _cart_cleared(cart, message, **extra):
+    delta = {'cleared': True, 'total': '0'}
+    push.publish(push.cart_channel(cart.cart_id), delta)
+    return JsonResponse({**delta, 'message': message, **extra})
+
+
+TILL_SESSION_KEY = 'till_id'
+
+
+def _current_till(request):
+    # Sessiyada tanlangan kassa apparati (sotuv ombori); tanlanmagan bo'lsa None
+    till_id = request.session.get(TILL_SESSION_KEY)
+    if not till_id:
+        return None
+    return Till.objects.filter(pk=till_id, is_active=True).select_related('ombor').first()
+
+
+def _availability(till, product_ids):
+    # Kassa omboridagi qoldiq: bitta indeksli so'rov; kassa tanlanmagan bo'lsa umumiy qoldiq.
+    # Keshlangan jadvaldan tashqarida: qoldiq har checkout'da o'zgaradi, katalog esa kam
+    if not product_ids:
+        return {}
+    if till is None:
+        return dict(Product.objects.filter(pk__in=product_ids).values_list('pk', 'stock'))
+    available = stock.available_in(till.ombor_id, product_ids)
+    return {pid: available.get(pid, 0) for pid in product_ids}
+
+
+@login_required
+@require_POST
+def till_select(request):
+    till = Till.objects.filter(pk=request.POST.get('till') or 0, is_active=True).first()
+    if till is None:
+        request.session.pop(TILL_SESSION_KEY, None)
+    else:
+        request.session[TILL_SESSION_KEY] = till.pk
+    return redirect('kassa')
+
+
+# Kassa mahsulot jadvali HTML'i: kalit — katalog versiyasi, kun (muddat oynasi) va qidiruv. Qatorlarda
+# CSRF/foydalanuvchi/kassaga bog'liq narsa yo'q (qoldiq alohida keladi), shuning uchun bir fragment barcha kassalarga mos
+PRODUCT_FRAGMENT_TTL = 300
+
+
+def _product_fragment(query, cursor=None, limit=SEARCH_PAGE_SIZE):
+    # limit kalitdan oldin cheklanadi: ?limit=1000 va ?limit=5000 bir xil HTML uchun alohida yozuv bo'lmasin
+    limit = page_size(limit)
+    digest = hashlib.md5(f"{query}\x00{cursor or ''}\x00{limit}".encode()).hexdigest()
+    key = f"kassa-products:{sync.catalogue_version()}:{timezone.localdate().isoformat()}:{digest}"
+    cached = cache.get(key)
+    if cached is not None:
+        return mark_safe(cached[0]), cached[1], cached[2]
+    page = search_products(query, cursor=cursor, limit=limit)
+    context = {'products': page.products, 'next_cursor': page.next_cursor, 'query': query}
+    # Keyingi sahifa: faqat qatorlar jadval oxiriga qo'shiladi
+    template = 'market/_products_rows.html' if cursor else 'market/_products_table.html'
+    html = render_to_string(template, context)
+    ids = [p.pk for p in page.products]
+    cache.set(key, (str(html), page.next_cursor, ids), PRODUCT_FRAGMENT_TTL)
+    return html, page.next_cursor, ids
+
+
 @login_required
 def kassa(request):
     query = request.GET.get('q', '')
-    now = timezone.now()
-    products = Product.objects.filter(
-        is_active=True,                           # Faqat faol mahsulotlar!
-        start_date__lte=now
-    ).filter(
-        Q(end_date__isnull=True) | Q(end_date__gte=now)
-    )
-    if query:
-        products = products.filter(Q(desc__icontains=query) | Q(barcode__icontains=query))
 
-    # AJAX
+    # AJAX (eski qidiruv so'rovlari ham yangi qidiruvga yo'naltiriladi)
     if request.headers.get('x-requested-with') == 'XMLHttpRequest':
-        products_html = render_to_string('market/_products_table.html', {'products': products})
-        return JsonResponse({'products_html': products_html})
-
-    # Savat hisob-kitobi...
-    cart = request.session.get('cart', {})
-    cart_items = []
-    total = 0
-    for product_id, quantity in cart.items():
-        product = Product.objects.get(pk=product_id)
-        item_total = product.s_price * quantity
-        total += item_total
-        cart_items.append({
-            'product': product,
-            'quantity': quantity,
-            'item_total': item_total
-        })
+        return product_search(request)
+
+    till = _current_till(request)
+    products_html, _, ids = _product_fragment(query)
+
+    # Savat sessiyadagi nusxalardan ko'rsatiladi
+    cart = Cart(request.session)
     return render(request, 'market/kassa.html', {
-        'products': products,
-        'cart_items': cart_items,
-        'total': total,
+        'till': till,
+        'tills': Till.objects.filter(is_active=True).select_related('ombor').order_by('name'),
+        'products_html': products_html,
+        'available': _availability(till, ids),
+        'cart_items': cart.items(),
+        'total': cart.total,
         'query': query,
+        'push_enabled': _push_enabled(request),
     })
 
 
 @login_required
-def cart_add(request, product_id):
+def product_search(request):
+    query = request.GET.get('q', '')
+    cursor = request.GET.get('cursor')
+    try:
+        limit = int(request.GET.get('limit', SEARCH_PAGE_SIZE))
+    except ValueError:
+        limit = SEARCH_PAGE_SIZE
+    html, next_cursor, ids = _product_fragment(query, cursor, limit)
+    available = _availability(_current_till(request), ids)
+    if cursor:
+        return JsonResponse({'rows_html': html, 'next_cursor': next_cursor, 'available': available})
+    return JsonResponse({'products_html': html, 'next_cursor': next_cursor, 'available': available})
+
+
+# Savat view'lari async: ORM va savat ombori sync_to_async orqali, shuning uchun ASGI ostida bitta
+# jarayon ko'p kassaga xizmat qiladi (har bir so'rov oqim band qilmaydi, SSE ulanishlari ham)
+@login_required
+async def cart_add(request, product_id):
     if request.method != "POST":
         return redirect('kassa')
 
-    product = get_object_or_404(Product, pk=product_id)
+    product = await aget_object_or_404(Product, pk=product_id)
 
     # Muddat tugagan mahsulot uchun xatolik
     if not product.is_active:
         msg = "Bu mahsulot muddati tugagan va sotib bo‘lmaydi!"
         return JsonResponse({'message': msg}, status=400)
 
-    cart = request.session.get('cart', {})
-    quantity = int(request.POST.get('quantity', 1))
-    cart[str(product_id)] = cart.get(str(product_id), 0) + quantity
-    request.session['cart'] = cart
-
-    # Savat holatini qaytarish
-    cart_items = []
-    total = 0
-    for pid, qty in cart.items():
-        p = Product.objects.get(pk=pid)
-        item_total = p.s_price * qty
-        total += item_total
-        cart_items.append({
-            'product': p,
-            'quantity': qty,
-            'item_total': item_total
-        })
+    try:
+        quantity = int(request.POST.get('quantity', 1))
+    except ValueError:
+        quantity = 0
+    if quantity <= 0:
+        return JsonResponse({'message': 'Noto‘g‘ri miqdor'}, status=400)
+
+    cart = await sync_to_async(Cart)(request.session)
+    line = await sync_to_async(cart.add)(product.pk, product.s_price, product.desc, quantity)
+    return _cart_delta(cart, product.pk, line, "Mahsulot qo'shildi!")
 
-    html = render_to_string('market/_cart_partial.html', {
-        'cart_items': cart_items,
-        'total': total,
-    }, request=request)
-    return JsonResponse({'cart_html': html, 'message': "Mahsulot qo'shildi!"})
+@login_required
+@require_POST
+async def cart_scan(request):
+    # Skaner uchun tezkor yo'l: barcode keshdan topiladi, javob faqat o'zgargan qator
+    barcode = request.POST.get('barcode', '').strip()
+    try:
+        quantity = int(request.POST.get('quantity', 1))
+    except ValueError:
+        quantity = 0
+    if not barcode or quantity <= 0:
+        return JsonResponse({'message': 'Noto‘g‘ri so‘rov'}, status=400)
+    entry = await sync_to_async(sku_cache.lookup)(barcode)
+    if entry is None:
+        return JsonResponse({'message': f"Barcode topilmadi: {barcode}"}, status=404)
+    if not entry.is_available:
+        return JsonResponse({'message': "Bu mahsulot muddati tugagan va sotib bo‘lmaydi!"}, status=400)
+
+    cart = await sync_to_async(Cart)(request.session)
+    line = await sync_to_async(cart.add)(entry.id, entry.s_price, entry.desc, quantity)
+    return _cart_delta(cart, entry.id, line, "Mahsulot qo'shildi!")
 
 @login_required
 @require_POST
-def cart_update(request, product_id):
+async def cart_update(request, product_id):
     action = request.POST.get('action')
-    cart = request.session.get('cart', {})
     if action not in ['add', 'remove']:
         return JsonResponse({'message': 'Noto‘g‘ri amal'}, status=400)
-    product = get_object_or_404(Product, pk=product_id)
+    cart = await sync_to_async(Cart)(request.session)
     if action == 'add':
+        product = await aget_object_or_404(Product, pk=product_id)
         if not product.is_active:
             return JsonResponse({'message': "Bu mahsulot muddati tugagan!"}, status=400)
-        cart[str(product_id)] = cart.get(str(product_id), 0) + 1
-    elif action == 'remove':
-        if str(product_id) in cart:
-            cart[str(product_id)] -= 1
-            if cart[str(product_id)] <= 0:
-                del cart[str(product_id)]
-    request.session['cart'] = cart
-
-    cart_items = []
-    total = 0
-    for pid, qty in cart.items():
-        p = Product.objects.get(pk=pid)
-        item_total = p.s_price * qty
-        total += item_total
-        cart_items.append({
-            'product': p,
-            'quantity': qty,
-            'item_total': item_total
-        })
-
-    html = render_to_string('market/_cart_partial.html', {
-        'cart_items': cart_items,
-        'total': total,
-    }, request=request)
-    return JsonResponse({'cart_html': html, 'message': 'Savat yangilandi!'})
+        line = await sync_to_async(cart.add)(product.pk, product.s_price, product.desc, 1)
+    else:
+        line = await sync_to_async(cart.decrement)(product_id)
+    return _cart_delta(cart, product_id, line, 'Savat yangilandi!')
 
 @login_required
-def cart_remove(request, product_id):
-    cart = request.session.get('cart', {})
-    if str(product_id) in cart:
-        del cart[str(product_id)]
-    request.session['cart'] = cart
+async def cart_remove(request, product_id):
+    cart = await sync_to_async(Cart)(request.session)
+    await sync_to_async(cart.remove)(product_id)
 
     # AJAX (fetch/XHR) orqali so‘rov keldi
     if request.headers.get('x-requested-with') == 'XMLHttpRequest':
-        cart_items = []
-        total = 0
-        for pid, qty in cart.items():
-            product = Product.objects.get(pk=pid)
-            item_total = product.s_price * qty
-            total += item_total
-            cart_items.append({
-                'product': product,
-                'quantity': qty,
-                'item_total': item_total
-            })
-        html = render_to_string('market/_cart_partial.html', {
-            'cart_items': cart_items,
-            'total': total,
-        }, request=request)
-        return JsonResponse({'cart_html': html, 'message': "Mahsulot o‘chirildi!"})
+        return _cart_delta(cart, product_id, None, "Mahsulot o‘chirildi!")
 
     # Oddiy so‘rov bo‘lsa
     return redirect('kassa')
 
 
 @login_required
-def cart_clear(request):
+async def cart_clear(request):
     if request.method == "POST":
-        request.session['cart'] = {}
-        cart_items = []
-        total = 0
-        html = render_to_string('market/_cart_partial.html', {
-            'cart_items': cart_items,
-            'total': total,
-        }, request=request)
-        return JsonResponse({'cart_html': html, 'message': "Savat tozalandi!"})
+        cart = await sync_to_async(Cart)(request.session)
+        await sync_to_async(cart.clear)()
+        return _cart_cleared(cart, "Savat tozalandi!")
     return JsonResponse({'message': "Noto'g'ri so'rov."}, status=400)
 
 @login_required
-def cart_checkout(request):
+async def cart_checkout(request):
     if request.method == "POST":
-        cart = request.session.get('cart', {})
+        cart = await sync_to_async(Cart)(request.session)
         if not cart:
-            html = render_to_string('market/_cart_partial.html', {
-                'cart_items': [],
-                'total': 0,
-            }, request=request)
-            return JsonResponse({'cart_html': html, 'message': "Savat bo'sh!"}, status=400)
-        error_msg = None
-        for product_id, quantity in cart.items():
-            product = Product.objects.get(pk=product_id)
-            if not product.is_active:
-                error_msg = f"{product.desc} muddati tugagan!"
-                break
-            if product.stock < quantity:
-                error_msg = f"{product.desc} yetarli emas, qolgan: {product.stock}"
-                break
-        if error_msg:
-            cart_items = []
-            total = 0
-            for pid, qty in cart.items():
-                p = Product.objects.get(pk=pid)
-                cart_items.append({
-                    'product': p,
-                    'quantity': qty,
-                    'item_total': p.s_price * qty
-                })
-                total += p.s_price * qty
-            html = render_to_string('market/_cart_partial.html', {
-                'cart_items': cart_items,
-                'total': total,
-            }, request=request)
-            return JsonResponse({'cart_html': html, 'message': error_msg}, status=400)
-        sale = Sale.objects.create(created_by=request.user)
-        for product_id, quantity in cart.items():
-            product = Product.objects.get(pk=product_id)
-            SaleItem.objects.create(
-                sale=sale,
-                product=product,
-                quantity=quantity,
-                price=product.s_price
-            )
-            product.stock -= quantity
-            product.save()
-        request.session['cart'] = {}
-        html = render_to_string('market/_cart_partial.html', {
-            'cart_items': [],
-            'total': 0,
-        }, request=request)
-        return JsonResponse({'cart_html': html, 'message': f"Chek #{sale.id} saqlandi!"})
+            return JsonResponse({'message': "Savat bo'sh!"}, status=400)
+        try:
+            till = await sync_to_async(_current_till)(request)
+            sale = await sync_to_async(checkout_cart)(cart.quantities(), request.user,
+                                                      ombor_id=till.ombor_id if till else None, prices=cart.prices())
+        except CheckoutError as e:
+            # Narxi o'zgargan qatorlar savatda yangilanadi: kassir yangi summani ko'rib, qayta yakunlaydi
+            lines = []
+            for product_id, (price, desc) in e.price_changes.items():
+                line = await sync_to_async(cart.reprice)(product_id, price, desc)
+                lines.append(_line_delta(cart, product_id, line))
+            return JsonResponse({'message': str(e), 'errors': e.errors, 'lines': lines}, status=400)
+        await sync_to_async(cart.clear)()
+        return _cart_cleared(cart, f"Chek #{sale.id} saqlandi!", sale_id=sale.id)
     return JsonResponse({'message': "Noto'g'ri so'rov."}, status=400)
 
+
+def _push_enabled(request):
+    # SSE faqat ASGI ostida: WSGI (runserver, gunicorn sync) cheksiz async oqimni to'liq o'qishga
+    # urinadi va worker oqimini abadiy band qiladi
+    return isinstance(request, ASGIRequest)
+
+
+@login_required
+async def till_events(request):
+    """
+    Kassa sahifasining push kanali (Server-Sent Events): shu savatning delta'lari (boshqa oynada
+    bo'lgan o'zgarishlar ham) va savatdagi mahsulotlarning kassa omboridagi yangi qoldig'i.
+    Uzoq ulanish — ASGI ostida ishlatiladi (market.push). WSGI ostida 204: brauzer qayta ulanmaydi.
+    """
+    if not _push_enabled(request):
+        return HttpResponse(status=204)
+    cart = await sync_to_async(Cart)(request.session)
+    till = await sync_to_async(_current_till)(request)
+    stream = push.till_stream(cart.cart_id, till.ombor_id if till else None, cart.lines)
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # nginx javobni buferlamasin
+    return response
+
+SALES_PAGE_SIZE = 50
+
+
+def _sales_history(request):
+    # Cheklar tarixi: sana/kassir filtri va (created_at, id) bo'yicha keyset sahifalash
+    sales, filters = filter_sales(Sale.objects.select_related('created_by'), request.GET)
+    rows, next_cursor = keyset_page(sales, request.GET.get('cursor'), SALES_PAGE_SIZE)
+    return {
+        'sales': rows,
+        'filters': filters,
+        'filters_query': urlencode(filters),
+        'cashiers': User.objects.filter(Q(is_superuser=True) | Q(groups__name=KASSIR_GROUP)).distinct().order_by('username'),
+        'next_url': f"?{urlencode({**filters, 'cursor': next_cursor})}" if next_cursor else None,
+        'first_url': f"?{urlencode(filters)}" if request.GET.get('cursor') else None,
+    }
+
+
 @user_passes_test(is_kassir_or_admin)
 def sales_list(request):
-    sales = Sale.objects.order_by('-created_at').select_related('created_by')
-    sales_data = []
-    for sale in sales:
-        total_sum = sum([item.quantity * item.price for item in sale.items.all()])
-        sales_data.append({
-            'id': sale.id,
-            'created_at': sale.created_at,
-            'created_by': sale.created_by,
-            'total_sum': total_sum,
-        })
-    return render(request, 'market/sales_list.html', {
-        'sales_data': sales_data,
-    })
+    context = _sales_history(request)
+    context['sales_data'] = context['sales']
+    return render(request, 'market/sales_list.html', context)
 
 
 @user_passes_test(is_kassir_or_admin)
 def sale_detail(request, pk):
-    sale = get_object_or_404(Sale, pk=pk)
-    items = sale.items.all()
-    total_sum = sum([item.quantity * item.price for item in items])
+    sale = get_object_or_404(Sale.objects.select_related('created_by'), pk=pk)
+    items = sale.items.select_related('product')
     return render(request, 'market/sale_detail.html', {
         'sale': sale,
         'items': items,
-        'total_sum': total_sum
+        'total_sum': sale.total
     })
 
 @user_passes_test(is_kassir_or_admin)
 def statistics(request):
+    # Hammasi oldindan yig'ilgan jadvallardan o'qiladi (market.rollups)
     category_stats = (
-        SaleItem.objects
-        .values('product__catagory__name')
-        .annotate(total_sales=Sum('quantity'), total_sum=Sum('price'))
+        SalesRollup.objects
+        .values('catagory__name')
+        .annotate(total_sales=Sum('quantity'), total_sum=Sum('revenue'))
         .order_by('-total_sales')
     )
     product_stats = (
-        SaleItem.objects
+        SalesRollup.objects
         .values('product__desc')
-        .annotate(total_sales=Sum('quantity'), total_sum=Sum('price'))
+        .annotate(total_sales=Sum('quantity'), total_sum=Sum('revenue'))
         .order_by('-total_sales')[:10]
     )
     kassir_stats = (
-        Sale.objects
-        .values('created_by__username')
-        .annotate(total_cheks=Count('id'), total_sum=Sum('items__price'))
+        ReceiptRollup.objects
+        .values('cashier__username')
+        .annotate(total_cheks=Sum('receipts'), total_sum=Sum('revenue'))
         .order_by('-total_cheks')
     )
     date_stats = (
-        Sale.objects
-        .values('created_at__date')
-        .annotate(total_cheks=Count('id'), total_sum=Sum('items__price'))
-        .order_by('-created_at__date')
+        ReceiptRollup.objects
+        .values('day')
+        .annotate(total_cheks=Sum('receipts'), total_sum=Sum('revenue'))
+        .order_by('-day')
     )
     hour_stats = (
-        Sale.objects
-        .annotate(hour=ExtractHour('created_at'))
+        ReceiptRollup.objects
         .values('hour')
-        .annotate(total_cheks=Count('id'))
+        .annotate(total_cheks=Sum('receipts'))
         .order_by('-total_cheks')
     )
     now = timezone.now().date()
@@ -354,89 +417,228 @@ def statistics(request):
 
 @user_passes_test(is_kassir_or_admin)
 def export_sales_pdf(request):
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = 'attachment; filename="cheklar.pdf"'
-    p = canvas.Canvas(response, pagesize=A4)
-    width, height = A4
-
-    p.setFont("Helvetica-Bold", 14)
-    p.drawString(200, height - 40, "Cheklar Tarixi (Sales History)")
-    y = height - 70
-    p.setFont("Helvetica", 10)
-    p.drawString(30, y, "ID")
-    p.drawString(70, y, "Sana")
-    p.drawString(160, y, "Foydalanuvchi")
-    p.drawString(250, y, "Umumiy summa")
-    y -= 15
-
-    sales = Sale.objects.order_by('-created_at')
-    for sale in sales:
-        p.drawString(30, y, str(sale.id))
-        p.drawString(70, y, sale.created_at.strftime('%Y-%m-%d %H:%M'))
-        p.drawString(160, y, sale.created_by.username if sale.created_by else "-")
-        p.drawString(250, y, str(sale.total_sum))
-        y -= 14
-        if y < 40:
-            p.showPage()
-            y = height - 40
-
-    p.save()
-    return response
+    # Sana oralig'i (date_from/date_to) va kassir bo'yicha; PDF fon ishida tayyorlanadi
+    _, filters = filter_sales(Sale.objects.none(), request.GET)
+    return _enqueue_job(request, 'export_sales_pdf', filters)
 
 @user_passes_test(is_kassir_or_admin)
 def export_statistics_pdf(request):
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = 'attachment; filename="statistika.pdf"'
-    p = canvas.Canvas(response, pagesize=A4)
-    width, height = A4
-
-    p.setFont("Helvetica-Bold", 14)
-    p.drawString(200, height-40, "Statistika va Hisobotlar")
-    y = height - 70
-
-    # Eng ko‘p sotilgan mahsulotlar
-    p.setFont("Helvetica-Bold", 12)
-    p.drawString(30, y, "Eng ko‘p sotilgan mahsulotlar")
-    y -= 20
-    p.setFont("Helvetica", 10)
-
-    stats = (
-        SaleItem.objects.values('product__desc')
-        .annotate(total=Sum('quantity'))
-        .order_by('-total')[:10]
-    )
-    p.drawString(30, y, "Mahsulot"); p.drawString(250, y, "Soni")
-    y -= 16
-    for row in stats:
-        p.drawString(30, y, row['product__desc'][:30])
-        p.drawString(250, y, str(row['total']))
-        y -= 14
-        if y < 40: p.showPage(); y = height - 40
-
-    p.save()
-    return response
+    return _enqueue_job(request, 'export_statistics_pdf')
 
 @user_passes_test(is_kassir_or_admin)
 def export_statistics_excel(request):
-    stats = (
-        SaleItem.objects.values('product__desc')
-        .annotate(total=Sum('quantity'))
-        .order_by('-total')[:10]
-    )
-    df = pd.DataFrame(list(stats))
-    response = HttpResponse(content_type='application/vnd.ms-excel')
-    response['Content-Disposition'] = 'attachment; filename="statistika.xlsx"'
-    df.to_excel(response, index=False)
+    return _enqueue_job(request, 'export_statistics_excel')
+
+
+# Delta sinxronizatsiya (narx displeylari, yorliq printerlari)
+@login_required
+def sync_changes(request):
+    """
+    ?since=<kursor> dan keyingi katalog o'zgarishlari. ETag — jurnaldagi oxirgi id:
+    o'zgarish bo'lmasa If-None-Match bilan kelgan so'rov bitta indeks qidiruvi va 304 bilan qaytadi.
+    """
+    latest = sync.latest_cursor()
+    etag = quote_etag(str(latest))
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        not_modified['ETag'] = etag
+        return not_modified
+
+    since = request.GET.get('since', '')
+    since = int(since) if since.isdigit() else 0
+    try:
+        limit = min(max(int(request.GET.get('limit', sync.SYNC_PAGE_SIZE)), 1), sync.SYNC_MAX_PAGE_SIZE)
+    except ValueError:
+        limit = sync.SYNC_PAGE_SIZE
+    response = JsonResponse(sync.changes_since(since, latest, limit))
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
     return response
 
 
+# Oflayn kassa: katalog nusxasi va navbatdagi cheklarni yuborish
+CATALOGUE_SNAPSHOT_TTL = 300
+BATCH_MAX_RECEIPTS = 200
+
+
+@login_required
+def catalogue_snapshot(request):
+    """
+    ?since=<versiya> dan keyingi katalog farqi (since=0 — to'liq nusxa), gzip bilan siqilgan JSON.
+    O'zgarish bo'lmasa If-None-Match bilan kelgan so'rov 304 qaytadi. To'liq nusxa versiya
+    bo'yicha keshlanadi: aloqa tiklanganda barcha kassalar bir vaqtda so'rasa ham bir marta quriladi.
+    """
+    since = request.GET.get('since', '')
+    since = int(since) if since.isdigit() else 0
+    latest = sync.latest_cursor()
+    today = timezone.localdate().isoformat()
+    etag = quote_etag(f"{latest}-{today}")
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        not_modified['ETag'] = etag
+        return not_modified
+
+    key = f"catalogue-snapshot:{latest}:{today}"
+    body = cache.get(key) if not 0 < since <= latest else None
+    if body is None:
+        payload = snapshot.build(since, latest)
+        body = gzip.compress(json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode())
+        if payload['full']:
+            cache.set(key, body, CATALOGUE_SNAPSHOT_TTL)
+    if 'gzip' in request.headers.get('accept-encoding', ''):
+        response = HttpResponse(body, content_type='application/json')
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = HttpResponse(gzip.decompress(body), content_type='application/json')
+    patch_vary_headers(response, ['Accept-Encoding'])
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+@api_view(['POST'])
+def checkout_batch(request):
+    """
+    Oflayn kassa va kiosk cheklari: {"receipts": [{"idempotency_key": "...", "lines": {"<id>": miqdor},
+    "prices": {"<id>": "narx"}}]}.
+    Hammasi bitta tranzaksiyada, to'plam bo'yicha tekshiriladi (market.checkout.checkout_receipts);
+    har bir chek uchun natija qaytadi (created / duplicate / rejected), qayta yuborish xavfsiz.
+    """
+    receipts = request.data.get('receipts') if isinstance(request.data, dict) else None
+    if not isinstance(receipts, list) or not receipts:
+        return Response({'message': "receipts ro'yxati kerak."}, status=400)
+    if len(receipts) > BATCH_MAX_RECEIPTS:
+        return Response({'message': f"Bir so'rovda ko'pi bilan {BATCH_MAX_RECEIPTS} ta chek."}, status=400)
+
+    # Shakli noto'g'ri chek butun batch'ni emas, faqat o'zini rad ettiradi
+    results = [None] * len(receipts)
+    valid = []
+    for index, data in enumerate(receipts):
+        serializer = ReceiptSerializer(data=data)
+        if serializer.is_valid():
+            valid.append((index, serializer.validated_data))
+        else:
+            key = data.get('idempotency_key') if isinstance(data, dict) else None
+            results[index] = {'idempotency_key': key, 'status': 'rejected',
+                              'errors': error_messages(serializer.errors)}
+    if valid:
+        till = _current_till(request)
+        try:
+            done = checkout_receipts([data for _, data in valid], request.user,
+                                     ombor_id=till.ombor_id if till else None)
+        except CheckoutError as e:
+            return Response({'message': str(e), 'errors': e.errors}, status=409)
+        for (index, _), result in zip(valid, done):
+            results[index] = result
+    return Response({'results': results})
+
+
+# So'rovlar tezligi va SQL soni (market.perf.PerfMiddleware yig'adi)
+@user_passes_test(is_admin)
+def perf_report(request):
+    stats, slow = perf.collect()
+    sort = request.GET.get('sort', 'latency')
+    rows = sorted(perf.summary_rows(stats), key=lambda row: row[perf.SORT_KEYS.get(sort, 'latency_avg_ms')],
+                  reverse=True)
+    response = JsonResponse({'views': rows, 'slow': slow, 'latency_buckets_ms': perf.LATENCY_BUCKETS})
+    patch_cache_control(response, private=True, no_store=True)
+    return response
+
+
+@user_passes_test(is_admin)
+def admin_stock_transfer(request):
+    """
+    Omborlar orasida ko'chirish. Har bir qatorda: ``barcode miqdor``.
+    Butun ro'yxat bitta tranzaksiyada bajariladi yoki umuman bajarilmaydi.
+    """
+    ombors = Ombor.objects.order_by('name')
+    context = {'ombors': ombors, 'data': request.POST}
+    if request.method == 'POST':
+        errors = []
+        quantities = {}
+        lines = {}
+        for number, line in enumerate(request.POST.get('lines', '').splitlines(), start=1):
+            parts = line.split()
+            if not parts:
+                continue
+            if len(parts) != 2 or not parts[1].isdigit() or int(parts[1]) <= 0:
+                errors.append(f"{number}-qator noto‘g‘ri: {line.strip()}")
+                continue
+            lines[parts[0]] = lines.get(parts[0], 0) + int(parts[1])
+        found = dict(Product.objects.filter(barcode__in=lines).values_list('barcode', 'pk'))
+        for barcode, qty in lines.items():
+            if barcode not in found:
+                errors.append(f"Barcode topilmadi: {barcode}")
+            else:
+                quantities[found[barcode]] = qty
+        from_id, to_id = request.POST.get('from_ombor', ''), request.POST.get('to_ombor', '')
+        if not (from_id.isdigit() and to_id.isdigit()):
+            errors.append("Omborlarni tanlang.")
+        if not errors:
+            try:
+                count = stock.transfer(int(from_id), int(to_id), quantities, request.user,
+                                       note=request.POST.get('note', '')[:255])
+            except StockError as e:
+                errors.extend(e.errors)
+            else:
+                messages.success(request, f"{count} ta mahsulot ko‘chirildi.")
+                return redirect('admin_stock_transfer')
+        for error in errors:
+            messages.error(request, error)
+    return render(request, 'market/admin_stock_transfer.html', context)
+
+
+# Fon ishlari (eksport/import) holati va natijasi
+def _enqueue_job(request, kind, params=None, upload=None):
+    job = jobs.enqueue(kind, params, user=request.user, upload=upload)
+    if request.headers.get('x-requested-with') == 'XMLHttpRequest':
+        return JsonResponse({'job_id': job.pk, 'status_url': reverse('job_status', args=[job.pk])}, status=202)
+    return redirect('job_detail', job_id=job.pk)
+
+def _get_job(request, job_id):
+    job = get_object_or_404(Job, pk=job_id)
+    if not request.user.is_superuser and job.created_by_id != request.user.pk:
+        raise Http404
+    return job
+
+def _job_payload(job):
+    expired = job.expires_at is not None and job.expires_at < timezone.now()
+    return {
+        'job_id': job.pk,
+        'kind': job.kind,
+        'status': job.status,
+        'message': job.message,
+        'download_url': reverse('job_download', args=[job.pk]) if job.result_file and not expired else None,
+        'expires_at': job.expires_at.isoformat() if job.expires_at else None,
+    }
+
+@login_required
+def job_detail(request, job_id):
+    job = _get_job(request, job_id)
+    return render(request, 'market/job_detail.html', {'job': job, 'payload': _job_payload(job)})
+
+@login_required
+def job_status(request, job_id):
+    return JsonResponse(_job_payload(_get_job(request, job_id)))
+
+@login_required
+def job_download(request, job_id):
+    job = _get_job(request, job_id)
+    if job.status != Job.DONE or not job.result_file:
+        return JsonResponse({'message': "Natija hali tayyor emas."}, status=409)
+    path = jobs.result_path(job)
+    if job.expires_at < timezone.now() or not path.exists():
+        return JsonResponse({'message': "Natija muddati o'tgan."}, status=410)
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=job.result_name, content_type=job.content_type)
+
+
 #admin
-@user_passes_test(lambda u: u.is_superuser)
+@user_passes_test(is_admin)
 def admin_management(request):
     return render(request, 'market/admin_management.html')
 
 @login_required
-@user_passes_test(lambda u: u.is_superuser)
+@user_passes_test(is_admin)
 def admin_products(request):
     products = Product.objects.all().order_by('-id')
     categories = Catagory.objects.all()
@@ -454,49 +656,50 @@ def admin_products(request):
 
     context = {
         'products': products,
-        'categories': categories
+        'categories': categories,
+        'ombors': Ombor.objects.all(),
     }
     return render(request, 'market/admin_products.html', context)
 
 
-@user_passes_test(lambda u: u.is_superuser)
+@user_passes_test(is_admin)
 def admin_categories(request):
     return render(request, 'market/admin_categories.html')
 
-@user_passes_test(lambda u: u.is_superuser)
+@user_passes_test(is_admin)
 def admin_users(request):
     return render(request, 'market/admin_users.html')
 
-@user_passes_test(lambda u: u.is_superuser)
+@user_passes_test(is_admin)
 def admin_groups(request):
     return render(request, 'market/admin_groups.html')
 
 
 
-@user_passes_test(lambda u: u.is_superuser)
+@user_passes_test(is_admin)
 def admin_sales(request):
     return render(request, 'market/admin_sales.html')
 
 #admin praduct
-@user_passes_test(lambda u: u.is_superuser)
+@user_passes_test(is_admin)
 def admin_product_add(request):
     if request.method == 'POST':
         form = ProductForm(request.POST)
         if form.is_valid():
-            form.save()
+            stock.save_product_form(form, request.user)
             return redirect('admin_products')
     else:
         form = ProductForm()
     return render(request, 'market/admin_product_form.html', {'form': form})
 
 
-@user_passes_test(lambda u: u.is_superuser)
+@user_passes_test(is_admin)
 def admin_product_edit(request, pk):
     product = get_object_or_404(Product, pk=pk)
     if request.method == 'POST':
         form = ProductForm(request.POST, instance=product)
         if form.is_valid():
-            form.save()
+            stock.save_product_form(form, request.user)
             return redirect('admin_products')
     else:
         form = ProductForm(instance=product)
@@ -504,7 +707,7 @@ def admin_product_edit(request, pk):
 
 
 
-@user_passes_test(lambda u: u.is_superuser)
+@user_passes_test(is_admin)
 def admin_product_delete(request, pk):
     product = get_object_or_404(Product, pk=pk)
     if request.method == 'POST':
@@ -513,7 +716,7 @@ def admin_product_delete(request, pk):
     return render(request, 'market/admin_product_confirm_delete.html', {'product': product})
 
 @login_required
-@user_passes_test(lambda u: u.is_superuser)
+@user_passes_test(is_admin)
 @require_POST
 def admin_product_bulk_delete(request):
     ids = request.POST.getlist('selected_products')
@@ -521,18 +724,19 @@ def admin_product_bulk_delete(request):
         messages.warning(request, "Hech qanaqa mahsulot tanlanmadi.")
         return redirect('admin_products')
 
-    products = Product.objects.filter(id__in=ids)
-    deleted_count = 0
-    archived_count = 0
-
-    for product in products:
-        if SaleItem.objects.filter(product=product).exists():
-            product.is_active = False
-            product.save()
-            archived_count += 1
-        else:
-            product.delete()
-            deleted_count += 1
+    selected = list(Product.objects.filter(id__in=ids).values_list('pk', flat=True))
+    # Sotuvda ishlatilganlari bitta so'rov bilan (SaleItem.product indeksi): ular arxivlanadi
+    used = set(SaleItem.objects.filter(product_id__in=selected).values_list('product_id', flat=True).distinct())
+    archived = [pk for pk in selected if pk in used]
+    if archived:
+        Product.objects.filter(pk__in=archived).update(is_active=False, updated_at=timezone.now())
+        # update() signal yubormaydi: jurnal va skaner keshi shu yerda yangilanadi
+        sync.record_changes(Product, archived)
+        for pk in archived:
+            sku_cache.forget(product_id=pk)
+    archived_count = len(archived)
+    _, deleted = Product.objects.filter(pk__in=[pk for pk in selected if pk not in used]).delete()
+    deleted_count = deleted.get(Product._meta.label, 0)
 
     if deleted_count > 0:
         messages.success(request, f"{deleted_count} ta mahsulot to‘liq o‘chirildi!")
@@ -543,13 +747,13 @@ def admin_product_bulk_delete(request):
 
 
 @login_required
-@user_passes_test(lambda u: u.is_superuser)
+@user_passes_test(is_admin)
 def admin_categories(request):
     categories = Catagory.objects.all()
     return render(request, 'market/admin_categories.html', {'categories': categories})
 
 @login_required
-@user_passes_test(lambda u: u.is_superuser)
+@user_passes_test(is_admin)
 def admin_category_add(request):
     if request.method == 'POST':
         form = CatagoryForm(request.POST)
@@ -561,7 +765,7 @@ def admin_category_add(request):
     return render(request, 'market/admin_category_form.html', {'form': form})
 
 @login_required
-@user_passes_test(lambda u: u.is_superuser)
+@user_passes_test(is_admin)
 def admin_category_edit(request, pk):
     category = get_object_or_404(Catagory, pk=pk)
     if request.method == 'POST':
@@ -574,7 +778,7 @@ def admin_category_edit(request, pk):
     return render(request, 'market/admin_category_form.html', {'form': form})
 
 @login_required
-@user_passes_test(lambda u: u.is_superuser)
+@user_passes_test(is_admin)
 def admin_category_delete(request, pk):
     category = get_object_or_404(Catagory, pk=pk)
     if request.method == 'POST':
@@ -589,13 +793,13 @@ class OmborForm(forms.ModelForm):
         fields = ['name']
 
 @login_required
-@user_passes_test(lambda u: u.is_superuser)
+@user_passes_test(is_admin)
 def admin_ombors(request):
     ombors = Ombor.objects.all()
     return render(request, 'market/admin_ombors.html', {'ombors': ombors})
 
 @login_required
-@user_passes_test(lambda u: u.is_superuser)
+@user_passes_test(is_admin)
 def admin_ombor_add(request):
     if request.method == 'POST':
         form = OmborForm(request.POST)
@@ -607,7 +811,7 @@ def admin_ombor_add(request):
     return render(request, 'market/admin_ombor_form.html', {'form': form})
 
 @login_required
-@user_passes_test(lambda u: u.is_superuser)
+@user_passes_test(is_admin)
 def admin_ombor_edit(request, pk):
     ombor = get_object_or_404(Ombor, pk=pk)
     if request.method == 'POST':
@@ -620,7 +824,7 @@ def admin_ombor_edit(request, pk):
     return render(request, '', {'form': form})
 
 @login_required
-@user_passes_test(lambda u: u.is_superuser)
+@user_passes_test(is_admin)
 def admin_ombor_delete(request, pk):
     ombor = get_object_or_404(Ombor, pk=pk)
     if request.method == 'POST':
@@ -629,12 +833,13 @@ def admin_ombor_delete(request, pk):
     return render(request, 'market/admin_ombor_confirm_delete.html', {'ombor': ombor})
 
 #Users
-@user_passes_test(lambda u: u.is_superuser)
+@user_passes_test(is_admin)
 def admin_users(request):
-    users = User.objects.all().order_by('-is_superuser', 'username')
+    # Rol ustuni uchun guruhlar bitta qo'shimcha so'rov bilan (har bir qatorga alohida emas)
+    users = User.objects.prefetch_related('groups').order_by('-is_superuser', 'username')
     return render(request, 'market/admin_users.html', {'users': users})
 
-@user_passes_test(lambda u: u.is_superuser)
+@user_passes_test(is_admin)
 def admin_user_add(request):
     if request.method == "POST":
         username = request.POST.get('username')
@@ -648,7 +853,7 @@ def admin_user_add(request):
         else:
             user = User.objects.create_user(username=username, password=password, first_name=first_name, last_name=last_name)
             if role == 'kassir':
-                group, created = Group.objects.get_or_create(name='Kassir')
+                group, created = Group.objects.get_or_create(name=KASSIR_GROUP)
                 user.groups.add(group)
             elif role == 'admin':
                 user.is_superuser = True
@@ -657,7 +862,7 @@ def admin_user_add(request):
             return redirect('admin_users')
     return render(request, 'market/admin_user_add.html')
 
-@user_passes_test(lambda u: u.is_superuser)
+@user_passes_test(is_admin)
 def admin_user_edit(request, user_id):
     user = get_object_or_404(User, pk=user_id)
     if request.method == "POST":
@@ -669,7 +874,7 @@ def admin_user_edit(request, user_id):
         user.is_superuser = False
         user.is_staff = False
         if role == 'kassir':
-            group, created = Group.objects.get_or_create(name='Kassir')
+            group, created = Group.objects.get_or_create(name=KASSIR_GROUP)
             user.groups.add(group)
         elif role == 'admin':
             user.is_superuser = True
@@ -678,7 +883,7 @@ def admin_user_edit(request, user_id):
         return redirect('admin_users')
     return render(request, 'market/admin_user_edit.html', {'user_obj': user})
 
-@user_passes_test(lambda u: u.is_superuser)
+@user_passes_test(is_admin)
 def admin_user_delete(request, user_id):
     user = get_object_or_404(User, pk=user_id)
     if request.method == "POST":
@@ -687,12 +892,12 @@ def admin_user_delete(request, user_id):
     return render(request, 'market/admin_user_confirm_delete.html', {'user_obj': user})
 
 #group
-@user_passes_test(lambda u: u.is_superuser)
+@user_passes_test(is_admin)
 def admin_groups(request):
     groups = Group.objects.all().order_by('name')
     return render(request, 'market/admin_groups.html', {'groups': groups})
 
-@user_passes_test(lambda u: u.is_superuser)
+@user_passes_test(is_admin)
 def admin_group_add(request):
     if request.method == 'POST':
         name = request.POST.get('name')
@@ -703,7 +908,7 @@ def admin_group_add(request):
             return redirect('admin_groups')
     return render(request, 'market/admin_group_add.html')
 
-@user_passes_test(lambda u: u.is_superuser)
+@user_passes_test(is_admin)
 def admin_group_edit(request, group_id):
     group = get_object_or_404(Group, pk=group_id)
     if request.method == 'POST':
@@ -713,7 +918,7 @@ def admin_group_edit(request, group_id):
         return redirect('admin_groups')
     return render(request, 'market/admin_group_edit.html', {'group': group})
 
-@user_passes_test(lambda u: u.is_superuser)
+@user_passes_test(is_admin)
 def admin_group_delete(request, group_id):
     group = get_object_or_404(Group, pk=group_id)
     if request.method == 'POST':
@@ -722,18 +927,17 @@ def admin_group_delete(request, group_id):
     return render(request, 'market/admin_group_confirm_delete.html', {'group': group})
 
 # Sotuvlar
-@user_passes_test(lambda u: u.is_superuser)
+@user_passes_test(is_admin)
 def admin_sales(request):
-    sales = Sale.objects.select_related('created_by').order_by('-created_at')
-    return render(request, 'market/admin_sales.html', {'sales': sales})
+    return render(request, 'market/admin_sales.html', _sales_history(request))
 
-@user_passes_test(lambda u: u.is_superuser)
+@user_passes_test(is_admin)
 def admin_sale_detail(request, sale_id):
-    sale = get_object_or_404(Sale, pk=sale_id)
+    sale = get_object_or_404(Sale.objects.select_related('created_by'), pk=sale_id)
     items = sale.items.select_related('product')
     return render(request, 'market/admin_sale_detail.html', {'sale': sale, 'items': items})
 
-@user_passes_test(lambda u: u.is_superuser)
+@user_passes_test(is_admin)
 def admin_sale_delete(request, sale_id):
     sale = get_object_or_404(Sale, pk=sale_id)
     if request.method == 'POST':
@@ -783,79 +987,29 @@ def admin_ombor_delete(request, pk):
         return redirect('admin_ombors')
     return render(request, 'market/admin_ombor_confirm_delete.html', {'ombor': ombor})
 
+@user_passes_test(is_admin)
 def management_product_import(request):
     if request.method == "POST":
-        import pandas as pd
-        file = request.FILES['file']
-        try:
-            df = pd.read_json(file)
-        except Exception as e:
-            return HttpResponse("JSON faylni o‘qib bo‘lmadi: " + str(e))
-        for _, row in df.iterrows():
-            # Kategoriya va Ombor nomi orqali id ni topamiz
-            from .models import Catagory, Ombor
-            try:
-                catagory_obj = Catagory.objects.get(name=row['catagory'])
-                ombor_obj = Ombor.objects.get(name=row['ombor'])
-            except Catagory.DoesNotExist:
-                return HttpResponse(f"Kategoriya topilmadi: {row['catagory']}")
-            except Ombor.DoesNotExist:
-                return HttpResponse(f"Ombor topilmadi: {row['ombor']}")
-            Product.objects.update_or_create(
-                barcode=row['barcode'],
-                defaults={
-                    'catagory': catagory_obj,
-                    'ombor': ombor_obj,
-                    'desc': row.get('desc', ''),
-                    'r_price': row.get('r_price', 0),
-                    's_price': row.get('s_price', 0),
-                    'stock': row.get('stock', 0),
-                    'start_date': row.get('start_date', None),
-                    'end_date': row.get('end_date', None),
-                }
-            )
-        return redirect('admin_products')
+        if 'file' not in request.FILES:
+            return HttpResponse("Fayl tanlanmadi!", status=400)
+        return _enqueue_job(request, 'import_products', upload=request.FILES['file'])
     return HttpResponse("Faqat POST so‘rov!", status=405)
 
 
-
-
+@user_passes_test(is_admin)
 def management_product_export(request):
-    import pandas as pd
-    products = Product.objects.filter(is_active=True).values(
-        'id', 'catagory_id', 'ombor_id', 'barcode', 'desc', 'r_price', 's_price', 'stock', 'start_date', 'end_date'
-    )
-    df = pd.DataFrame(list(products))
-    response = HttpResponse(content_type='application/json')
-    response['Content-Disposition'] = 'attachment; filename="products_export.json"'
-    response.write(df.to_json(orient='records'))
-    return response
+    # ?format=json|jsonl|csv|xlsx&ombor=&catagory=&changed_since=
+    return _enqueue_job(request, 'export_products', exports.export_filters(request.GET))
 
 
+@user_passes_test(is_admin)
 def management_category_import(request):
     if request.method == "POST":
-        import pandas as pd
-        file = request.FILES['file']
-        try:
-            df = pd.read_json(file)
-        except Exception as e:
-            return HttpResponse("JSON faylni o‘qib bo‘lmadi: " + str(e))
-
-        for _, row in df.iterrows():
-            Catagory.objects.update_or_create(
-                name=row['name'],
-                defaults={
-                    'desc': row.get('desc', '')
-                }
-            )
-        return redirect('admin_categories')
+        if 'file' not in request.FILES:
+            return HttpResponse("Fayl tanlanmadi!", status=400)
+        return _enqueue_job(request, 'import_categories', upload=request.FILES['file'])
     return HttpResponse("Faqat POST so‘rov!", status=405)
 
+@user_passes_test(is_admin)
 def management_category_export(request):
-    import pandas as pd
-    categories = Catagory.objects.all().values('id', 'name', 'desc')
-    df = pd.DataFrame(list(categories))
-    response = HttpResponse(content_type='application/json')
-    response['Content-Disposition'] = 'attachment; filename="categories_export.json"'
-    response.write(df.to_json(orient='records'))
-    return response
+    return _enqueue_job(request, 'export_categories', exports.export_filters(request.GET))
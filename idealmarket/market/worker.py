@@ -0,0 +1,13 @@
+import django
+
+# ProcessPoolExecutor (spawn) uchun kirish nuqtalari. Bu modul yuqori darajada
+# modellarni import qilmaydi: bola jarayon uni django.setup() dan oldin yuklaydi.
+
+
+def init():
+    django.setup()
+
+
+def run(job_id):
+    from . import jobs
+    return jobs.run_job(job_id)